@@ -84,14 +84,18 @@ class DiceAdventurePythonEnv(Env):
         if self.server == "local":
             self.game.render()
 
-    def reset(self, **kwargs):
+    def reset(self, seed=None, options=None, **kwargs):
         """
         Resets the game. Only applies when `self.server` is 'local'.
+        :param seed:    (int) Seeds the environment. Each new game is seeded from the environment's generator, so
+                              seeding the first reset makes the whole run repeatable.
+        :param options: (dict) Not used
         :param kwargs:  (dict) Additional arguments to pass into local game server
         :return:        (dict, dict) The initial state when the game is reset, An empty 'info' dict
         """
+        super().reset(seed=seed)
         if self.server == "local":
-            self.game = DiceAdventure(**self.kwargs)
+            self.game = DiceAdventure(**dict(self.kwargs, seed=int(self.np_random.integers(2 ** 63))))
         obs = self.get_state()
         return obs, {}
 
@@ -0,0 +1,125 @@
+"""
+Compares the dict-backed Board with the NumPy-backed ArrayBoard on the shipped levels and on large synthetic maps.
+ArrayBoard only speeds up queries (check_valid_move, has_combat, combat_locations); it keeps the dict grid as well, so
+move and place/remove are expected to be slower.
+
+Usage (from the repository root):
+    python -m benchmarks.board_backends [--sizes 100 500] [--ops 20000]
+"""
+from argparse import ArgumentParser
+from classes.array_board import ArrayBoard
+from classes.board import Board
+from game.level_registry import get_config
+from game.level_registry import get_level_registry
+from random import Random
+from tabulate import tabulate
+from time import perf_counter
+
+BACKENDS = {"dict": Board, "array": ArrayBoard}
+DIRECTIONS = ["left", "right", "up", "down"]
+
+
+def synthetic_level(size, seed=0, wall_density=0.2, enemy_density=0.1):
+    """
+    Builds a random square level. Only intended for timing, so solvability is not checked.
+    :param size: The width and height of the level
+    :param seed: Random seed
+    :param wall_density: Fraction of cells that are walls
+    :param enemy_density: Fraction of cells that hold an enemy
+    :return: (tuple) The level grid
+    """
+    rng = Random(seed)
+    enemies = ["M1", "M2", "M3", "M4", "T1", "T2", "T3", "S1", "S2", "S3"]
+    grid = []
+    for _ in range(size):
+        row = []
+        for _ in range(size):
+            r = rng.random()
+            if r < wall_density:
+                row.append("##")
+            elif r < wall_density + enemy_density:
+                row.append(rng.choice(enemies))
+            else:
+                row.append("..")
+        grid.append(row)
+    for i, code in enumerate(["1S", "2S", "3S", "1G", "2G", "3G", "**"]):
+        grid[i // size][i % size] = code
+    return tuple(tuple(row) for row in grid)
+
+
+def time_op(fn, num_ops):
+    start = perf_counter()
+    fn(num_ops)
+    return (perf_counter() - start) / num_ops * 1e6
+
+
+def bench_board(board_class, level, config, num_ops, seed=0):
+    """
+    Times the basic board operations for one backend on one level.
+    :return: (dict) Microseconds per operation, keyed by operation name
+    """
+    board = board_class(width=len(level[0]), height=len(level), object_positions=level, config=config)
+    rng = Random(seed)
+    coords = [(rng.randrange(-1, board.width + 1), rng.randrange(-1, board.height + 1)) for _ in range(num_ops)]
+    cells = [(rng.randrange(board.width), rng.randrange(board.height)) for _ in range(num_ops)]
+    players = ["1S", "2S", "3S"]
+    monsters = [k for k, o in board.objects.items() if o.type == "monster"] or players
+
+    def valid_moves(n):
+        for x, y in coords[:n]:
+            board.check_valid_move(x, y, avoid=["Stone", "Trap"])
+
+    def player_moves(n):
+        for i in range(n):
+            board.move(players[i % 3], DIRECTIONS[i % 4])
+
+    def place_remove(n):
+        for i in range(n):
+            p = players[i % 3]
+            x, y = board.objects[p].x, board.objects[p].y
+            board.remove(p, delete=False)
+            board.place(p, x, y)
+
+    def monster_moves(n):
+        for i in range(n):
+            board.move_monster(monsters[i % len(monsters)], list(DIRECTIONS))
+
+    def combat_checks(n):
+        for x, y in cells[:n]:
+            board.has_combat(x, y)
+
+    def combat_scan(n):
+        for _ in range(n):
+            board.combat_locations()
+
+    return {
+        "check_valid_move": time_op(valid_moves, num_ops),
+        "move": time_op(player_moves, num_ops),
+        "place/remove": time_op(place_remove, num_ops),
+        "move_monster": time_op(monster_moves, num_ops),
+        "has_combat": time_op(combat_checks, num_ops),
+        "combat_locations": time_op(combat_scan, max(1, num_ops // 100)),
+    }
+
+
+def main():
+    parser = ArgumentParser(description="Board backend benchmark")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 500], help="Synthetic map sizes")
+    parser.add_argument("--ops", type=int, default=20000, help="Operations per measurement")
+    args = parser.parse_args()
+
+    config = get_config()
+    levels = {f"level {k}": v for k, v in sorted(get_level_registry().levels.items())}
+    levels.update({f"synthetic {s}x{s}": synthetic_level(s) for s in args.sizes})
+
+    rows = []
+    for name, level in levels.items():
+        results = {backend: bench_board(cls, level, config, args.ops) for backend, cls in BACKENDS.items()}
+        for op in results["dict"]:
+            rows.append([name, op, f"{results['dict'][op]:.2f}", f"{results['array'][op]:.2f}",
+                         f"{results['dict'][op] / results['array'][op]:.2f}x"])
+    print(tabulate(rows, headers=["level", "operation", "dict (us)", "array (us)", "speedup"], tablefmt="grid"))
+
+
+if __name__ == "__main__":
+    main()
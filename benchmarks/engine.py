@@ -0,0 +1,329 @@
+"""
+Throughput and latency benchmarks for the game engine and the gym environments, on the shipped levels and on large
+synthetic maps. Every operation is warmed up, then timed call by call over several repeats, and the results are written
+as JSON so runs from different commits can be compared.
+
+Usage (from the repository root):
+    python -m benchmarks.engine [--levels 1 2 3 4 5] [--sizes 100 300] [--calls 2000] [--output results.json]
+    python -m benchmarks.engine --compare baseline.json --tolerance 0.1
+"""
+from argparse import ArgumentParser
+from benchmarks.board_backends import synthetic_level
+from classes.array_board import ArrayBoard
+from classes.board import Board
+from classes.dice_rng import DiceRNG
+from datetime import datetime
+from game.dice_adventure import DiceAdventure
+from game.level_bundle import write_bundle
+from game.level_registry import get_config
+from game.level_registry import get_level_registry
+from json import dumps
+from json import loads
+from os import path
+from random import Random
+from subprocess import run
+from tabulate import tabulate
+from tempfile import mkdtemp
+from time import perf_counter
+import numpy as np
+import platform
+import sys
+
+VERSION = 1
+PLAYERS = ["Dwarf", "Giant", "Human"]
+ACTIONS = ["left", "right", "up", "down", "wait", "submit", "pinga", "pingb", "pingc", "pingd", "undo"]
+DIRECTIONS = ["left", "right", "up", "down"]
+STATE_VERSIONS = ["full", "player", "fow"]
+PERCENTILES = [50, 90, 99]
+
+
+##########
+# TIMING #
+##########
+
+def measure(fn, calls, warmup, repeats, setup=None):
+    """
+    Times an operation call by call.
+    :param fn: The operation. Called with the value returned by setup()
+    :param calls: Number of timed calls per repeat
+    :param warmup: Number of untimed calls before the first repeat
+    :param repeats: Number of repeats
+    :param setup: Called before each call, outside the timing, with the call number. Used to put the game in the
+                  state the call should start from. If None, fn is called with the call number.
+    :return: (dict) Latency statistics (microseconds) over all timed calls, and calls per second in each repeat
+    """
+    setup = setup or (lambda i: i)
+    for i in range(warmup):
+        fn(setup(i))
+    latencies = np.empty(calls * repeats)
+    throughput = []
+    for r in range(repeats):
+        total = 0.0
+        for i in range(calls):
+            arg = setup(warmup + r * calls + i)
+            start = perf_counter()
+            fn(arg)
+            elapsed = perf_counter() - start
+            latencies[r * calls + i] = elapsed
+            total += elapsed
+        throughput.append(calls / max(total, 1e-12))
+    latencies *= 1e6
+    stats = {"calls": calls * repeats,
+             "mean_us": float(latencies.mean()),
+             "max_us": float(latencies.max()),
+             # Median over repeats, so one noisy repeat doesn't skew it
+             "ops_per_sec": float(np.median(throughput)),
+             "repeat_ops_per_sec": throughput}
+    for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+        stats[f"p{p}_us"] = float(value)
+    return stats
+
+
+##########
+# LEVELS #
+##########
+
+def get_levels(level_nums, sizes, directory):
+    """
+    :param level_nums: Shipped levels to include
+    :param sizes: Sizes of the synthetic maps to include
+    :param directory: Directory to write the synthetic maps' level bundles to
+    :return: (dict) Level name to (level grid, game arguments that load it)
+    """
+    registry = get_level_registry()
+    levels = {f"level {num}": (registry[num], {"level": num, "limit_levels": [num]}) for num in level_nums}
+    for size in sizes:
+        grid = synthetic_level(size)
+        bundle_path = path.join(directory, f"synthetic_{size}.bundle")
+        write_bundle({1: grid}, bundle_path)
+        levels[f"synthetic {size}x{size}"] = (grid, {"level": 1, "limit_levels": [1], "level_bundle": bundle_path})
+    return levels
+
+
+def get_script(length, seed=0):
+    """
+    A random sequence of (player, action) calls, mostly moves with a submit now and then, so rounds keep advancing.
+    :param length: Number of calls
+    :param seed: Random seed
+    :return: (list) (player, action) pairs
+    """
+    rng = Random(seed)
+    return [(PLAYERS[i % 3], rng.choice(ACTIONS) if rng.random() < 0.7 else "submit") for i in range(length)]
+
+
+##############
+# BENCHMARKS #
+##############
+
+class GameRunner:
+    """
+    Plays a game along a script outside the timed section, starting a new game when one ends.
+    """
+    def __init__(self, game_args, length):
+        self.game_args = game_args
+        self.script = get_script(length)
+        self.game = self.new_game()
+
+    def new_game(self):
+        return DiceAdventure(**self.game_args, seed=0)
+
+    def advance(self, i):
+        """
+        Plays the script's i-th call.
+        :param i: The call number
+        :return: (DiceAdventure) The game
+        """
+        if self.game.terminated:
+            self.game = self.new_game()
+        self.game.execute_action(*self.script[i % len(self.script)])
+        return self.game
+
+
+def bench_execute_action(game_args, args):
+    runner = GameRunner(game_args, args.calls)
+
+    def setup(i):
+        if runner.game.terminated:
+            runner.game = runner.new_game()
+        return runner.script[i % len(runner.script)]
+
+    return {"execute_action": measure(lambda call: runner.game.execute_action(*call), args.calls, args.warmup,
+                                      args.repeats, setup)}
+
+
+def bench_get_state(game_args, args):
+    runner = GameRunner(game_args, args.calls)
+    results = {}
+    for version in STATE_VERSIONS:
+        def setup(i):
+            game = runner.advance(i)
+            # Measure building the state, not handing out a cached one
+            game.state_cache.clear()
+            return game
+
+        results[f"get_state[{version}]"] = measure(lambda game: game.get_state(PLAYERS[0], version), args.calls,
+                                                   args.warmup, args.repeats, setup)
+    return results
+
+
+def bench_board(grid, args):
+    config = get_config()
+    board_class = ArrayBoard if args.array_board else Board
+    board = board_class(width=len(grid[0]), height=len(grid), object_positions=grid, config=config, rng=DiceRNG(0))
+    players = ["1S", "2S", "3S"]
+    monsters = [k for k, o in board.objects.items() if o.type == "monster"] or players
+
+    def remove(i):
+        p = players[i % 3]
+        x, y = board.objects[p].x, board.objects[p].y
+        board.remove(p, delete=False)
+        return p, x, y
+
+    def place_remove(i):
+        p = players[i % 3]
+        x, y = board.objects[p].x, board.objects[p].y
+        board.remove(p, delete=False)
+        board.place(p, x, y)
+
+    return {
+        "board.place": measure(lambda a: board.place(*a), args.calls, args.warmup, args.repeats, remove),
+        "board.place+remove": measure(place_remove, args.calls, args.warmup, args.repeats),
+        "board.move_monster": measure(lambda i: board.move_monster(monsters[i % len(monsters)], list(DIRECTIONS)),
+                                      args.calls, args.warmup, args.repeats),
+    }
+
+
+def bench_env(game_args, args):
+    # The envs import the Unity socket client, which needs websockets
+    try:
+        from examples.AdiAgent.dice_adventure_python_env import DiceAdventurePythonEnv as AdiAgentEnv
+        from game.env.dice_adventure_python_env import DiceAdventurePythonEnv
+    except ImportError as e:
+        return {"env": {"skipped": str(e)}}
+    rng = Random(0)
+    actions = [rng.randrange(11) for _ in range(args.calls)]
+    results = {}
+
+    env = AdiAgentEnv(player=PLAYERS[0], **game_args)
+    env.reset(seed=0)
+    script = get_script(args.calls)
+
+    def advance(i):
+        if env.game.terminated:
+            env.reset()
+        env.game.execute_action(*script[i % len(script)])
+
+    results["adi_agent.get_observation"] = measure(lambda _: env.get_observation(), args.calls, args.warmup,
+                                                   args.repeats, advance)
+    env.reset(seed=0)
+    results["adi_agent.step"] = measure(lambda i: env.step(actions[i % len(actions)]), args.calls, args.warmup,
+                                        args.repeats)
+
+    env = DiceAdventurePythonEnv(player=PLAYERS[0], **game_args)
+    env.reset(seed=0)
+    results["env.step"] = measure(lambda i: env.step(ACTIONS[actions[i % len(actions)]]), args.calls, args.warmup,
+                                  args.repeats)
+    return results
+
+
+###########
+# RESULTS #
+###########
+
+def get_metadata(args):
+    """
+    :return: (dict) What the results were measured on
+    """
+    try:
+        commit = run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"version": VERSION,
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "args": vars(args)}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares median latencies with a baseline run.
+    :param results: (dict) Results of this run
+    :param baseline: (dict) Results of the baseline run
+    :param tolerance: Fraction a median latency may grow by before it counts as a regression
+    :return: (list, list) Table rows, and the (level, operation) pairs that regressed
+    """
+    rows = []
+    regressions = []
+    for level, ops in results["results"].items():
+        for op, stats in ops.items():
+            base = baseline["results"].get(level, {}).get(op)
+            if "p50_us" not in stats or not base or "p50_us" not in base:
+                continue
+            ratio = stats["p50_us"] / max(base["p50_us"], 1e-12)
+            regressed = ratio > 1 + tolerance
+            if regressed:
+                regressions.append((level, op))
+            rows.append([level, op, f"{base['p50_us']:.2f}", f"{stats['p50_us']:.2f}", f"{ratio:.2f}x",
+                         "REGRESSION" if regressed else ""])
+    return rows, regressions
+
+
+def main():
+    parser = ArgumentParser(description="Engine and env benchmark suite")
+    parser.add_argument("--levels", type=int, nargs="*", default=[1, 2, 3, 4, 5], help="Shipped levels")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 300], help="Synthetic map sizes")
+    parser.add_argument("--calls", type=int, default=2000, help="Timed calls per repeat")
+    parser.add_argument("--warmup", type=int, default=200, help="Untimed calls before timing")
+    parser.add_argument("--repeats", type=int, default=3, help="Repeats of each measurement")
+    parser.add_argument("--only", nargs="*", default=["execute_action", "get_state", "board", "env"],
+                        help="Benchmark groups to run")
+    parser.add_argument("--array-board", action="store_true", help="Use the NumPy-backed ArrayBoard")
+    parser.add_argument("--output", default=None, help="Path of the JSON file to write")
+    parser.add_argument("--compare", default=None, help="JSON results of a baseline run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Fraction a median latency may grow by before --compare reports a regression")
+    args = parser.parse_args()
+
+    results = {"metadata": get_metadata(args), "results": {}}
+    rows = []
+    for name, (grid, game_args) in get_levels(args.levels, args.sizes, mkdtemp()).items():
+        # Only the measured level is allowed, so sampling the next level repeats it for as long as the benchmark runs
+        game_args = dict(game_args, level_sampling=True, num_repeats=10 ** 9, round_cap=50,
+                         array_board=args.array_board)
+        level_results = {}
+        if "execute_action" in args.only:
+            level_results.update(bench_execute_action(game_args, args))
+        if "get_state" in args.only:
+            level_results.update(bench_get_state(game_args, args))
+        if "board" in args.only:
+            level_results.update(bench_board(grid, args))
+        if "env" in args.only:
+            level_results.update(bench_env(game_args, args))
+        results["results"][name] = level_results
+        for op, stats in level_results.items():
+            if "skipped" in stats:
+                rows.append([name, op, "skipped: " + stats["skipped"]])
+            else:
+                rows.append([name, op, f"{stats['ops_per_sec']:.0f}", f"{stats['mean_us']:.2f}"]
+                            + [f"{stats[f'p{p}_us']:.2f}" for p in PERCENTILES])
+    print(tabulate(rows, headers=["level", "operation", "ops/s", "mean (us)"] + [f"p{p} (us)" for p in PERCENTILES],
+                   tablefmt="grid"))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(dumps(results, indent=2))
+    if args.compare:
+        rows, regressions = compare(results, loads(open(args.compare, "r").read()), args.tolerance)
+        print(tabulate(rows, headers=["level", "operation", "baseline p50 (us)", "p50 (us)", "ratio", ""],
+                       tablefmt="grid"))
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+from classes.board import Board
+from classes.compiled_config import compile_config
+from classes.game_objects import *
+import numpy as np
+
+
+class ArrayBoard(Board):
+    """
+    Read-acceleration mirror of Board: the grid is mirrored in NumPy occupancy planes, a static wall mask, a
+    per-layer object count (one layer per object kind) and a per-layer grid of integer object ids. Validity checks and
+    combat co-location tests read the planes instead of scanning cell contents. The dict grid in `self.board` is still
+    the source of truth, so this is a drop-in replacement for Board, but every add or remove updates both the dict
+    grid and the planes and is slower than on Board. Use it where the game is dominated by queries (large levels with
+    many enemies), not for mutation-heavy workloads.
+
+    Single-cell reads and writes go through flat memoryviews of the planes, which avoids the per-call overhead of
+    NumPy scalar indexing. Whole-board queries use the NumPy arrays directly.
+    """
+    # Object kinds tracked in the occupancy planes
+    LAYERS = ("player", "monster", "trap", "stone", "pin", "shrine", "goal")
+    PLAYER = 0
+    ENEMIES = (1, 2, 3)
+
+    def __init__(self, width, height, object_positions, config, rng=None):
+        self.walls = None
+        self.layers = None
+        self.occupancy = None
+        self.object_ids = None
+        # Flat views of the planes. Index is (layer * height + y) * width + x
+        self.plane_size = None
+        self.layers_view = None
+        self.occupancy_view = None
+        self.object_ids_view = None
+        # Integer ids for objects, used in the object id grids. An id is held while its object is in at least one
+        # cell (a move adds to the new cell before removing from the old one), then goes back to the free list
+        self.id_by_index = {}
+        self.objects_by_id = []
+        self.id_refs = []
+        self.free_ids = []
+        self.layer_by_name, self.layer_by_type = self.get_layer_mappings(config)
+        super().__init__(width, height, object_positions, config, rng)
+
+    def reset_board(self, width, height, object_positions):
+        if width or height:
+            self.width = width
+            self.height = height
+        self.allocate_planes(object_positions)
+        super().reset_board(width, height, object_positions)
+
+    def allocate_planes(self, object_positions):
+        """
+        Creates empty occupancy planes and the wall mask for the given level.
+        :param object_positions: The level grid
+        :return: N/A
+        """
+        self.walls = np.array([[code == "##" for code in row] for row in object_positions], dtype=bool)
+        self.layers = np.zeros((len(self.LAYERS), self.height, self.width), dtype=np.int32)
+        self.occupancy = np.zeros((self.height, self.width), dtype=np.int32)
+        self.object_ids = np.full((len(self.LAYERS), self.height, self.width), -1, dtype=np.int32)
+        self.plane_size = self.height * self.width
+        self.create_views()
+        self.id_by_index = {}
+        self.objects_by_id = []
+        self.id_refs = []
+        self.free_ids = []
+
+    def create_views(self):
+        """
+        Creates the flat memoryviews of the occupancy planes.
+        :return: N/A
+        """
+        self.layers_view = memoryview(self.layers).cast("B").cast("i")
+        self.occupancy_view = memoryview(self.occupancy).cast("B").cast("i")
+        self.object_ids_view = memoryview(self.object_ids).cast("B").cast("i")
+
+    def __getstate__(self):
+        # Memoryviews can't be pickled or copied, so they are rebuilt from the planes
+        state = self.__dict__.copy()
+        state.update(layers_view=None, occupancy_view=None, object_ids_view=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.create_views()
+
+    @staticmethod
+    def get_layer_mappings(config):
+        """
+        Maps object names and types from the config to occupancy layers.
+        :param config: The game config
+        :return: (dict, dict) Layer index by object name, layer index by object type
+        """
+        layer_by_name = {}
+        layer_by_type = {}
+        for spec in compile_config(config).object_codes.values():
+            if spec.kind == "player":
+                layer = ArrayBoard.PLAYER
+            elif spec.type in ArrayBoard.LAYERS:
+                layer = ArrayBoard.LAYERS.index(spec.type)
+            else:
+                continue
+            layer_by_name[spec.name] = layer
+            layer_by_type[spec.type] = layer
+        return layer_by_name, layer_by_type
+
+    ##########################
+    # POSITIONING & MOVEMENT #
+    ##########################
+
+    def check_valid_move(self, x, y, avoid=None, allow_wall=False):
+        """
+        Checks whether the given x,y position is a valid position for movement/placement. Same rules as
+        Board.check_valid_move(), answered from the occupancy planes.
+        :param x: Specifies the x location to move/place to
+        :param y: Specifies the y location to move/place to
+        :return: True/False
+        """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            i = y * self.width + x
+            if self.occupancy_view[i]:
+                if avoid:
+                    for name in avoid:
+                        layer = self.layer_by_name.get(name)
+                        if layer is not None and self.layers_view[layer * self.plane_size + i]:
+                            return False
+                return True
+            elif allow_wall:
+                return True
+        return False
+
+    def get_enterable(self, cells, avoid):
+        enterable = self.occupancy.ravel()[cells] > 0
+        for name in avoid:
+            layer = self.layer_by_name.get(name)
+            if layer is not None:
+                enterable &= self.layers[layer].ravel()[cells] == 0
+        return enterable
+
+    def add_to_cell(self, obj_index, obj, x, y):
+        if obj_index not in self.board[(y,x)]:
+            i = y * self.width + x
+            j = self.layer_by_type[obj.type] * self.plane_size + i
+            self.layers_view[j] += 1
+            self.occupancy_view[i] += 1
+            obj_id = self.get_object_id(obj_index, obj)
+            self.id_refs[obj_id] += 1
+            self.object_ids_view[j] = obj_id
+        super().add_to_cell(obj_index, obj, x, y)
+
+    def remove_from_cell(self, obj_index, x, y):
+        cell = self.board[(y,x)]
+        obj = cell.get(obj_index)
+        super().remove_from_cell(obj_index, x, y)
+        if obj is not None:
+            i = y * self.width + x
+            layer = self.layer_by_type[obj.type]
+            j = layer * self.plane_size + i
+            self.layers_view[j] -= 1
+            self.occupancy_view[i] -= 1
+            obj_id = self.id_by_index.get(obj_index)
+            if obj_id is not None and self.objects_by_id[obj_id] is not obj:
+                obj_id = None
+            if not self.layers_view[j]:
+                self.object_ids_view[j] = -1
+            elif self.object_ids_view[j] == obj_id:
+                # Another object of the same kind is still in this cell
+                replacement = next(k for k, o in cell.items() if self.layer_by_type[o.type] == layer)
+                self.object_ids_view[j] = self.get_object_id(replacement, cell[replacement])
+            if obj_id is not None:
+                self.release_object_id(obj_index, obj_id)
+
+    def get_object_id(self, obj_index, obj):
+        """
+        Gets the integer id used for the given object in the object id grids, assigning one if needed.
+        :param obj_index: The index of the object
+        :param obj: The object
+        :return: (int) The object id
+        """
+        obj_id = self.id_by_index.get(obj_index)
+        if obj_id is None or self.objects_by_id[obj_id] is not obj:
+            if self.free_ids:
+                obj_id = self.free_ids.pop()
+                self.objects_by_id[obj_id] = obj
+                self.id_refs[obj_id] = 0
+            else:
+                obj_id = len(self.objects_by_id)
+                self.objects_by_id.append(obj)
+                self.id_refs.append(0)
+            self.id_by_index[obj_index] = obj_id
+        return obj_id
+
+    def release_object_id(self, obj_index, obj_id):
+        """
+        Drops one cell's hold on an object id. Once the object is in no cell, the id is put on the free list.
+        :param obj_index: The index of the object
+        :param obj_id: The object's id
+        :return: N/A
+        """
+        self.id_refs[obj_id] -= 1
+        if not self.id_refs[obj_id]:
+            self.objects_by_id[obj_id] = None
+            del self.id_by_index[obj_index]
+            self.free_ids.append(obj_id)
+
+    def object_at(self, layer, x, y):
+        """
+        Gets an object of the given kind at the x,y position.
+        :param layer: The name of the layer (see ArrayBoard.LAYERS)
+        :param x: The x position
+        :param y: The y position
+        :return: (GameObject) The object, or None if there is no object of that kind at the position
+        """
+        obj_id = self.object_ids_view[self.LAYERS.index(layer) * self.plane_size + y * self.width + x]
+        return None if obj_id < 0 else self.objects_by_id[obj_id]
+
+    ####################
+    # SNAPSHOT/RESTORE #
+    ####################
+
+    def restore(self, snap, object_positions=None):
+        # Start from empty planes. They are filled as the restored objects are added back to their cells
+        self.width = snap.width
+        self.height = snap.height
+        self.allocate_planes(self.object_positions if object_positions is None else object_positions)
+        super().restore(snap, object_positions)
+
+    ##########
+    # COMBAT #
+    ##########
+
+    def has_combat(self, x, y):
+        layers, size = self.layers_view, self.plane_size
+        i = y * self.width + x
+        return bool(layers[self.PLAYER * size + i]) \
+            and bool(layers[size + i] or layers[2 * size + i] or layers[3 * size + i])
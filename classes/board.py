@@ -1,20 +1,43 @@
 from collections import Counter
 from collections import defaultdict
-from random import shuffle
-import re
 from tabulate import tabulate
+import numpy as np
+from classes.compiled_config import compile_config
+from classes.dice_rng import DiceRNG
 from classes.game_objects import *
+from classes.navigation import get_navigation
 
 
 class Board:
-    def __init__(self, width, height, object_positions, config):
+    # Index type of players (other objects are indexed by their type)
+    PLAYER_TYPE = "player"
+    ENEMY_TYPES = ("monster", "trap", "stone")
+    # Objects monsters can't move onto
+    MONSTER_AVOID = ("Stone", "Trap")
+    # Fewer monsters than this are moved one at a time by move_monsters(), which is faster for small counts
+    BULK_MOVE_MIN = 16
+
+    def __init__(self, width, height, object_positions, config, rng=None):
         self.width = None
         self.height = None
         self.board = None
         self.objects = None
+        # Objects by index type (see get_index_type()), in the same order as self.objects
+        self.objects_by_type = None
+        # Number of objects of each index type in each occupied grid cell
+        self.cells_by_type = None
+        self.object_positions = None
+        # Neighbor tables and distance fields for the level. Shared between all boards on the same level
+        self.navigation = None
         self.config = config
+        # Object code to ObjectSpec, compiled once per config
+        self.specs = compile_config(config).object_codes
         # Keeps track of object counts for indexing purposes
         self.obj_counts = None
+        # Incremented on every change to the grid. Used to tell whether views built from the board are still current
+        self.generation = 0
+        # Random stream for monster movement. Games pass in their own so that all of their draws come from one seed
+        self.rng = rng if rng is not None else DiceRNG()
         # Initialize board
         self.reset_board(width, height, object_positions)
 
@@ -22,12 +45,16 @@ class Board:
 
         self.board = defaultdict(dict)
         self.objects = {}
+        self.objects_by_type = defaultdict(dict)
+        self.cells_by_type = defaultdict(dict)
         # Keeps track of object counts for indexing purposes
         self.obj_counts = Counter()
 
         if width or height:
             self.width = width
             self.height = height
+        self.object_positions = object_positions
+        self.navigation = get_navigation(object_positions)
 
         for y in range(self.height):
             for x in range(self.width):
@@ -37,8 +64,8 @@ class Board:
                     self.board[(y,x)] = {}
                 else:
                     obj = self.create_object(x, y, object_positions[y][x])
-                    self.board[(y,x)][obj.index] = obj
-                    self.objects[obj.index] = obj
+                    self.add_to_cell(obj.index, obj, x, y)
+                    self.add_object(obj.index, obj)
 
     def create_object(self, x_pos, y_pos, obj_code, placed_by=None):
         """
@@ -53,63 +80,62 @@ class Board:
         index = obj_code
         if self.obj_counts[obj_code] > 1:
             index += f"({self.obj_counts[obj_code]})"
+        spec = self.specs[obj_code]
         # Player objects
-        if re.match("\\dS", obj_code):
+        if spec.kind == "player":
             obj = Player(obj_code=obj_code,
                          index=index,
                          index_num=self.obj_counts[obj_code],
-                         name=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["NAME"],
+                         name=spec.name,
                          x=x_pos,
                          y=y_pos,
-                         action_points=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["ACTION_POINTS"],
-                         health=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["HEALTH"],
-                         sight_range=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["SIGHT_RANGE"],
-                         dice_rolls=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["DICE_ROLLS"])
+                         action_points=spec.action_points,
+                         health=spec.health,
+                         sight_range=spec.sight_range,
+                         dice_rolls=spec.dice_rolls)
+            obj.update_seen_locations(self.get_window_mask(x_pos, y_pos, obj.sight_range))
         # Enemy objects
-        elif re.match("(M\\d|S\\d|T\\d)", obj_code):
+        elif spec.kind == "enemy":
             obj = Enemy(obj_code=obj_code,
                         index=index,
                         index_num=self.obj_counts[obj_code],
-                        name=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["NAME"],
-                        type_=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["TYPE"],
+                        name=spec.name,
+                        type_=spec.type,
                         x=x_pos,
                         y=y_pos,
-                        dice_rolls=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["DICE_ROLLS"],
-                        action_points=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["ACTION_POINTS"]
-                        if obj_code[0] == "M" else None)
-        # Special objects
+                        dice_rolls=spec.dice_rolls,
+                        action_points=spec.action_points)
+        # Walls and empty spaces don't get their own python objects
+        elif spec.kind in ("wall", "empty"):
+            obj = None
+        # Tower object
+        elif spec.kind == "tower":
+            obj = Tower(obj_code=obj_code,
+                        index=index,
+                        index_num=self.obj_counts[obj_code],
+                        name=spec.name,
+                        type_=spec.type,
+                        x=x_pos,
+                        y=y_pos)
+        # Shrine objects
+        elif spec.kind == "shrine":
+            obj = Shrine(obj_code=obj_code,
+                         index=index,
+                         index_num=self.obj_counts[obj_code],
+                         name=spec.name,
+                         type_=spec.type,
+                         x=x_pos,
+                         y=y_pos,
+                         player_code=obj_code[0])
+        # Pin objects
         else:
-            # Walls and empty spaces don't get their own python objects
-            if obj_code in ["##", ".."]:
-                obj = None
-            # Tower object
-            elif obj_code == "**":
-                obj = Tower(obj_code=obj_code,
-                            index=index,
-                            index_num=self.obj_counts[obj_code],
-                            name=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["NAME"],
-                            type_=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["TYPE"],
-                            x=x_pos,
-                            y=y_pos)
-            # Shrine objects
-            elif re.match("\\dG", obj_code):
-                obj = Shrine(obj_code=obj_code,
-                             index=index,
-                             index_num=self.obj_counts[obj_code],
-                             name=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["NAME"],
-                             type_=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["TYPE"],
-                             x=x_pos,
-                             y=y_pos,
-                             player_code=obj_code[0])
-            # Pin objects
-            else:
-                obj = Pin(obj_code=obj_code,
-                          index=index,
-                          index_num=self.obj_counts[obj_code],
-                          x=x_pos,
-                          y=y_pos,
-                          placed_by=placed_by,
-                          type_=self.config["OBJECT_INFO"]["OBJECT_CODES"][obj_code]["TYPE"])
+            obj = Pin(obj_code=obj_code,
+                      index=index,
+                      index_num=self.obj_counts[obj_code],
+                      x=x_pos,
+                      y=y_pos,
+                      placed_by=placed_by,
+                      type_=spec.type)
 
         return obj
 
@@ -138,8 +164,11 @@ class Board:
         return False
 
     def valid_move(self, x, y, action):
-        mapping = {"left": (x-1, y), "right": (x+1, y), "up": (x, y+1), "down": (x, y-1), "wait": (x, y)}
-        return self.check_valid_move(*mapping[action])
+        if action == "wait":
+            return self.check_valid_move(x, y)
+        # Moves out of the level or into a wall are ruled out by the level's neighbor table
+        target = self.navigation.moves[action][y * self.width + x]
+        return target is not None and self.check_valid_move(*target)
 
     def update_location_by_direction(self, action, x, y, avoid=None, allow_wall=False):
         """
@@ -154,6 +183,12 @@ class Board:
         """
         if action == "wait":
             pass
+        elif not allow_wall:
+            # Moves out of the level or into a wall are ruled out by the level's neighbor table
+            moves = self.navigation.moves.get(action)
+            target = moves[y * self.width + x] if moves is not None else None
+            if target is not None and self.check_valid_move(*target, avoid=avoid):
+                return target
         elif action == "left" and self.check_valid_move(x-1, y, avoid=avoid, allow_wall=allow_wall):
             x -= 1
         elif action == "right" and self.check_valid_move(x+1, y, avoid=avoid, allow_wall=allow_wall):
@@ -175,14 +210,82 @@ class Board:
         y = self.objects[m].y
         # old_pos = (x, y)
 
-        shuffle(directions)
+        self.rng.shuffle(directions)
         while directions:
             op = directions.pop()
-            new_x, new_y = self.update_location_by_direction(op, x, y, avoid=["Stone", "Trap"])
+            new_x, new_y = self.update_location_by_direction(op, x, y, avoid=self.MONSTER_AVOID)
             if x != new_x or y != new_y:
                 self.place(m, new_x, new_y, old_x=x, old_y=y)
                 break
 
+    def move_monsters(self, indexes, directions):
+        """
+        Moves each of the given monsters one step, in order. Same random walk as calling move_monster() for each of
+        them, down to the draws taken from the random stream, but the directions for all monsters are sampled in one
+        go and their legal moves are looked up together.
+        :param indexes: (list) The monsters to move
+        :param directions: (list) The directions monsters can move in
+        :return: N/A
+        """
+        if len(indexes) < self.BULK_MOVE_MIN:
+            for m in indexes:
+                self.move_monster(m, list(directions))
+            return
+        n = len(indexes)
+        num_dirs = len(directions)
+        monsters = [self.objects[m] for m in indexes]
+        cells = np.array([m.y * self.width + m.x for m in monsters], dtype=np.int64)
+        # Shuffle each monster's directions (Fisher-Yates, same draws and order as DiceRNG.shuffle())
+        draws = self.rng.random_array(n * (num_dirs - 1)).reshape((n, num_dirs - 1))
+        order = np.tile(np.arange(num_dirs), (n, 1))
+        rows = np.arange(n)
+        for step, i in enumerate(range(num_dirs - 1, 0, -1)):
+            j = (draws[:, step] * (i + 1)).astype(np.int64)
+            swapped = order[rows, j]
+            order[rows, j] = order[rows, i]
+            order[rows, i] = swapped
+        # Directions are tried from the end of the shuffled list
+        targets = self.navigation.get_neighbor_array(directions)[cells[:, None], order[:, ::-1]]
+        valid = targets >= 0
+        cells, inverse = np.unique(targets[valid], return_inverse=True)
+        valid[valid] = self.get_enterable(cells, self.MONSTER_AVOID)[inverse]
+        first = np.where(valid.any(axis=1), valid.argmax(axis=1), -1).tolist()
+        targets = targets.tolist()
+        valid = valid.tolist()
+
+        # Moving out of a cell can leave it empty, which rules it out for the monsters that follow
+        emptied = set()
+        for k, m in enumerate(monsters):
+            choice = first[k]
+            if choice < 0:
+                continue
+            row = targets[k]
+            if row[choice] in emptied:
+                choice = next((t for t in range(choice + 1, num_dirs) if valid[k][t] and row[t] not in emptied), -1)
+                if choice < 0:
+                    continue
+            # Same steps as place()
+            x, y = m.x, m.y
+            m.x = row[choice] % self.width
+            m.y = row[choice] // self.width
+            self.add_to_cell(m.index, m, m.x, m.y)
+            self.remove_from_cell(m.index, x, y)
+            if not self.board[(y, x)]:
+                emptied.add(y * self.width + x)
+
+    def get_enterable(self, cells, avoid):
+        """
+        Checks which cells can be moved onto (see check_valid_move()). Cells must be inside the level.
+        :param cells: (np.ndarray) Cell indexes (y * width + x)
+        :param avoid: Names of objects that block movement
+        :return: (np.ndarray) True for each cell that can be moved onto
+        """
+        enterable = np.zeros(len(cells), dtype=bool)
+        for k, i in enumerate(cells.tolist()):
+            cell = self.board[(i // self.width, i % self.width)]
+            enterable[k] = bool(cell) and not any(obj.name in avoid for obj in cell.values())
+        return enterable
+
     def move(self, obj_index, action, x=None, y=None, old_pos=None, delete=False):
         """
         Moves the given object according to the given action
@@ -224,20 +327,23 @@ class Board:
         """
         if create:
             new_obj = self.create_object(x, y, obj_index, placed_by=placed_by)
-            self.board[(y,x)][obj_index] = new_obj
-            self.objects[obj_index] = new_obj
+            # Index by the new object's unique index, since several objects can share the same object code
+            obj_index = new_obj.index
+            self.add_to_cell(obj_index, new_obj, x, y)
+            self.add_object(obj_index, new_obj)
         else:
             # Update location of object
             self.objects[obj_index].x = x
             self.objects[obj_index].y = y
-            self.board[(y,x)][obj_index] = self.objects[obj_index]
+            self.add_to_cell(obj_index, self.objects[obj_index], x, y)
 
             # Remove obj from old position if it was previously on the grid
             if old_x is not None:
                 self.remove(obj_index, old_x, old_y, delete=delete)
         # Track grid locations players have been to in order to apply fog of war masking
         if isinstance(self.objects[obj_index], Player):
-            self.objects[obj_index].update_seen_locations()
+            player = self.objects[obj_index]
+            player.update_seen_locations(self.get_window_mask(x, y, player.sight_range))
 
     def remove(self, obj_index, x=None, y=None, delete=True):
         """
@@ -253,10 +359,63 @@ class Board:
             x = self.objects[obj_index].x
             y = self.objects[obj_index].y
         # Delete object from board
-        self.board[(y,x)] = {k: v for k, v in self.board[(y,x)].items() if k != obj_index}
+        self.remove_from_cell(obj_index, x, y)
         # In this case, should delete object entirely (from game)
         if delete:
-            del self.objects[obj_index]
+            self.delete_object(obj_index)
+
+    def add_to_cell(self, obj_index, obj, x, y):
+        """
+        Adds the given object to the contents of the x,y grid cell. All additions to the grid go through here.
+        :param obj_index: The index of the object to add
+        :param obj: The object to add
+        :param x: The x position of the cell
+        :param y: The y position of the cell
+        :return: N/A
+        """
+        cell = self.board[(y,x)]
+        if obj_index not in cell:
+            counts = self.cells_by_type[self.get_index_type(obj)]
+            counts[(y,x)] = counts.get((y,x), 0) + 1
+        cell[obj_index] = obj
+        self.generation += 1
+
+    def remove_from_cell(self, obj_index, x, y):
+        """
+        Removes the given object from the contents of the x,y grid cell, if present. All removals from the grid go
+        through here.
+        :param obj_index: The index of the object to remove
+        :param x: The x position of the cell
+        :param y: The y position of the cell
+        :return: N/A
+        """
+        obj = self.board[(y,x)].pop(obj_index, None)
+        if obj is not None:
+            counts = self.cells_by_type[self.get_index_type(obj)]
+            if counts[(y,x)] > 1:
+                counts[(y,x)] -= 1
+            else:
+                del counts[(y,x)]
+        self.generation += 1
+
+    def add_object(self, obj_index, obj):
+        """
+        Adds the given object to the game's objects. All additions to self.objects go through here.
+        :param obj_index: The index of the object
+        :param obj: The object
+        :return: N/A
+        """
+        self.objects[obj_index] = obj
+        self.objects_by_type[self.get_index_type(obj)][obj_index] = obj
+
+    def delete_object(self, obj_index):
+        """
+        Deletes the given object from the game's objects. All deletions from self.objects go through here.
+        :param obj_index: The index of the object
+        :return: N/A
+        """
+        obj = self.objects.pop(obj_index)
+        del self.objects_by_type[self.get_index_type(obj)][obj_index]
 
     def multi_remove(self, objs):
         """
@@ -271,6 +430,138 @@ class Board:
                 obj_index = o
             self.remove(obj_index)
 
+    ####################
+    # SNAPSHOT/RESTORE #
+    ####################
+
+    def snapshot(self):
+        """
+        Captures the positions and state of every object on the board. Walls and empty spaces are not stored since
+        they can be rebuilt from the level.
+        :return: (BoardSnapshot) The snapshot
+        """
+        return BoardSnapshot(width=self.width,
+                             height=self.height,
+                             objects=tuple((k, obj.snapshot()) for k, obj in self.objects.items()),
+                             cells=tuple((pos, tuple(cell)) for pos, cell in self.board.items() if cell),
+                             obj_counts=tuple(self.obj_counts.items()))
+
+    def restore(self, snap, object_positions=None):
+        """
+        Restores the board to the state captured by snapshot().
+        :param snap: The snapshot to restore
+        :param object_positions: The level the snapshot was taken on. Only needed if it differs from the current one.
+        :return: N/A
+        """
+        if object_positions is None or object_positions is self.object_positions:
+            # Same level, so only cells that currently hold objects need clearing
+            for obj in self.objects.values():
+                self.board[(obj.y, obj.x)] = {}
+        else:
+            self.width = snap.width
+            self.height = snap.height
+            self.object_positions = object_positions
+            self.navigation = get_navigation(object_positions)
+            self.board = defaultdict(dict)
+            for y in range(self.height):
+                for x in range(self.width):
+                    self.board[(y, x)] = None if object_positions[y][x] == "##" else {}
+
+        self.objects = {}
+        self.objects_by_type = defaultdict(dict)
+        for k, obj_snap in snap.objects:
+            self.add_object(k, GameObject.from_snapshot(obj_snap))
+        self.cells_by_type = defaultdict(dict)
+        for pos, indexes in snap.cells:
+            self.board[pos] = {}
+            for i in indexes:
+                self.add_to_cell(i, self.objects[i], pos[1], pos[0])
+        self.obj_counts = Counter(dict(snap.obj_counts))
+        self.generation += 1
+
+    ###########
+    # INDEXES #
+    ###########
+
+    def get_index_type(self, obj):
+        """
+        Gets the type an object is indexed under: "player" for players, otherwise the object's type (e.g., "monster").
+        :param obj: The object
+        :return: (string) The index type
+        """
+        return self.PLAYER_TYPE if isinstance(obj, Player) else obj.type
+
+    def get_objects(self, *types):
+        """
+        Gets every object of the given index types (see get_index_type()).
+        :param types: The index types, e.g. "monster" or "player"
+        :return: (list) The objects, in the same order as self.objects for a single type
+        """
+        if len(types) == 1:
+            return list(self.objects_by_type[types[0]].values())
+        return [obj for t in types for obj in self.objects_by_type[t].values()]
+
+    def get_objects_at(self, x, y, *types):
+        """
+        Gets the objects of the given index types in the x,y grid cell.
+        :return: (list) The objects, in the cell's order
+        """
+        cell = self.board.get((y,x))
+        if not cell:
+            return []
+        return [obj for obj in cell.values() if self.get_index_type(obj) in types]
+
+    def get_occupied_cells(self, type_):
+        """
+        Gets the grid cells holding at least one object of the given index type.
+        :param type_: The index type
+        :return: (dict) (y, x) position to the number of objects of that type there
+        """
+        return self.cells_by_type[type_]
+
+    ##############
+    # VISIBILITY #
+    ##############
+
+    def get_window_mask(self, x, y, radius):
+        """
+        Gets a bitmask of the grid cells within `radius` of the x,y position, clipped to the board. The bit for a cell
+        is y * width + x.
+        :param x: The x position at the center of the window
+        :param y: The y position at the center of the window
+        :param radius: The distance from the center to the edge of the window
+        :return: (int) The bitmask
+        """
+        x_lower, x_upper = max(x - radius, 0), min(x + radius, self.width - 1)
+        if x_upper < x_lower:
+            return 0
+        row = (1 << (x_upper - x_lower + 1)) - 1
+        mask = 0
+        for j in range(max(y - radius, 0), min(y + radius, self.height - 1) + 1):
+            mask |= row << (j * self.width + x_lower)
+        return mask
+
+    def get_window_positions(self, x, y, radius):
+        """
+        Gets the grid positions within `radius` of the x,y position, clipped to the board.
+        :return: (list) (y, x) positions, in the same order as self.board
+        """
+        x_range = range(max(x - radius, 0), min(x + radius, self.width - 1) + 1)
+        return [(j, i) for j in range(max(y - radius, 0), min(y + radius, self.height - 1) + 1) for i in x_range]
+
+    def get_mask_positions(self, mask):
+        """
+        Gets the grid positions whose bits are set in the given mask.
+        :param mask: A bitmask of grid cells (see get_window_mask())
+        :return: (list) (y, x) positions, in the same order as self.board
+        """
+        if not mask:
+            return []
+        bits = np.unpackbits(np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, "little"), dtype=np.uint8),
+                             bitorder="little")
+        indexes = np.flatnonzero(bits)
+        return list(zip((indexes // self.width).tolist(), (indexes % self.width).tolist()))
+
     ################
     # GOAL TESTING #
     ################
@@ -285,6 +576,32 @@ class Board:
         return self.objects[player].x == self.objects[obj].x \
             and self.objects[player].y == self.objects[obj].y
 
+    ##########
+    # COMBAT #
+    ##########
+
+    def has_combat(self, x, y):
+        """
+        Checks whether players and enemies are co-located at the given x,y position, which would initiate combat.
+        :param x: The x position to check
+        :param y: The y position to check
+        :return: True/False
+        """
+        pos = (y,x)
+        return pos in self.cells_by_type[self.PLAYER_TYPE] \
+            and any([pos in self.cells_by_type[t] for t in self.ENEMY_TYPES])
+
+    def combat_locations(self):
+        """
+        Finds every grid cell where at least one player and one enemy are co-located.
+        :return: (list) (y, x) positions
+        """
+        return sorted([pos for pos in self.cells_by_type[self.PLAYER_TYPE] if self.has_combat(pos[1], pos[0])])
+
+    #############
+    # RENDERING #
+    #############
+
     def print_board(self, render_verbose=False, level=None, phase=None):
         if render_verbose:
             info = [
@@ -322,3 +639,15 @@ class Board:
     ###########
 
 
+class BoardSnapshot:
+    """
+    Picklable record of a board's objects and cell contents.
+    """
+    __slots__ = ("width", "height", "objects", "cells", "obj_counts")
+
+    def __init__(self, width, height, objects, cells, obj_counts):
+        self.width = width
+        self.height = height
+        self.objects = objects
+        self.cells = cells
+        self.obj_counts = obj_counts
@@ -0,0 +1,153 @@
+import re
+from classes.immutable import FrozenDict
+from typing import NamedTuple
+from typing import Optional
+
+# Compiled form of each config seen by this process. Keyed by the id of the config; the entry keeps the config alive so
+# the id can't be reused
+_compiled = {}
+
+
+def compile_config(config):
+    """
+    Returns the compiled form of a game config, building it the first time the config is seen in this process. Configs
+    from get_config() are shared, so each is only compiled once.
+    :param config: The game config (as returned by get_config())
+    :return: (CompiledConfig) The shared compiled config
+    """
+    compiled = _compiled.get(id(config))
+    if compiled is None or compiled.config is not config:
+        compiled = _compiled[id(config)] = CompiledConfig.build(config)
+    return compiled
+
+
+class ObjectSpec(NamedTuple):
+    """
+    Everything the game needs to know about one object code.
+    """
+    code: str
+    # One of player, enemy, shrine, tower, pin, wall, empty
+    kind: str
+    name: str
+    type: str
+    action_points: Optional[int]
+    max_points: Optional[int]
+    health: Optional[int]
+    sight_range: Optional[int]
+    # Players: dice per enemy kind. Enemies: their own dice
+    dice_rolls: Optional[FrozenDict]
+
+
+class ActionSpec(NamedTuple):
+    """
+    Action sets for each planning phase.
+    """
+    # In config order, which is the order monsters try directions in
+    directions: tuple
+    pin_actions: frozenset
+    pin_types: frozenset
+    # Everything accepted during pin planning (pin actions and pin types)
+    pin_planning: frozenset
+    move_actions: frozenset
+
+
+class PhaseSpec(NamedTuple):
+    phases: tuple
+    pinning: str
+    planning: str
+    player_execution: str
+    enemy_execution: str
+
+
+class CompiledConfig(NamedTuple):
+    """
+    The parts of the game config used while playing, compiled into flat read-only tables so hot paths don't walk
+    nested dicts or match object codes against regexes.
+    """
+    # Object code to ObjectSpec
+    object_codes: FrozenDict
+    # Player name to object code
+    player_codes: FrozenDict
+    # Pin type to object code
+    pin_codes: FrozenDict
+    actions: ActionSpec
+    phases: PhaseSpec
+    # Enemy size classes in size order (S, M, L, XL)
+    size_classes: tuple
+    # The config this was compiled from
+    config: FrozenDict
+
+    @staticmethod
+    def build(config):
+        """
+        Compiles a game config.
+        :param config: The game config
+        :return: (CompiledConfig) The compiled config
+        """
+        object_codes = {}
+        for code, info in config["OBJECT_INFO"]["OBJECT_CODES"].items():
+            kind = CompiledConfig.get_kind(code)
+            object_codes[code] = ObjectSpec(
+                code=code,
+                kind=kind,
+                name=info["NAME"],
+                type=info["TYPE"],
+                # Only players and monsters act. Traps and stones never get action points
+                action_points=info.get("ACTION_POINTS") if kind == "player" or code[0] == "M" else None,
+                max_points=info.get("MAX_POINTS"),
+                health=info.get("HEALTH"),
+                sight_range=info.get("SIGHT_RANGE"),
+                dice_rolls=info.get("DICE_ROLLS")
+            )
+        actions = config["GAMEPLAY"]["ACTIONS"]
+        phases = config["GAMEPLAY"]["PHASES"]
+        return CompiledConfig(
+            object_codes=FrozenDict(object_codes),
+            player_codes=config["OBJECT_INFO"]["PLAYERS"]["PLAYER_CODE_MAPPING"],
+            pin_codes=config["OBJECT_INFO"]["OTHER"]["PIN"]["PIN_CODE_MAPPING"],
+            actions=ActionSpec(
+                directions=tuple(actions["DIRECTIONS"]),
+                pin_actions=frozenset(actions["VALID_PIN_ACTIONS"]),
+                pin_types=frozenset(actions["VALID_PIN_TYPES"]),
+                pin_planning=frozenset(actions["VALID_PIN_ACTIONS"]) | frozenset(actions["VALID_PIN_TYPES"]),
+                move_actions=frozenset(actions["VALID_MOVE_ACTIONS"])
+            ),
+            phases=PhaseSpec(
+                phases=tuple(phases["PHASE_LIST"]),
+                pinning=phases["PINNING_PHASE_NAME"],
+                planning=phases["PLANNING_PHASE_NAME"],
+                player_execution=phases["PLAYER_EXECUTION_PHASE_NAME"],
+                enemy_execution=phases["ENEMY_EXECUTION_PHASE_NAME"]
+            ),
+            size_classes=tuple(sorted(config["OBJECT_INFO"]["ENEMIES"]["ENEMY_SIZE_MAPPING"],
+                                      key=config["OBJECT_INFO"]["ENEMIES"]["ENEMY_SIZE_MAPPING"].get)),
+            config=config
+        )
+
+    @staticmethod
+    def get_kind(code):
+        """
+        Works out what kind of object a code is from its format.
+        :param code: The object code
+        :return: (string) One of player, enemy, shrine, tower, pin, wall, empty
+        """
+        if re.match("\\dS", code):
+            return "player"
+        if re.match("(M\\d|S\\d|T\\d)", code):
+            return "enemy"
+        if code == "##":
+            return "wall"
+        if code == "..":
+            return "empty"
+        if code == "**":
+            return "tower"
+        if re.match("\\dG", code):
+            return "shrine"
+        return "pin"
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Read-only, so copies of a game can share the original
+        return self
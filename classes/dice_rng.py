@@ -0,0 +1,128 @@
+from bisect import bisect_right
+from copy import copy
+from copy import deepcopy
+from itertools import accumulate
+import numpy as np
+
+
+class DiceRNG:
+    """
+    Random number stream owned by a single game. Draws come from a buffer of uniform floats that is refilled in bulk
+    from a NumPy generator, so a dice roll or shuffle step costs a list lookup instead of a call into the random module.
+
+    The stream only depends on the seed, so a game given the same seed and actions replays identically in any process.
+    """
+    def __init__(self, seed=None, buffer_size=1024):
+        """
+        :param seed: Seed for the generator. If None, fresh entropy is drawn from the OS.
+        :param buffer_size: Number of draws generated per refill
+        """
+        self.buffer_size = buffer_size
+        self.generator = None
+        # Generator state from just before the current buffer was filled. Used to rebuild the buffer on setstate()
+        self.fill_state = None
+        self.buffer = None
+        self.position = 0
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """
+        Restarts the stream from the given seed.
+        :param seed: Seed for the generator. If None, fresh entropy is drawn from the OS.
+        :return: N/A
+        """
+        self.generator = np.random.default_rng(seed)
+        self.refill()
+
+    def __deepcopy__(self, memo):
+        # Draws are immutable floats, so the buffer only needs a shallow copy
+        rng = copy(self)
+        rng.generator = deepcopy(self.generator, memo)
+        rng.buffer = list(self.buffer)
+        return rng
+
+    def refill(self):
+        """
+        Replaces the buffer with the next batch of draws.
+        :return: N/A
+        """
+        self.fill_state = self.generator.bit_generator.state
+        self.buffer = self.generator.random(self.buffer_size).tolist()
+        self.position = 0
+
+    def random(self):
+        """
+        :return: (float) The next draw, uniform in [0, 1)
+        """
+        if self.position == self.buffer_size:
+            self.refill()
+        value = self.buffer[self.position]
+        self.position += 1
+        return value
+
+    def random_array(self, k):
+        """
+        :param k: Number of draws
+        :return: (np.ndarray) The next k draws, the same values k calls to random() would return
+        """
+        values = self.buffer[self.position:self.position + k]
+        self.position += len(values)
+        while len(values) < k:
+            self.refill()
+            self.position = min(k - len(values), self.buffer_size)
+            values += self.buffer[:self.position]
+        return np.array(values)
+
+    def randrange(self, n):
+        """
+        :param n: Number of outcomes. Must be positive.
+        :return: (int) A uniform integer in [0, n)
+        """
+        return int(self.random() * n)
+
+    def choice(self, seq):
+        """
+        :param seq: A non-empty sequence
+        :return: A uniformly chosen element of the sequence
+        """
+        return seq[int(self.random() * len(seq))]
+
+    def weighted_choice(self, seq, weights):
+        """
+        :param seq: A non-empty sequence
+        :param weights: Non-negative weight of each element, not all zero
+        :return: An element of the sequence, chosen with probability proportional to its weight
+        """
+        cumulative = list(accumulate(weights))
+        if not cumulative or cumulative[-1] <= 0:
+            raise ValueError("Weighted choice needs at least one positive weight.")
+        return seq[min(bisect_right(cumulative, self.random() * cumulative[-1]), len(seq) - 1)]
+
+    def shuffle(self, seq):
+        """
+        Shuffles a list in place (Fisher-Yates).
+        :param seq: The list to shuffle
+        :return: N/A
+        """
+        for i in range(len(seq) - 1, 0, -1):
+            j = int(self.random() * (i + 1))
+            seq[i], seq[j] = seq[j], seq[i]
+
+    def getstate(self):
+        """
+        :return: (tuple) The position in the stream. Small and picklable; the buffer itself is not included.
+        """
+        return self.fill_state, self.position
+
+    def setstate(self, state):
+        """
+        Returns the stream to a position captured by getstate().
+        :param state: The state to return to
+        :return: N/A
+        """
+        fill_state, position = state
+        # No need to regenerate the buffer if it hasn't been refilled since
+        if fill_state is not self.fill_state:
+            self.generator.bit_generator.state = fill_state
+            self.refill()
+        self.position = position
@@ -1,7 +1,7 @@
-from random import choice
-
-
 class GameObject:
+    # Attributes holding mutable containers, paired with the type used to rebuild them from a snapshot
+    container_fields = ()
+
     def __init__(self, obj_code, index, index_num, x, y, type_):
         self.obj_code = obj_code
         self.index = index
@@ -10,6 +10,31 @@ class GameObject:
         self.x = x
         self.y = y
 
+    def snapshot(self):
+        """
+        Captures the state of this object. Containers are stored as immutable copies, so the snapshot can be
+        restored any number of times.
+        :return: (tuple) The object's class and its attributes
+        """
+        state = self.__dict__.copy()
+        for field, container in self.container_fields:
+            state[field] = frozenset(state[field]) if container is set else tuple(state[field])
+        return type(self), state
+
+    @staticmethod
+    def from_snapshot(snap):
+        """
+        Rebuilds an object from the output of snapshot().
+        :param snap: The snapshot to rebuild from
+        :return: (GameObject) A new object
+        """
+        cls, state = snap
+        obj = cls.__new__(cls)
+        obj.__dict__.update(state)
+        for field, container in cls.container_fields:
+            setattr(obj, field, container(state[field]))
+        return obj
+
 
 class Goal(GameObject):
     def __init__(self, obj_code, index, index_num, name, type_, x, y):
@@ -42,17 +67,19 @@ class Enemy(GameObject):
         self.dice_rolls = dice_rolls
         self.action_points = action_points
 
-    def get_dice_roll(self):
+    def get_dice_roll(self, rng):
         val = self.dice_rolls["VAL"]
         const = self.dice_rolls["CONST"]
         if val > 0:
-            roll = choice(range(val))
+            roll = rng.randrange(val)
         else:
             roll = 0
         return roll + const
 
 
 class Player(GameObject):
+    container_fields = (("action_plan", list), ("action_positions", list))
+
     def __init__(self, obj_code, index, index_num, name, x, y, action_points, health, sight_range, dice_rolls):
         super().__init__(obj_code, index, index_num, x, y, type_=name)
         # Indexing
@@ -69,9 +96,8 @@ class Player(GameObject):
         self.start_y = y
         self.prev_x = x
         self.prev_y = y
-        self.seen_locations = set()
-        # Update now
-        self.update_seen_locations()
+        # Bitmask of grid cells the player has seen (bit y * board width + x). Maintained by the board
+        self.seen_mask = 0
         # Status
         self.dead = False
         self.respawn_counter = None
@@ -93,12 +119,12 @@ class Player(GameObject):
         self.action_plan_step = None
         self.action_plan_finalized = False
 
-    def get_dice_roll(self, enemy_type):
+    def get_dice_roll(self, enemy_type, rng):
         enemy_type = enemy_type.upper()
         val = self.dice_rolls[enemy_type]["VAL"]
         const = self.dice_rolls[enemy_type]["CONST"]
         if val > 0:
-            roll = choice(range(val))
+            roll = rng.randrange(val)
         else:
             roll = 0
         return roll + const
@@ -117,20 +143,13 @@ class Player(GameObject):
         self.action_plan_step = None
         self.action_plan_finalized = False
 
-    def get_mask_radius(self):
-        locations = []
-        x_bound_upper = self.x + self.sight_range
-        x_bound_lower = self.x - self.sight_range
-        y_bound_upper = self.y + self.sight_range
-        y_bound_lower = self.y - self.sight_range
-
-        for j in range(y_bound_lower, y_bound_upper + 1):
-            for i in range(x_bound_lower, x_bound_upper + 1):
-                locations.append((j, i))
-        return locations
-
-    def update_seen_locations(self):
-        self.seen_locations.update(self.get_mask_radius())
+    def update_seen_locations(self, window_mask):
+        """
+        Adds the cells in the player's current view to the cells it has seen.
+        :param window_mask: Bitmask of the cells in view (see Board.get_window_mask())
+        :return: N/A
+        """
+        self.seen_mask |= window_mask
 
 
 class Pin(GameObject):
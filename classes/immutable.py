@@ -0,0 +1,43 @@
+class FrozenDict(dict):
+    """
+    A read-only dict. Used for data that is parsed once and then shared between game instances (and forked worker
+    processes), so no instance can accidentally modify what the others see. Reads behave exactly like a normal dict.
+    """
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"'{type(self).__name__}' object is read-only")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Immutable, so copies can share the original
+        return self
+
+
+def freeze(obj):
+    """
+    Recursively converts dicts to FrozenDicts and lists to tuples.
+    :param obj: The object to freeze
+    :return: A read-only version of the object
+    """
+    if isinstance(obj, FrozenDict):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict({k: freeze(v) for k, v in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
@@ -1,8 +1,10 @@
 import os
+from bisect import bisect_left
 from collections import Counter
 from collections import defaultdict
+from collections import deque
 from datetime import datetime
-from dateutil.parser import parse
+from functools import partial
 from os import makedirs
 from os import path
 from time import sleep
@@ -11,14 +13,26 @@ import tensorflow as tf
 from threading import Thread
 
 
+# Upper bin edges (seconds) of the duration histograms. The last bin holds everything longer
+TIME_BINS = (0.1, 1, 10, 60, 600, 3600)
+
+
 class GameMetricsTracker:
-    def __init__(self, level, metrics_config, instance_id=1, model_number=1):
+    """
+    Tracks gameplay metrics. Memory use is bounded: each time series is held in a ring buffer that is written out to
+    the log files and cleared on every save(), and everything else is kept as streaming aggregates (counts, means and
+    histograms) whose size doesn't grow with the length of the run.
+    """
+    def __init__(self, level, metrics_config, instance_id=1, model_number=1, players=("Dwarf", "Giant", "Human")):
         self.id = instance_id
         self.model_number = model_number
         self.level = level
         self.save_threshold = 10000
         self.num_records = 0
         self.metrics_config = metrics_config
+        # Records a ring buffer holds. The buffers are flushed every save_threshold updates, and each update adds at
+        # most one record to a buffer, so no record is dropped unless this is smaller than save_threshold
+        self.buffer_size = self.metrics_config.get("BUFFER_SIZE", self.save_threshold)
         # Init values
         self.repeat_counter = Counter()
         self.num_agent_actions = 0
@@ -28,17 +42,26 @@ class GameMetricsTracker:
         self.num_team_deaths = 0
         self.clock_start = self._timestamp(as_string=False)
         self.level_start = self._timestamp(as_string=False)
-        # Time Series Lists
-        self.agent_actions = defaultdict(list)
-        self.actions = Counter()
+        # Time each series last had a record, for the time elapsed between records
+        self.last_times = {}
+        # Time Series Ring Buffers (written out and cleared by save())
+        self.agent_actions = defaultdict(partial(deque, maxlen=self.buffer_size))
         self.levels = defaultdict(list)
-        self.team_deaths = []
-        self.rounds = []
-        self.games = []
-        self.phases = []
-        self.player_trackers = {"Dwarf": PlayerMetricsTracker("Dwarf"),
-                                "Giant": PlayerMetricsTracker("Giant"),
-                                "Human": PlayerMetricsTracker("Human")}
+        self.team_deaths = deque(maxlen=self.buffer_size)
+        self.rounds = deque(maxlen=self.buffer_size)
+        self.games = deque(maxlen=self.buffer_size)
+        self.phases = deque(maxlen=self.buffer_size)
+        self.player_trackers = {player: PlayerMetricsTracker(player, self.buffer_size) for player in players}
+        # Streaming Aggregates (kept for the whole run)
+        self.actions = Counter()
+        self.agent_action_counts = defaultdict(Counter)
+        self.phase_times = defaultdict(StreamingStat)
+        self.round_times = StreamingStat()
+        self.game_times = StreamingStat()
+        # Time to complete each level
+        self.level_times = defaultdict(StreamingStat)
+        # Completions, rounds, team deaths and agent actions on each level
+        self.level_counts = defaultdict(Counter)
         # Time series counter
         self.metric_counter = Counter()
         self.metrics_dir = self.metrics_config["DIRECTORIES"]["LOGFILES"].format(self.model_number)
@@ -54,13 +77,23 @@ class GameMetricsTracker:
         ##############
         # Levels
         self._save_level_metrics()
+        # Phases, rounds, games, team deaths and agent actions
+        self._save_series_metrics()
+        # Aggregates so far
+        self._save_summary_metrics()
+
+        ################
+        # PLAYER LEVEL #
+        ################
+        self._save_player_metrics()
 
         self._reset()
 
     def _setup_directories(self):
         makedirs(self.metrics_dir, exist_ok=True)
-        for metric in self.metrics_config["GAME"]:
-            makedirs(self.metrics_dir + self.metrics_config["GAME"][metric]["SUBDIRECTORY"], exist_ok=True)
+        for component in ["GAME", "PLAYER"]:
+            for metric in self.metrics_config[component]:
+                makedirs(self.metrics_dir + self.metrics_config[component][metric]["SUBDIRECTORY"], exist_ok=True)
 
     def _get_filepath(self, component, metric, params=None, additional_info=""):
         if params is None:
@@ -78,6 +111,40 @@ class GameMetricsTracker:
             columns = self.metrics_config[component][metric]["COLUMNS"]
             self._save_records(records=self.levels[level], columns=columns, filepath=filepath)
 
+    def _save_series(self, records, component, metric):
+        if not records or metric not in self.metrics_config[component]:
+            return
+        graph_name = self.metrics_config[component][metric]["GRAPH_NAME"]
+        filepath = self._get_filepath(component, metric, additional_info="-gn-{}".format(graph_name))
+        self._save_records(records=records, columns=self.metrics_config[component][metric]["COLUMNS"],
+                           filepath=filepath)
+
+    def _save_series_metrics(self, component="GAME"):
+        self._save_series(self.phases, component, "PHASE")
+        self._save_series(self.rounds, component, "ROUND")
+        self._save_series(self.games, component, "GAME")
+        self._save_series(self.team_deaths, component, "TEAM_DEATH")
+        # Ordered so the last column is numeric, as the tensorboard logger expects
+        self._save_series([[timestamp, player, phase, action, level, num_rounds] for player in self.agent_actions
+                           for timestamp, level, num_rounds, phase, action in self.agent_actions[player]],
+                          component, "AGENT_ACTION")
+
+    def _save_summary_metrics(self, component="GAME", metric="SUMMARY"):
+        timestamp = self._timestamp()
+        records = []
+        for level, stat in sorted(self.level_times.items()):
+            records.append([timestamp, level, "time_to_complete", stat.count, stat.mean])
+        for level, rates in sorted(self.get_level_rates().items()):
+            for name, value in rates.items():
+                records.append([timestamp, level, name, self.level_counts[level]["rounds"], value])
+        records.append([timestamp, self.level, "round_time", self.round_times.count, self.round_times.mean])
+        records.append([timestamp, self.level, "game_time", self.game_times.count, self.game_times.mean])
+        self._save_series(records, component, metric)
+
+    def _save_player_metrics(self, component="PLAYER", metric="EVENTS"):
+        self._save_series([rec for tracker in self.player_trackers.values() for rec in tracker.events],
+                          component, metric)
+
     @staticmethod
     def _save_records(records, columns, filepath):
         mode = "a" if path.exists(filepath) else "w"
@@ -92,6 +159,14 @@ class GameMetricsTracker:
 
     def _reset(self):
         self.levels = defaultdict(list)
+        self.phases.clear()
+        self.rounds.clear()
+        self.games.clear()
+        self.team_deaths.clear()
+        for records in self.agent_actions.values():
+            records.clear()
+        for tracker in self.player_trackers.values():
+            tracker.events.clear()
 
     def update(self, target, **kwargs):
         self.num_records += 1
@@ -120,15 +195,22 @@ class GameMetricsTracker:
 
         if metric_name == "new_phase":
             self.num_phases += 1
-            self.phases.append([timestamp, phase, self._calculate_time_elapsed(self.phases)])
+            time_elapsed = self._calculate_time_elapsed("phases")
+            self.phases.append([timestamp, phase, time_elapsed])
+            self.phase_times[phase].add(time_elapsed)
 
         elif metric_name == "new_round":
             self.num_rounds += 1
-            self.rounds.append([timestamp, self.num_rounds, self._calculate_time_elapsed(self.rounds)])
+            time_elapsed = self._calculate_time_elapsed("rounds")
+            self.rounds.append([timestamp, self.num_rounds, time_elapsed])
+            self.round_times.add(time_elapsed)
+            self.level_counts[self.level]["rounds"] += 1
 
         elif metric_name == "game_over":
             self.num_games += 1
-            self.games.append([timestamp, self.num_games, self._calculate_time_elapsed(self.games)])
+            time_elapsed = self._calculate_time_elapsed("games")
+            self.games.append([timestamp, self.num_games, time_elapsed])
+            self.game_times.add(time_elapsed)
             self.save()
         elif metric_name == "new_level":
             # print("LEVEL HAS CHANGED!")
@@ -137,6 +219,8 @@ class GameMetricsTracker:
             elapsed_time = (self._timestamp(as_string=False) - self.level_start)
             self.levels[self.level].append([timestamp, self.level, self.repeat_counter[self.level],
                                             elapsed_time.total_seconds()])
+            self.level_times[self.level].add(elapsed_time.total_seconds())
+            self.level_counts[self.level]["completions"] += 1
             # Update level
             self.level = level
             self.level_start = self._timestamp(as_string=False)
@@ -147,6 +231,8 @@ class GameMetricsTracker:
             elapsed_time = (self._timestamp(as_string=False) - self.level_start)
             self.levels[self.level].append([timestamp, self.level, self.repeat_counter[self.level],
                                             elapsed_time.total_seconds()])
+            self.level_times[self.level].add(elapsed_time.total_seconds())
+            self.level_counts[self.level]["completions"] += 1
 
             self.repeat_counter[self.level] += 1
             self.level_start = self._timestamp(as_string=False)
@@ -155,18 +241,49 @@ class GameMetricsTracker:
             self.num_agent_actions += 1
             self.agent_actions[player].append([timestamp, self.level, self.num_rounds, phase, agent_action])
             self.actions[agent_action] += 1
+            self.agent_action_counts[player][agent_action] += 1
+            self.level_counts[self.level]["agent_actions"] += 1
             # print(self.actions)
         elif metric_name == "team_death":
             self.num_team_deaths += 1
             self.team_deaths.append([timestamp, self.level, self.num_rounds])
+            self.level_counts[self.level]["team_deaths"] += 1
+
+    def get_level_rates(self):
+        """
+        :return: (dict) For each level played, team deaths and agent actions per round, and rounds per completion
+        """
+        rates = {}
+        for level, counts in self.level_counts.items():
+            rounds = counts["rounds"]
+            rates[level] = {"team_deaths_per_round": counts["team_deaths"] / rounds if rounds else 0.0,
+                            "agent_actions_per_round": counts["agent_actions"] / rounds if rounds else 0.0,
+                            "rounds_per_completion": rounds / counts["completions"] if counts["completions"] else 0.0}
+        return rates
+
+    def get_summary(self):
+        """
+        Aggregates over the whole run. Unlike the time series, these are never cleared.
+        :return: (dict) Counts, duration statistics and histograms, per-level rates and per-player totals
+        """
+        return {"counts": {"agent_actions": self.num_agent_actions, "rounds": self.num_rounds,
+                           "games": self.num_games, "phases": self.num_phases,
+                           "team_deaths": self.num_team_deaths},
+                "actions": dict(self.actions),
+                "agent_actions": {player: dict(counts) for player, counts in self.agent_action_counts.items()},
+                "phase_time": {phase: stat.to_dict() for phase, stat in self.phase_times.items()},
+                "round_time": self.round_times.to_dict(),
+                "game_time": self.game_times.to_dict(),
+                "level_time": {level: stat.to_dict() for level, stat in self.level_times.items()},
+                "level_rates": self.get_level_rates(),
+                "players": {player: tracker.get_summary() for player, tracker in self.player_trackers.items()}}
 
     # new round vs new phase
-    def _calculate_time_elapsed(self, time_series):
-        if time_series:
-            # Get time elapsed since last round
-            time_elapsed = self._timestamp(as_string=False) - parse(time_series[-1][0])
-        else:
-            time_elapsed = self._timestamp(as_string=False) - self.clock_start
+    def _calculate_time_elapsed(self, series):
+        now = self._timestamp(as_string=False)
+        # Get time elapsed since the series' last record
+        time_elapsed = now - self.last_times.get(series, self.clock_start)
+        self.last_times[series] = now
         return time_elapsed.seconds
 
     @staticmethod
@@ -179,39 +296,93 @@ class GameMetricsTracker:
 
 
 class PlayerMetricsTracker:
-    def __init__(self, player):
+    """
+    Counts each player's pins, combats, deaths and health losses. The events themselves are kept in a ring buffer
+    that GameMetricsTracker writes out and clears on save().
+    """
+    def __init__(self, player, buffer_size=10000):
         self.player = player
-        self.health_loss = []
-        self.deaths = []
-        self.pins = {"pinga": [], "pingb": [], "pingc": [], "pingd": []}
+        self.health_loss = 0
+        self.deaths = 0
+        self.pins = {"pinga": 0, "pingb": 0, "pingc": 0, "pingd": 0}
         # Combat Tracking
         self.total_wins = 0
         self.total_losses = 0
         self.wins = self._get_enemy_tracker()
         self.losses = self._get_enemy_tracker()
+        # Recent events: timestamp, player, event, enemy type, enemy size and the player's total of that event
+        self.events = deque(maxlen=buffer_size)
 
     def pin(self, pin_type, timestamp):
-        self.pins[pin_type].append(timestamp)
+        self.pins[pin_type] += 1
+        self.events.append([timestamp, self.player, pin_type, None, None, self.pins[pin_type]])
 
     def combat(self, enemy_type, enemy_size, outcome, timestamp):
         if outcome == "win":
             self.total_wins += 1
-            self.wins[enemy_type][enemy_size].append(timestamp)
+            self.wins[enemy_type][enemy_size] += 1
+            self.events.append([timestamp, self.player, "combat_win", enemy_type, enemy_size, self.total_wins])
         else:
             self.total_losses += 1
-            self.losses[enemy_type][enemy_size].append(timestamp)
+            self.losses[enemy_type][enemy_size] += 1
+            self.events.append([timestamp, self.player, "combat_loss", enemy_type, enemy_size, self.total_losses])
 
     def generics(self, metric_name, timestamp):
         if metric_name == "death":
-            self.deaths.append(timestamp)
+            self.deaths += 1
+            self.events.append([timestamp, self.player, metric_name, None, None, self.deaths])
         elif metric_name == "health_loss":
-            self.health_loss.append(timestamp)
+            self.health_loss += 1
+            self.events.append([timestamp, self.player, metric_name, None, None, self.health_loss])
+
+    def get_summary(self):
+        """
+        :return: (dict) The player's totals
+        """
+        return {"health_loss": self.health_loss, "deaths": self.deaths, "pins": dict(self.pins),
+                "wins": self.total_wins, "losses": self.total_losses,
+                "wins_by_enemy": {enemy: dict(sizes) for enemy, sizes in self.wins.items()},
+                "losses_by_enemy": {enemy: dict(sizes) for enemy, sizes in self.losses.items()}}
 
     @staticmethod
     def _get_enemy_tracker():
-        return {"Monster": {"S": [], "M": [], "L": [], "XL": []},
-                "Stone": {"S": [], "M": [], "L": []},
-                "Trap": {"S": [], "M": [], "L": []}}
+        return {"Monster": {"S": 0, "M": 0, "L": 0, "XL": 0},
+                "Stone": {"S": 0, "M": 0, "L": 0},
+                "Trap": {"S": 0, "M": 0, "L": 0}}
+
+
+class StreamingStat:
+    """
+    Count, mean, minimum, maximum and histogram of a stream of values, in constant memory.
+    """
+    __slots__ = ("bins", "count", "total", "minimum", "maximum", "histogram")
+
+    def __init__(self, bins=TIME_BINS):
+        """
+        :param bins: Upper edges of the histogram bins, in increasing order. Values above the last edge go in an extra
+                     bin at the end.
+        """
+        self.bins = bins
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.histogram = [0] * (len(bins) + 1)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.histogram[bisect_left(self.bins, value)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "min": self.minimum, "max": self.maximum,
+                "bins": list(self.bins), "histogram": list(self.histogram)}
 
 
 class TensorBoardWriter:
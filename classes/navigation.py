@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from collections import deque
+import numpy as np
+
+# Navigation data for the most recently used level grids, most recent last. Keyed by the id of the grid; the entry
+# keeps the grid alive so the id can't be reused. Bounded, so a process that samples from a large corpus only keeps
+# the levels it is playing. Boards hold on to their own level's data, so an evicted level stays usable
+_navigation = OrderedDict()
+# Number of levels kept in _navigation
+NAVIGATION_CACHE_SIZE = 16
+
+
+def get_navigation(level):
+    """
+    Returns the navigation data for a level grid, building it if the grid isn't among the recently used ones. Level
+    grids from the level registry are shared, so boards on the same level share their navigation data.
+    :param level: The level grid (rows of object codes, row 0 at the bottom)
+    :return: (LevelNavigation) The shared navigation data
+    """
+    nav = _navigation.get(id(level))
+    if nav is None or nav.level is not level:
+        nav = _navigation[id(level)] = LevelNavigation(level)
+        while len(_navigation) > NAVIGATION_CACHE_SIZE:
+            _navigation.popitem(last=False)
+    else:
+        _navigation.move_to_end(id(level))
+    return nav
+
+
+class LevelNavigation:
+    """
+    Static movement data for a level, built from its walls. Walls never change and no object can ever be in a wall,
+    so this covers the bounds and wall part of every movement check. Whether a cell is occupied still has to be
+    checked against the board.
+
+    Cells are indexed by y * width + x.
+    """
+    DIRECTIONS = {"left": (-1, 0), "right": (1, 0), "up": (0, 1), "down": (0, -1)}
+    # Object codes that get a distance field
+    TARGETS = ("1G", "2G", "3G", "**")
+
+    def __init__(self, level, wall="##"):
+        """
+        :param level: The level grid
+        :param wall: The wall object code
+        """
+        self.level = level
+        self.height = len(level)
+        self.width = len(level[0])
+        # Neighbor of each cell in each direction. None if it would leave the level or enter a wall
+        self.moves = {}
+        for action, (dx, dy) in self.DIRECTIONS.items():
+            self.moves[action] = [
+                (x + dx, y + dy)
+                if 0 <= x + dx < self.width and 0 <= y + dy < self.height and level[y + dy][x + dx] != wall
+                else None
+                for y in range(self.height) for x in range(self.width)
+            ]
+        # Shortest path distance from every cell to the nearest cell holding each target. -1 where unreachable.
+        # Paths go around walls but not around objects, since objects move. Built on first use by distance(), since
+        # movement checks don't need them
+        self.distances = {}
+        # Neighbor tables as arrays of cell indexes, keyed by the order of the directions. Built on first use
+        self.neighbor_arrays = {}
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Read-only, so copies of a board can share the original
+        return self
+
+    def get_distance_field(self, sources):
+        """
+        Runs a breadth-first search outward from the given cells.
+        :param sources: (list) The x,y positions to measure from
+        :return: (list) Distance of every cell from the nearest source, or -1 if it can't be reached
+        """
+        dist = [-1] * (self.width * self.height)
+        queue = deque()
+        for x, y in sources:
+            dist[y * self.width + x] = 0
+            queue.append(y * self.width + x)
+        neighbors = list(self.moves.values())
+        while queue:
+            i = queue.popleft()
+            for moves in neighbors:
+                cell = moves[i]
+                if cell is not None:
+                    j = cell[1] * self.width + cell[0]
+                    if dist[j] < 0:
+                        dist[j] = dist[i] + 1
+                        queue.append(j)
+        return dist
+
+    def get_neighbor(self, action, x, y):
+        """
+        :param action: A direction
+        :param x: The x position
+        :param y: The y position
+        :return: (tuple) The x,y position one step in the direction, or None if that is outside the level or a wall
+        """
+        return self.moves[action][y * self.width + x]
+
+    def get_neighbor_array(self, directions):
+        """
+        Gets the neighbor table as an array for bulk lookups.
+        :param directions: (list) The directions, in the order of the array's columns
+        :return: (np.ndarray) Cell index of the neighbor of each cell (row) in each direction (column). -1 if the step
+        would leave the level or enter a wall.
+        """
+        key = tuple(directions)
+        if key not in self.neighbor_arrays:
+            self.neighbor_arrays[key] = np.array(
+                [[-1 if cell is None else cell[1] * self.width + cell[0] for cell in self.moves[action]]
+                 for action in directions], dtype=np.int64).T.copy()
+        return self.neighbor_arrays[key]
+
+    def distance(self, code, x, y):
+        """
+        :param code: The target object code (1G, 2G, 3G or **)
+        :param x: The x position
+        :param y: The y position
+        :return: (int) Number of steps to the nearest target, going around walls. -1 if it can't be reached.
+        """
+        if code not in self.distances:
+            self.distances[code] = self.get_distance_field([(x_, y_)
+                                                            for y_ in range(self.height) for x_ in range(self.width)
+                                                            if self.level[y_][x_] == code])
+        return self.distances[code][y * self.width + x]
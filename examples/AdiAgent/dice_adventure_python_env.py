@@ -1,11 +1,16 @@
+from classes.compiled_config import compile_config
 from game.dice_adventure import DiceAdventure
+from game.level_registry import get_config
 import game.env.unity_socket as unity_socket
 from gymnasium import Env
 import json
-from json import loads
 import examples.AdiAgent.rewards as rewards
-from random import choice
+from examples.AdiAgent.reward_engine import RewardEngine
+from examples.AdiAgent.reward_engine import get_aggressive_terms
+from examples.AdiAgent.reward_engine import get_default_terms
+from examples.AdiAgent.observation_encoder import ObservationEncoder
 from datetime import datetime
+from time import perf_counter
 from gymnasium import spaces
 import numpy as np
 import re
@@ -22,6 +27,7 @@ class DiceAdventurePythonEnv(Env):
                  server="local",
                  state_version="full",
                  automate_players=True,
+                 phase_timings_in_info=False,
                  **kwargs):
         """
         Init function for Dice Adventure gym environment.
@@ -31,21 +37,28 @@ class DiceAdventurePythonEnv(Env):
                                    we will use a "play" mode, where the step function simply takes an action and returns
                                    the next state.
         :param server:      (string) Determines which game version to use. Can be one of {local, unity}.
+        :param phase_timings_in_info: (bool) If True, the game times its phases and each step's info holds the timings
+                                   since the previous step under "phase_timings" (see
+                                   DiceAdventure.get_phase_timings()), along with the time taken to encode the
+                                   step's observation under "get_observation". Only applies when 'server' is 'local'.
         :param kwargs:      (dict) Additional keyword arguments to pass into Dice Adventure game. Only applies when
                                    'server' is 'local'.
         """
-        self.config = loads(open("game/config/main_config.json", "r").read())
+        self.config = get_config()
+        self.compiled = compile_config(self.config)
         self.player = player
         self.id = id_
         self.kwargs = kwargs
+        self.phase_timings_in_info = phase_timings_in_info
+        if phase_timings_in_info:
+            self.kwargs = dict(kwargs, time_phases=True)
 
         ##################
         # STATE SETTINGS #
         ##################
         self.state_version = state_version
-        self.mask_radii = {"Dwarf": self.config["OBJECT_INFO"]["OBJECT_CODES"]["1S"]["SIGHT_RANGE"],
-                           "Giant": self.config["OBJECT_INFO"]["OBJECT_CODES"]["2S"]["SIGHT_RANGE"],
-                           "Human": self.config["OBJECT_INFO"]["OBJECT_CODES"]["3S"]["SIGHT_RANGE"]}
+        self.mask_radii = {player: self.compiled.object_codes[code].sight_range
+                           for player, code in self.compiled.player_codes.items()}
         self.max_mask_radius = max(self.mask_radii.values())
         self.action_map = {0: 'left', 1: 'right', 2: 'up', 3: 'down', 4: 'wait',
                            5: 'submit', 6: 'pinga', 7: 'pingb', 8: 'pingc', 9: 'pingd', 10: 'undo'}
@@ -77,6 +90,9 @@ class DiceAdventurePythonEnv(Env):
         ##################
 
         self.model_type = "default"
+        # Batch versions of get_reward() and get_reward_aggressive(), used by get_rewards()
+        self.reward_engines = {"default": RewardEngine(get_default_terms(), self.players),
+                               "aggressive": RewardEngine(get_aggressive_terms(), self.players)}
 
         num_actions = len(self.action_map)
         self.action_space = spaces.Discrete(num_actions)
@@ -87,6 +103,8 @@ class DiceAdventurePythonEnv(Env):
             set(self.observation_object_positions.values())) * 4) + 6
         self.observation_space = spaces.Box(low=-5, high=100,
                                             shape=(vector_len,), dtype=np.float32)
+        # Reads observations straight from the local game's board
+        self.observation_encoder = ObservationEncoder(self.config, self.player, self.mask_size)
 
     def step(self, action):
         """
@@ -116,11 +134,20 @@ class DiceAdventurePythonEnv(Env):
 
         # new_obs, reward, terminated, truncated, info
         terminated = next_state["status"] == "Done"
+        # Read before a reset replaces the game
+        timings = self.game.get_phase_timings(reset=True) if self.phase_timings_in_info and self.server == "local" \
+            else None
         if terminated:
             new_obs, info = self.reset()
         else:
-            new_obs = self.get_observation(self.get_state())
+            start = perf_counter()
+            new_obs = self.get_observation()
+            if timings is not None:
+                elapsed = perf_counter() - start
+                timings["get_observation"] = {"calls": 1, "seconds": elapsed, "mean_us": elapsed * 1e6}
             info = {}
+        if timings is not None:
+            info["phase_timings"] = timings
         truncated = False
         # print(type(new_obs))
 
@@ -142,15 +169,19 @@ class DiceAdventurePythonEnv(Env):
         if self.server == "local":
             self.game.render()
 
-    def reset(self, **kwargs):
+    def reset(self, seed=None, options=None, **kwargs):
         """
         Resets the game. Only applies when `self.server` is 'local'.
+        :param seed:    (int) Seeds the environment. Each new game is seeded from the environment's generator, so
+                              seeding the first reset makes the whole run repeatable.
+        :param options: (dict) Not used
         :param kwargs:  (dict) Additional arguments to pass into local game server
         :return:        (dict, dict) The initial state when the game is reset, An empty 'info' dict
         """
+        super().reset(seed=seed)
         if self.server == "local":
-            self.game = DiceAdventure(**self.kwargs)
-        obs = self.get_observation(self.get_state())
+            self.game = DiceAdventure(**dict(self.kwargs, seed=int(self.np_random.integers(2 ** 63))))
+        obs = self.get_observation()
         return obs, {}
 
     def execute_action(self, player, game_action):
@@ -218,7 +249,8 @@ class DiceAdventurePythonEnv(Env):
                         and state["content"]["gameData"]["currentPhase"] == next_state["content"]["gameData"]["currentPhase"]:
                     a = game_action
                 else:
-                    a = choice(list(self.action_map.values()))
+                    actions = list(self.action_map.values())
+                    a = actions[self.np_random.integers(len(actions))]
                 # print(f"Other Player: {p}: Action: {a}")
                 _ = self.execute_action(p, a)
                 # next_state = self.get_state()
@@ -349,6 +381,19 @@ class DiceAdventurePythonEnv(Env):
         return r
 
 
+    def get_rewards(self, states, next_states, player=None):
+        """
+        Computes the rewards for a batch of steps at once, e.g. to relabel stored trajectories. Gives the same values as
+        calling get_reward() on each step, without the metrics logging.
+        :param states: (list) States before each step
+        :param next_states: (list) States after each step
+        :param player: (string) The player being rewarded. Defaults to this env's player.
+        :return: (np.ndarray) Reward for each step
+        """
+        engine = self.reward_engines["aggressive" if self.model_type == "aggressive" else "default"]
+        rewards, _ = engine.compute(states, next_states, player or self.player)
+        return rewards
+
     @staticmethod
     def get_obj_from_scene_by_type(state, obj_type):
         o = None
@@ -360,7 +405,7 @@ class DiceAdventurePythonEnv(Env):
         #     print(state)
         return o
 
-    def get_observation(self, state, player=None):
+    def get_observation(self, state=None, player=None):
         """
         Constructs an array observation for agent based on state. Dimensions:
         1. self.mask x self.mask (1-2)
@@ -368,9 +413,14 @@ class DiceAdventurePythonEnv(Env):
         3. 4 (4) - max number of object types is 4 [i.e., M4]
         4. six additional state variables
         Total Est.: 7x7x10x4+6= 1006
-        :param state:
+        :param state: If None, the observation is encoded straight from the local game's board (or from the current
+                      state when using the unity server)
         :return:
         """
+        if state is None:
+            if self.server == "local" and player in [None, self.player]:
+                return self.observation_encoder.encode(self.game, self.state_version).copy()
+            state = self.get_state()
         if player is None:
             player = self.player
         x, y, player_info = self.parse_player_state_data(state, player)
@@ -0,0 +1,95 @@
+import numpy as np
+import re
+
+
+class ObservationEncoder:
+    """
+    Builds the AdiAgent observation vector straight from a local DiceAdventure game's board, without building the
+    dict state from get_state() first. Only the cells in the player's observation window are read.
+
+    Output matches DiceAdventurePythonEnv.get_observation() on the corresponding get_state() result, value for value,
+    but as float32. The vector is written into a buffer that is reused by every call, so callers that keep an
+    observation must copy it.
+    """
+    def __init__(self, config, player, mask_size):
+        """
+        :param config: The game config
+        :param player: (string) The player whose view is encoded. Can be one of {Dwarf, Giant, Human}.
+        :param mask_size: Width of the observation window (the env uses the largest sight range of any player)
+        """
+        self.player = player
+        self.player_code = config["OBJECT_INFO"]["PLAYERS"]["PLAYER_CODE_MAPPING"][player]
+        self.shrine_code = self.player_code[0] + "G"
+        object_codes = config["OBJECT_INFO"]["OBJECT_CODES"]
+        self.mask_radius = object_codes[self.player_code]["SIGHT_RANGE"]
+        self.mask_size = mask_size
+        self.object_positions = config["GYM_ENVIRONMENT"]["OBSERVATION"]["OBJECT_POSITIONS"]
+        self.num_positions = len(set(self.object_positions.values()))
+        self.wall_type = object_codes["##"]["TYPE"]
+        self.pin_type = object_codes["PA"]["TYPE"]
+        self.pin_mapping = {"A": 0, "B": 1, "C": 2, "D": 3}
+        # Observation channel for each object type. Same rules as get_observation(): pins use their pin letter,
+        # enemy types use their size and everything else uses channel 0
+        size_mappings = config["OBJECT_INFO"]["ENEMIES"]["ENEMY_SIZE_MAPPING"]
+        self.channel_by_type = {}
+        for type_, position in self.object_positions.items():
+            if re.match("(monster|trap|stone)", type_.lower()):
+                version = size_mappings[type_.split("_")[0]]
+            else:
+                version = 0
+            self.channel_by_type[type_] = position * 4 + version
+
+        grid_size = self.mask_size * self.mask_size * self.num_positions * 4
+        self.buffer = np.zeros(grid_size + 6, dtype=np.float32)
+        self.grid = self.buffer[:grid_size].reshape((self.mask_size, self.mask_size, self.num_positions * 4))
+        self.player_info = self.buffer[grid_size:]
+
+    def encode(self, game, version="full"):
+        """
+        Encodes the current state of the game.
+        :param game: The DiceAdventure game
+        :param version: (string) The level of visibility. Can be one of {full, player, fow}
+        :return: (np.ndarray) The observation. This is the encoder's buffer, so it is overwritten by the next call.
+        """
+        board = game.board
+        player_obj = board.objects[self.player_code]
+        x, y = player_obj.x, player_obj.y
+        r = self.mask_radius
+        if version == "player":
+            visible = board.get_window_mask(x, y, player_obj.sight_range)
+        elif version == "fow":
+            visible = player_obj.seen_mask & board.get_window_mask(x, y, r)
+        else:
+            visible = None
+
+        self.buffer.fill(0)
+        for obj_y in range(max(y - r, 1), min(y + r, board.height - 1) + 1):
+            row = None if visible is None else visible >> (obj_y * board.width)
+            for obj_x in range(max(x - r, 1), min(x + r, board.width - 1) + 1):
+                # Objects on row 0 or column 0 are left out, same as get_observation()
+                if row is not None and not (row >> obj_x) & 1:
+                    continue
+                pos = (obj_y, obj_x)
+                cell = board.board.get(pos)
+                other = self.grid[r - (x - obj_x), r - (y - obj_y)]
+                if cell is None:
+                    if self.wall_type in self.channel_by_type:
+                        other[self.channel_by_type[self.wall_type]] = 1
+                    continue
+                for obj in cell.values():
+                    channel = self.channel_by_type.get(obj.type)
+                    if channel is None:
+                        continue
+                    if obj.type == self.pin_type:
+                        channel += self.pin_mapping[obj.obj_code[1]]
+                    other[channel] = 1
+
+        shrine = board.objects.get(self.shrine_code)
+        info = self.player_info
+        info[0] = player_obj.action_points
+        info[1] = player_obj.health
+        info[2] = player_obj.dead
+        info[3] = shrine.reached if shrine is not None else 0
+        info[4] = player_obj.pin_x or 0
+        info[5] = player_obj.pin_y or 0
+        return self.buffer
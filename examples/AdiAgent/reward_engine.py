@@ -0,0 +1,227 @@
+import numpy as np
+
+
+class SceneArrays:
+    """
+    Array view of a batch of states, built in one pass over each scene. Holds everything the reward terms read, so a
+    term never has to scan a scene itself. Values a state doesn't have (e.g., a player missing from a partial state)
+    are NaN.
+    """
+    __slots__ = ("level", "shrine_reached", "x", "y", "health", "dead", "monster_x", "monster_y", "monster_count")
+
+    def __init__(self, states, players):
+        """
+        :param states: (list) States, as returned by get_state()
+        :param players: (list) Player names, in the order of the player columns
+        """
+        n, num_players = len(states), len(players)
+        lowered = {p.lower(): i for i, p in enumerate(players)}
+        # What each entity type is, worked out the first time it is seen
+        kinds = {}
+        self.level = np.zeros(n, dtype=np.int64)
+        # Reached flag of the first shrine in the scene (the one rewards.goal_reached() looks at)
+        self.shrine_reached = np.zeros(n, dtype=bool)
+        self.x = np.full((n, num_players), np.nan)
+        self.y = np.full((n, num_players), np.nan)
+        self.health = np.full((n, num_players), np.nan)
+        self.dead = np.zeros((n, num_players), dtype=bool)
+        self.monster_count = np.zeros(n, dtype=np.int64)
+        monsters = []
+        for i, state in enumerate(states):
+            self.level[i] = state["content"]["gameData"]["level"]
+            found = [False] * num_players
+            shrine_found = False
+            positions = []
+            for ele in state["content"]["scene"]:
+                kind = kinds.get(ele["entityType"])
+                if kind is None:
+                    kind = kinds[ele["entityType"]] = self.get_kind(ele["entityType"], lowered)
+                if kind == "other":
+                    continue
+                if kind == "monster":
+                    positions.append((ele["x"], ele["y"]))
+                elif kind == "shrine":
+                    if not shrine_found:
+                        self.shrine_reached[i] = ele["reached"]
+                        shrine_found = True
+                else:
+                    p = kind
+                    if not found[p]:
+                        found[p] = True
+                        self.x[i, p] = ele["x"]
+                        self.y[i, p] = ele["y"]
+                        self.health[i, p] = ele.get("health", np.nan)
+                        self.dead[i, p] = ele.get("dead", False)
+            self.monster_count[i] = len(positions)
+            monsters.append(positions)
+        # Monster positions, padded with NaN to the largest count in the batch
+        width = max(self.monster_count.max(initial=0), 1)
+        self.monster_x = np.full((n, width), np.nan)
+        self.monster_y = np.full((n, width), np.nan)
+        for i, positions in enumerate(monsters):
+            if positions:
+                self.monster_x[i, :len(positions)], self.monster_y[i, :len(positions)] = zip(*positions)
+
+    def take(self, rows):
+        """
+        :param rows: (list) Indexes of states in this batch
+        :return: (SceneArrays) A batch of those states
+        """
+        taken = SceneArrays.__new__(SceneArrays)
+        for name in self.__slots__:
+            setattr(taken, name, getattr(self, name)[rows])
+        return taken
+
+    @staticmethod
+    def get_kind(entity_type, players):
+        """
+        :param entity_type: An entity type from a scene
+        :param players: (dict) Lower case player name to player column
+        :return: "monster", "shrine", a player column, or "other" for entities no reward term reads
+        """
+        lowered = entity_type.lower()
+        if "monster" in lowered:
+            return "monster"
+        if lowered == "shrine":
+            return "shrine"
+        return players.get(lowered, "other")
+
+    def closest_monster(self, p):
+        """
+        Straight-line distance from a player to the nearest monster. Same as rewards.closest_entity_helper().
+        :param p: The player column
+        :return: (np.ndarray) Distance for each state. -1 where there are no monsters.
+        """
+        with np.errstate(invalid="ignore"):
+            dist = np.sqrt((self.x[:, p, None] - self.monster_x) ** 2 + (self.y[:, p, None] - self.monster_y) ** 2)
+        closest = np.min(np.where(np.isnan(dist), np.inf, dist), axis=1)
+        return np.where(self.monster_count == 0, -1.0, closest)
+
+
+class RewardTerm:
+    """
+    One part of a reward. `check(before, after, p)` gets the SceneArrays of the states before and after the step and
+    a player column, and returns whether the term applies to each pair. Terms that apply add `weight` to the reward.
+    """
+    __slots__ = ("name", "weight", "check", "code", "player")
+
+    def __init__(self, name, weight, check, code=None, player=None):
+        """
+        :param name: Name of the term
+        :param weight: Amount added to the reward when the term applies
+        :param check: The check function
+        :param code: Reward code (see GYM_ENVIRONMENT.REWARD.CODES in the config) logged when the term applies. None
+        if the term isn't logged.
+        :param player: The player the check looks at. If None, it looks at the player being rewarded.
+        """
+        self.name = name
+        self.weight = weight
+        self.check = check
+        self.code = code
+        self.player = player
+
+
+#########
+# TERMS #
+#########
+# Each check matches the function of the same name in rewards.py (not_closer_to_monster is not closer_to_entity())
+
+def goal_reached(before, after, p):
+    return ~before.shrine_reached & (after.shrine_reached | (before.level != after.level))
+
+
+def new_level(before, after, p):
+    return before.level != after.level
+
+
+def health_lost_or_dead(before, after, p):
+    with np.errstate(invalid="ignore"):
+        return (before.health[:, p] < after.health[:, p]) | after.dead[:, p]
+
+
+def not_moved(before, after, p):
+    return (before.x[:, p] == after.x[:, p]) & (before.y[:, p] == after.y[:, p])
+
+
+def enemy_reduced(before, after, p):
+    return before.monster_count > after.monster_count
+
+
+def not_closer_to_monster(before, after, p):
+    closest_before = before.closest_monster(p)
+    closest_after = after.closest_monster(p)
+    return ~((closest_before > closest_after) | (np.isinf(closest_before) & np.isinf(closest_after)))
+
+
+def get_default_terms():
+    return [RewardTerm("goal_reached", 1, goal_reached, code="0"),
+            RewardTerm("new_level", 1, new_level, code="1"),
+            RewardTerm("health_lost_or_dead", -.2, health_lost_or_dead, code="2"),
+            RewardTerm("not_moved", -.1, not_moved, code="3")]
+
+
+def get_aggressive_terms():
+    return [RewardTerm("goal_reached", 1, goal_reached, code="0"),
+            RewardTerm("new_level", 1, new_level, code="1"),
+            RewardTerm("health_lost_or_dead", -.1, health_lost_or_dead, code="2"),
+            RewardTerm("not_moved", -.1, not_moved, code="3"),
+            RewardTerm("enemy_reduced", .35, enemy_reduced),
+            # These add 0.1, as the aggressive reward does
+            RewardTerm("human_not_closer", .1, not_closer_to_monster, player="Human"),
+            RewardTerm("dwarf_not_closer", .1, not_closer_to_monster, player="Dwarf"),
+            RewardTerm("giant_not_closer", .1, not_closer_to_monster, player="Giant")]
+
+
+class RewardEngine:
+    """
+    Computes rewards for batches of (state, next_state) pairs from array views of the states. Each state is scanned
+    once no matter how many terms there are, and every term is evaluated for the whole batch at once.
+
+    Rewards match DiceAdventurePythonEnv's reward functions exactly: terms are added up in the same order, so the
+    floating point sums are the same.
+    """
+    def __init__(self, terms, players=("Dwarf", "Giant", "Human")):
+        """
+        :param terms: (list) RewardTerms, in the order they are added up
+        :param players: Player names, in the order of the player columns
+        """
+        self.terms = terms
+        self.players = list(players)
+
+    def scan(self, states):
+        """
+        :param states: (list) States
+        :return: (SceneArrays) Array view of the states
+        """
+        return SceneArrays(states, self.players)
+
+    def compute(self, states, next_states, player):
+        """
+        Computes the reward for each (state, next_state) pair. A state object that appears more than once (e.g., the
+        next state of one step being the state of the following step) is only scanned once.
+        :param states: (list) States before each step
+        :param next_states: (list) States after each step
+        :param player: Name of the player being rewarded
+        :return: (np.ndarray, dict) Reward for each pair, and for each term name, whether it applied to each pair
+        """
+        unique = {}
+        rows = [unique.setdefault(id(state), (len(unique), state))[0] for state in list(states) + list(next_states)]
+        scanned = self.scan([state for _, state in unique.values()])
+        return self.compute_arrays(scanned.take(rows[:len(states)]), scanned.take(rows[len(states):]), player)
+
+    def compute_arrays(self, before, after, player):
+        """
+        Same as compute(), from states that have already been scanned.
+        :param before: (SceneArrays) States before each step
+        :param after: (SceneArrays) States after each step
+        :param player: Name of the player being rewarded
+        :return: (np.ndarray, dict) Reward for each pair, and for each term name, whether it applied to each pair
+        """
+        p = self.players.index(player)
+        rewards = np.zeros(len(before.level))
+        applied = {}
+        for term in self.terms:
+            column = p if term.player is None else self.players.index(term.player)
+            applied[term.name] = term.check(before, after, column)
+            rewards = rewards + np.where(applied[term.name], term.weight, 0.0)
+        return rewards, applied
@@ -0,0 +1,237 @@
+from gymnasium import Wrapper
+from json import dumps
+from json import loads
+from os import makedirs
+from os import path
+from os import remove
+from os import replace
+import numpy as np
+
+VERSION = 1
+INDEX_FILE = "index.json"
+
+
+class TrajectoryWriter(Wrapper):
+    """
+    Env wrapper that streams every step into a dataset on disk: the observation the action was taken in, the action,
+    the reward, the terminated and truncated flags and chosen scalar values from the info dict. Steps are written
+    into fixed-size shards of memory-mapped .npy files (one file per field), so memory use stays the same no matter
+    how many steps are collected. An index file lists the shards and how many steps each holds; it is rewritten each
+    time a shard fills up and on flush() and close(). Shard files are created at their full size, so close() shrinks
+    the last shard's files to the steps it holds.
+
+    Observations must be arrays (e.g., DiceAdventurePythonEnv in this directory).
+    """
+    def __init__(self, env, directory, shard_bytes=256 * 2 ** 20, shard_size=None, info_keys=()):
+        """
+        :param env: The env to wrap
+        :param directory: Directory to write the dataset to
+        :param shard_bytes: Approximate size of a full shard on disk, across all of its files
+        :param shard_size: Number of steps per shard. Overrides shard_bytes if given.
+        :param info_keys: Keys of scalar info values to store. Steps whose info lacks a key store NaN.
+        """
+        super().__init__(env)
+        self.directory = directory
+        self.info_keys = list(info_keys)
+        makedirs(directory, exist_ok=True)
+        obs_space = env.observation_space
+        self.fields = {"obs": (np.dtype(obs_space.dtype).str, list(obs_space.shape)),
+                       "action": (np.dtype(np.int64).str, []),
+                       "reward": (np.dtype(np.float32).str, []),
+                       "terminated": (np.dtype(bool).str, []),
+                       "truncated": (np.dtype(bool).str, [])}
+        for key in self.info_keys:
+            self.fields["info_" + key] = (np.dtype(np.float64).str, [])
+        step_bytes = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for dtype, shape in self.fields.values())
+        self.shard_size = shard_size or max(1, shard_bytes // step_bytes)
+        # Steps in each finished shard
+        self.shards = []
+        # Memory maps of the shard being written, and how many steps it holds
+        self.arrays = None
+        self.length = 0
+        # Observation the next action will be taken in
+        self.last_obs = None
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        self.last_obs = obs
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        if self.arrays is None:
+            self.open_shard()
+        row = self.length
+        self.arrays["obs"][row] = self.last_obs
+        self.arrays["action"][row] = action
+        self.arrays["reward"][row] = reward
+        self.arrays["terminated"][row] = terminated
+        self.arrays["truncated"][row] = truncated
+        for key in self.info_keys:
+            self.arrays["info_" + key][row] = info.get(key, np.nan)
+        self.length += 1
+        if self.length == self.shard_size:
+            self.close_shard()
+        self.last_obs = obs
+        return obs, reward, terminated, truncated, info
+
+    def get_shard_path(self, shard, field):
+        """
+        :param shard: The shard number
+        :param field: The field name
+        :return: (string) Path of the field's file in the shard
+        """
+        return path.join(self.directory, f"{shard:05d}.{field}.npy")
+
+    def open_shard(self):
+        """
+        Creates the files of the next shard.
+        :return: N/A
+        """
+        shard = len(self.shards)
+        self.arrays = {field: np.lib.format.open_memmap(self.get_shard_path(shard, field), mode="w+",
+                                                        dtype=np.dtype(dtype), shape=(self.shard_size, *shape))
+                       for field, (dtype, shape) in self.fields.items()}
+        self.length = 0
+
+    def close_shard(self):
+        """
+        Flushes the current shard to disk and records it in the index.
+        :return: N/A
+        """
+        for array in self.arrays.values():
+            array.flush()
+        self.shards.append(self.length)
+        self.arrays = None
+        self.length = 0
+        self.write_index()
+
+    def flush(self):
+        """
+        Flushes the shard being written and updates the index, so readers see every step so far.
+        :return: N/A
+        """
+        if self.arrays is not None:
+            for array in self.arrays.values():
+                array.flush()
+        self.write_index()
+
+    def write_index(self):
+        """
+        Writes the index file. Written to a temporary file first, so readers never see a partial index.
+        :return: N/A
+        """
+        lengths = self.shards + ([self.length] if self.arrays is not None and self.length else [])
+        index_path = path.join(self.directory, INDEX_FILE)
+        with open(index_path + ".tmp", "w") as f:
+            f.write(dumps({"version": VERSION, "shard_size": self.shard_size, "fields": self.fields,
+                           "shards": lengths, "num_steps": sum(lengths)}))
+        replace(index_path + ".tmp", index_path)
+
+    def close(self):
+        if self.arrays is not None:
+            shard, length = len(self.shards), self.length
+            for array in self.arrays.values():
+                array.flush()
+            # The memory maps must be gone before their files are shrunk
+            self.arrays = None
+            for field in self.fields:
+                if length:
+                    truncate_npy(self.get_shard_path(shard, field), length)
+                else:
+                    remove(self.get_shard_path(shard, field))
+            if length:
+                self.shards.append(length)
+            self.length = 0
+        self.write_index()
+        super().close()
+
+
+def truncate_npy(file_path, length):
+    """
+    Shrinks a .npy file in place to its first `length` rows. The header is rewritten with the new shape and padded to
+    its old size, so the data doesn't move.
+    :param file_path: Path of the .npy file
+    :param length: Number of rows to keep
+    :return: N/A
+    """
+    with open(file_path, "r+b") as f:
+        version = np.lib.format.read_magic(f)
+        header_start = f.tell() + (2 if version == (1, 0) else 4)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        data_start = f.tell()
+        header = repr({"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                       "shape": (length, *shape[1:])})
+        f.seek(header_start)
+        f.write(header.ljust(data_start - header_start - 1).encode("latin1") + b"\n")
+        f.truncate(data_start + length * dtype.itemsize * int(np.prod(shape[1:])))
+
+
+class TrajectoryDataset:
+    """
+    Reads a dataset written by TrajectoryWriter. Shards are memory-mapped, so only the rows that are read are loaded.
+    """
+    def __init__(self, directory):
+        """
+        :param directory: Directory the dataset was written to
+        """
+        self.directory = directory
+        index = loads(open(path.join(directory, INDEX_FILE), "r").read())
+        if index["version"] != VERSION:
+            raise ValueError(f"Unsupported trajectory dataset version {index['version']} in {directory}.")
+        self.fields = list(index["fields"])
+        self.lengths = index["shards"]
+        # Index of the first step in each shard, and one past the last step
+        self.starts = np.concatenate(([0], np.cumsum(self.lengths))).astype(np.int64)
+        # Memory maps of each shard, opened on first use
+        self.shards = {}
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def get_shard(self, shard):
+        """
+        :param shard: The shard number
+        :return: (dict) Field name to memory-mapped array
+        """
+        if shard not in self.shards:
+            self.shards[shard] = {field: np.load(path.join(self.directory, f"{shard:05d}.{field}.npy"), mmap_mode="r")
+                                  for field in self.fields}
+        return self.shards[shard]
+
+    def get_batch(self, indexes, fields=None):
+        """
+        Reads the given steps.
+        :param indexes: Step numbers, across the whole dataset
+        :param fields: Fields to read. Defaults to all of them.
+        :return: (dict) Field name to array of the steps' values, in the order of `indexes`
+        """
+        indexes = np.asarray(indexes, dtype=np.int64)
+        if len(indexes) and (indexes.min() < 0 or indexes.max() >= len(self)):
+            raise IndexError(f"Step indexes must be in [0, {len(self)}).")
+        fields = fields or self.fields
+        shards = np.searchsorted(self.starts, indexes, side="right") - 1
+        batch = None
+        for shard in np.unique(shards):
+            rows = np.flatnonzero(shards == shard)
+            arrays = self.get_shard(int(shard))
+            if batch is None:
+                batch = {field: np.empty((len(indexes), *arrays[field].shape[1:]), dtype=arrays[field].dtype)
+                         for field in fields}
+            for field in fields:
+                batch[field][rows] = arrays[field][indexes[rows] - self.starts[shard]]
+        if batch is None:
+            batch = {field: np.empty(0) for field in fields}
+        return batch
+
+    def sample(self, batch_size, rng=None, fields=None):
+        """
+        Reads a batch of steps chosen uniformly at random.
+        :param batch_size: Number of steps
+        :param rng: (np.random.Generator) Generator to draw from. Defaults to a fresh one.
+        :param fields: Fields to read. Defaults to all of them.
+        :return: (dict) Field name to array of the steps' values
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        return self.get_batch(rng.integers(len(self), size=batch_size), fields)
@@ -0,0 +1,701 @@
+from game.level_registry import get_config
+from game.level_registry import get_level_registry
+import numpy as np
+
+
+class BatchDiceAdventure:
+    """
+    Simulates N games of Dice Adventure in lockstep. Game state is held as struct-of-arrays (one row per game) and a
+    batch of actions, one per game per player, is applied with NumPy operations across all games at once.
+
+    The rules follow DiceAdventure: the same phase machine as check_phase()/update_phase(), the same plan execution
+    as execute_plans() and execute_enemy_plans(), the same combat rules as combat(), and the same level control as
+    next_level(). Dice rolls and monster moves come from this object's own NumPy generator, so individual games are
+    not roll-for-roll identical to a DiceAdventure game, but follow the same distributions. Metrics tracking and
+    rendering are not supported.
+
+    Actions are integer codes indexing BatchDiceAdventure.ACTIONS (the same mapping used by the AdiAgent gym
+    environment). An action of -1 means the player does nothing this step.
+
+    State arrays (N = number of games, P = 3 players in PLAYER_CODE_MAPPING order, E = max enemies per level):
+    - level_num (N), phase (N), num_rounds (N), terminated (N), subgoal_count (N)
+    - walls, occupancy, pins (N, H, W). Levels smaller than the largest level are padded with walls.
+    - player_y, player_x, health, action_points, dead, death_round, goal_reached (N, P)
+    - pin_y, pin_x, placed_pin, pin_finalized (N, P). Pin cursor is -1 outside of the pinning phase.
+    - plan, plan_y, plan_x (N, P, max action points), plan_len, plan_finalized (N, P)
+    - enemy_y, enemy_x, enemy_code, enemy_kind, enemy_alive, enemy_dice_val, enemy_dice_const (N, E)
+    """
+    ACTIONS = ("left", "right", "up", "down", "wait", "submit", "pinga", "pingb", "pingc", "pingd", "undo")
+    NO_ACTION = -1
+    # Enemy kinds
+    MONSTER = 0
+    TRAP = 1
+    STONE = 2
+    ENEMY_NAMES = ("Monster", "Trap", "Stone")
+
+    def __init__(self,
+                 num_games,
+                 level=1,
+                 limit_levels=None,
+                 level_sampling=False,
+                 num_repeats=0,
+                 restart_on_finish=False,
+                 round_cap=0,
+                 seed=None,
+                 levels_directory="game/levels/"):
+        """
+        :param num_games:           (int) The number of games to simulate
+        :param seed:                (int) Seed for dice rolls, monster moves and level sampling
+        :param levels_directory:    (string) Directory to load levels from
+        Remaining parameters behave as in DiceAdventure.
+        """
+        self.config = get_config()
+        self.num_games = num_games
+        self.rng = np.random.default_rng(seed)
+
+        ##############
+        # LEVEL VARS #
+        ##############
+        self.level_registry = get_level_registry(levels_directory)
+        self.limit_levels = limit_levels if limit_levels \
+            else [i for i in range(len(self.level_registry))]
+        self.levels = self.level_registry.get_levels(self.limit_levels)
+        self.level_nums = sorted(self.levels)
+        self.start_level = level if level in self.limit_levels else self.limit_levels[0]
+        self.num_repeats = num_repeats
+        self.level_sampling = level_sampling
+        self.restart_on_finish = restart_on_finish
+        self.round_cap = round_cap
+        self.respawn_wait = 2
+
+        ##############
+        # PHASE VARS #
+        ##############
+        phase_config = self.config["GAMEPLAY"]["PHASES"]
+        self.phases = phase_config["PHASE_LIST"]
+        self.pinning_phase = self.phases.index(phase_config["PINNING_PHASE_NAME"])
+        self.planning_phase = self.phases.index(phase_config["PLANNING_PHASE_NAME"])
+        self.moving_phase = self.phases.index(phase_config["PLAYER_EXECUTION_PHASE_NAME"])
+        self.enemy_execution_phase = self.phases.index(phase_config["ENEMY_EXECUTION_PHASE_NAME"])
+        action_config = self.config["GAMEPLAY"]["ACTIONS"]
+        self.valid_pin_actions = np.array([self.ACTIONS.index(a) for a in
+                                           action_config["VALID_PIN_ACTIONS"] + action_config["VALID_PIN_TYPES"]])
+        self.valid_move_actions = np.array([self.ACTIONS.index(a) for a in action_config["VALID_MOVE_ACTIONS"]])
+        self.direction_actions = np.array([self.ACTIONS.index(a) for a in action_config["DIRECTIONS"]])
+        self.pin_type_actions = np.array([self.ACTIONS.index(a) for a in action_config["VALID_PIN_TYPES"]])
+        self.submit_action = self.ACTIONS.index("submit")
+        self.wait_action = self.ACTIONS.index("wait")
+        # Change in (y, x) for each action. Non-movement actions do not move.
+        deltas = {"left": (0, -1), "right": (0, 1), "up": (1, 0), "down": (-1, 0)}
+        self.action_dy = np.array([deltas.get(a, (0, 0))[0] for a in self.ACTIONS])
+        self.action_dx = np.array([deltas.get(a, (0, 0))[1] for a in self.ACTIONS])
+        self.direction_dy = self.action_dy[self.direction_actions]
+        self.direction_dx = self.action_dx[self.direction_actions]
+
+        ################
+        # OBJECT SPECS #
+        ################
+        object_codes = self.config["OBJECT_INFO"]["OBJECT_CODES"]
+        self.players = list(self.config["OBJECT_INFO"]["PLAYERS"]["PLAYER_CODE_MAPPING"])
+        self.player_codes = [self.config["OBJECT_INFO"]["PLAYERS"]["PLAYER_CODE_MAPPING"][p] for p in self.players]
+        self.max_health = np.array([object_codes[c]["HEALTH"] for c in self.player_codes])
+        self.max_action_points = np.array([object_codes[c]["ACTION_POINTS"] for c in self.player_codes])
+        # Player dice against each enemy kind: (player, kind)
+        self.player_dice_val = np.array([[object_codes[c]["DICE_ROLLS"][k.upper()]["VAL"] for k in self.ENEMY_NAMES]
+                                         for c in self.player_codes])
+        self.player_dice_const = np.array([[object_codes[c]["DICE_ROLLS"][k.upper()]["CONST"]
+                                            for k in self.ENEMY_NAMES] for c in self.player_codes])
+        self.enemy_codes = [c for c, info in object_codes.items() if info["NAME"] in self.ENEMY_NAMES]
+        self.enemy_code_kind = np.array([self.ENEMY_NAMES.index(object_codes[c]["NAME"]) for c in self.enemy_codes])
+        self.enemy_code_val = np.array([object_codes[c]["DICE_ROLLS"]["VAL"] for c in self.enemy_codes])
+        self.enemy_code_const = np.array([object_codes[c]["DICE_ROLLS"]["CONST"] for c in self.enemy_codes])
+        self.enemy_code_action_points = np.array([object_codes[c].get("ACTION_POINTS", 0)
+                                                  if object_codes[c]["NAME"] == "Monster" else 0
+                                                  for c in self.enemy_codes])
+
+        # Parse every level once into padded arrays
+        self.level_data = {num: self.parse_level(grid) for num, grid in self.levels.items()}
+        self.height = max(d["walls"].shape[0] for d in self.level_data.values())
+        self.width = max(d["walls"].shape[1] for d in self.level_data.values())
+        self.max_enemies = max(max(len(d["enemies"]) for d in self.level_data.values()), 1)
+        self.level_data = {num: self.pad_level(d) for num, d in self.level_data.items()}
+
+        self.allocate()
+        self.reset()
+
+    #################
+    # LEVEL CONTROL #
+    #################
+
+    def parse_level(self, grid):
+        """
+        Extracts the static layout and starting objects of a level.
+        :param grid: The level grid from the level registry
+        :return: (dict) Level data
+        """
+        height, width = len(grid), len(grid[0])
+        walls = np.zeros((height, width), dtype=bool)
+        occupancy = np.zeros((height, width), dtype=np.int16)
+        shrines = np.full((len(self.players), 2), -1)
+        players = np.full((len(self.players), 2), -1)
+        tower = (-1, -1)
+        enemies = []
+        # Same order as Board.reset_board(), so enemies keep the order they have in Board.objects
+        for y in range(height):
+            for x in range(width):
+                code = grid[y][x]
+                if code == "##":
+                    walls[y, x] = True
+                    continue
+                if code == "..":
+                    continue
+                occupancy[y, x] += 1
+                if code in self.player_codes:
+                    players[self.player_codes.index(code)] = (y, x)
+                elif code[1] == "G" and code[0] + "S" in self.player_codes:
+                    shrines[self.player_codes.index(code[0] + "S")] = (y, x)
+                elif code == "**":
+                    tower = (y, x)
+                elif code in self.enemy_codes:
+                    enemies.append((y, x, self.enemy_codes.index(code)))
+        return {"walls": walls, "occupancy": occupancy, "shrines": shrines, "players": players,
+                "tower": np.array(tower), "enemies": enemies, "height": height, "width": width}
+
+    def pad_level(self, data):
+        """
+        Pads a parsed level to the batch dimensions. Padding cells are walls.
+        :param data: Output of parse_level()
+        :return: (dict) Padded level data
+        """
+        walls = np.ones((self.height, self.width), dtype=bool)
+        walls[:data["height"], :data["width"]] = data["walls"]
+        occupancy = np.zeros((self.height, self.width), dtype=np.int16)
+        occupancy[:data["height"], :data["width"]] = data["occupancy"]
+        enemy_y = np.zeros(self.max_enemies, dtype=np.int64)
+        enemy_x = np.zeros(self.max_enemies, dtype=np.int64)
+        enemy_code = np.zeros(self.max_enemies, dtype=np.int64)
+        enemy_alive = np.zeros(self.max_enemies, dtype=bool)
+        for i, (y, x, code) in enumerate(data["enemies"]):
+            enemy_y[i], enemy_x[i], enemy_code[i], enemy_alive[i] = y, x, code, True
+        enemy_kind = self.enemy_code_kind[enemy_code]
+        blockers = np.zeros((self.height, self.width), dtype=np.int16)
+        for i in np.nonzero(enemy_alive & (enemy_kind != self.MONSTER))[0]:
+            blockers[enemy_y[i], enemy_x[i]] += 1
+        return {**data, "walls": walls, "occupancy": occupancy, "blockers": blockers,
+                "enemy_y": enemy_y, "enemy_x": enemy_x, "enemy_code": enemy_code, "enemy_alive": enemy_alive}
+
+    def allocate(self):
+        """
+        Allocates the state arrays for all games.
+        :return: N/A
+        """
+        n, p, e = self.num_games, len(self.players), self.max_enemies
+        plan_size = int(self.max_action_points.max())
+        # Game
+        self.level_num = np.zeros(n, dtype=np.int64)
+        self.phase = np.zeros(n, dtype=np.int64)
+        self.num_rounds = np.zeros(n, dtype=np.int64)
+        self.terminated = np.zeros(n, dtype=bool)
+        self.restart_on_team_loss = np.zeros(n, dtype=bool)
+        self.lvl_repeats = np.zeros((n, len(self.level_nums)), dtype=np.int64)
+        self.subgoal_count = np.zeros(n, dtype=np.int64)
+        # Board
+        self.walls = np.zeros((n, self.height, self.width), dtype=bool)
+        self.occupancy = np.zeros((n, self.height, self.width), dtype=np.int16)
+        # Number of Stones and Traps in each cell, which monsters avoid
+        self.blockers = np.zeros((n, self.height, self.width), dtype=np.int16)
+        self.pins = np.zeros((n, self.height, self.width), dtype=np.int16)
+        self.shrine_y = np.zeros((n, p), dtype=np.int64)
+        self.shrine_x = np.zeros((n, p), dtype=np.int64)
+        self.tower_y = np.zeros(n, dtype=np.int64)
+        self.tower_x = np.zeros(n, dtype=np.int64)
+        # Players
+        self.player_y = np.zeros((n, p), dtype=np.int64)
+        self.player_x = np.zeros((n, p), dtype=np.int64)
+        self.start_y = np.zeros((n, p), dtype=np.int64)
+        self.start_x = np.zeros((n, p), dtype=np.int64)
+        self.health = np.zeros((n, p), dtype=np.int64)
+        self.action_points = np.zeros((n, p), dtype=np.int64)
+        self.dead = np.zeros((n, p), dtype=bool)
+        self.death_round = np.full((n, p), -1, dtype=np.int64)
+        self.goal_reached = np.zeros((n, p), dtype=bool)
+        # Pinning
+        self.pin_y = np.zeros((n, p), dtype=np.int64)
+        self.pin_x = np.zeros((n, p), dtype=np.int64)
+        self.placed_pin = np.zeros((n, p), dtype=bool)
+        self.pin_finalized = np.zeros((n, p), dtype=bool)
+        # Action planning
+        self.plan = np.zeros((n, p, plan_size), dtype=np.int64)
+        self.plan_y = np.zeros((n, p, plan_size), dtype=np.int64)
+        self.plan_x = np.zeros((n, p, plan_size), dtype=np.int64)
+        self.plan_len = np.zeros((n, p), dtype=np.int64)
+        self.path_y = np.zeros((n, p), dtype=np.int64)
+        self.path_x = np.zeros((n, p), dtype=np.int64)
+        self.plan_finalized = np.zeros((n, p), dtype=bool)
+        # Enemies
+        self.enemy_y = np.zeros((n, e), dtype=np.int64)
+        self.enemy_x = np.zeros((n, e), dtype=np.int64)
+        self.enemy_code = np.zeros((n, e), dtype=np.int64)
+        self.enemy_kind = np.zeros((n, e), dtype=np.int64)
+        self.enemy_alive = np.zeros((n, e), dtype=bool)
+        self.enemy_dice_val = np.zeros((n, e), dtype=np.int64)
+        self.enemy_dice_const = np.zeros((n, e), dtype=np.int64)
+        self.enemy_action_points = np.zeros((n, e), dtype=np.int64)
+
+    def reset(self, games=None):
+        """
+        Resets the given games to the starting level.
+        :param games: Boolean mask or indexes of games to reset. If None, resets every game.
+        :return: N/A
+        """
+        games = np.arange(self.num_games) if games is None else self.as_indexes(games)
+        self.lvl_repeats[games] = self.num_repeats
+        self.terminated[games] = False
+        self.restart_on_team_loss[games] = False
+        for g in games:
+            self.load_level(g, self.start_level)
+
+    def load_level(self, g, level_num):
+        """
+        Sets up a single game on the given level (the equivalent of building a new Board).
+        :param g: The game index
+        :param level_num: The level to load
+        :return: N/A
+        """
+        d = self.level_data[level_num]
+        self.level_num[g] = level_num
+        self.phase[g] = 0
+        self.num_rounds[g] = 0
+        self.subgoal_count[g] = 0
+        self.walls[g] = d["walls"]
+        self.occupancy[g] = d["occupancy"]
+        self.blockers[g] = d["blockers"]
+        self.pins[g] = 0
+        self.shrine_y[g], self.shrine_x[g] = d["shrines"][:, 0], d["shrines"][:, 1]
+        self.tower_y[g], self.tower_x[g] = d["tower"]
+        self.player_y[g], self.player_x[g] = d["players"][:, 0], d["players"][:, 1]
+        self.start_y[g], self.start_x[g] = d["players"][:, 0], d["players"][:, 1]
+        self.health[g] = self.max_health
+        self.action_points[g] = self.max_action_points
+        self.dead[g] = False
+        self.death_round[g] = -1
+        self.goal_reached[g] = False
+        self.pin_y[g], self.pin_x[g] = self.player_y[g], self.player_x[g]
+        self.placed_pin[g] = False
+        self.pin_finalized[g] = False
+        self.plan_len[g] = 0
+        self.plan_finalized[g] = False
+        self.enemy_y[g], self.enemy_x[g] = d["enemy_y"], d["enemy_x"]
+        self.enemy_code[g] = d["enemy_code"]
+        self.enemy_alive[g] = d["enemy_alive"]
+        self.enemy_kind[g] = self.enemy_code_kind[d["enemy_code"]]
+        self.enemy_dice_val[g] = self.enemy_code_val[d["enemy_code"]]
+        self.enemy_dice_const[g] = self.enemy_code_const[d["enemy_code"]]
+        self.enemy_action_points[g] = self.enemy_code_action_points[d["enemy_code"]]
+
+    def next_level(self, games):
+        """
+        Moves each of the given games to its next level or repeats the same level. Same rules as
+        DiceAdventure.next_level().
+        :param games: Boolean mask of games
+        :return: N/A
+        """
+        for g in np.nonzero(games)[0]:
+            level_num = int(self.level_num[g])
+            # Don't change anything if restarting level due to whole team dying
+            if not self.restart_on_team_loss[g]:
+                eligible = [self.level_nums[i] for i in np.nonzero(self.lvl_repeats[g] >= 0)[0]]
+                if not eligible:
+                    self.terminated[g] = True
+                    continue
+                if self.level_sampling:
+                    level_num = int(self.rng.choice(eligible))
+                else:
+                    level_num += 1
+                if level_num in self.level_data:
+                    self.lvl_repeats[g, self.level_nums.index(level_num)] -= 1
+                # If finished final level and set to restart, go back to first level
+                if not self.level_sampling and (level_num > len(self.levels) or level_num not in self.level_data):
+                    if self.restart_on_finish:
+                        level_num = self.limit_levels[0] if self.limit_levels[0] in self.level_data \
+                            else self.level_nums[0]
+                    else:
+                        self.terminated[g] = True
+                        continue
+                self.restart_on_team_loss[g] = False
+            self.load_level(g, level_num)
+
+    ###############
+    # SEND ACTION #
+    ###############
+
+    def step(self, actions):
+        """
+        Applies one action per game per player. Within each game, players act in PLAYER_CODE_MAPPING order, as if
+        DiceAdventure.execute_action() were called for each player in turn. Terminated games ignore actions.
+        :param actions: (N, P) integer action codes (indexes into ACTIONS, or -1 for no action)
+        :return: N/A
+        """
+        actions = np.asarray(actions)
+        for p in range(len(self.players)):
+            self.execute_action(p, actions[:, p])
+
+    def execute_action(self, p, actions):
+        """
+        Applies an action for one player in every game.
+        :param p: The player index
+        :param actions: (N) integer action codes
+        :return: N/A
+        """
+        live = ~self.terminated & (actions >= 0)
+        checked = self.pin_planning(p, actions, live & (self.phase == self.pinning_phase))
+        checked |= self.action_planning(p, actions, live & (self.phase == self.planning_phase))
+        self.check_phase(checked)
+
+    ##############################
+    # PHASE PLANNING & EXECUTION #
+    ##############################
+
+    def pin_planning(self, p, actions, games):
+        """
+        Executes logic for the pin planning phase.
+        :return: Boolean mask of games where the action was accepted (and the phase should be checked)
+        """
+        valid = games & ~self.dead[:, p] & np.isin(actions, self.valid_pin_actions) & ~self.pin_finalized[:, p]
+        self.pin_finalized[valid & (actions == self.submit_action), p] = True
+        has_points = valid & (self.action_points[:, p] > 0)
+        # Move pin cursor
+        g = np.nonzero(has_points & np.isin(actions, self.direction_actions))[0]
+        if len(g):
+            y = self.pin_y[g, p] + self.action_dy[actions[g]]
+            x = self.pin_x[g, p] + self.action_dx[actions[g]]
+            ok = self.valid_cells(g, y, x)
+            self.pin_y[g[ok], p] = y[ok]
+            self.pin_x[g[ok], p] = x[ok]
+        # Place pin
+        g = np.nonzero(has_points & np.isin(actions, self.pin_type_actions))[0]
+        if len(g):
+            self.pins[g, self.pin_y[g, p], self.pin_x[g, p]] += 1
+            self.occupancy[g, self.pin_y[g, p], self.pin_x[g, p]] += 1
+            self.placed_pin[g, p] = True
+            self.action_points[g, p] -= 1
+            self.pin_y[g, p] = self.player_y[g, p]
+            self.pin_x[g, p] = self.player_x[g, p]
+        # If player is out of action points and has placed a pin, they are forced to submit
+        self.pin_finalized[valid & self.placed_pin[:, p] & (self.action_points[:, p] <= 0), p] = True
+        return valid
+
+    def action_planning(self, p, actions, games):
+        """
+        Executes logic for the action planning phase.
+        :return: Boolean mask of games where the action was accepted (and the phase should be checked)
+        """
+        valid = games & ~self.dead[:, p] & np.isin(actions, self.valid_move_actions) & ~self.plan_finalized[:, p]
+        # Set init values of action plan
+        init = valid & (self.plan_len[:, p] == 0)
+        self.path_y[init, p] = self.player_y[init, p]
+        self.path_x[init, p] = self.player_x[init, p]
+        submit = valid & (actions == self.submit_action)
+        self.plan_finalized[submit, p] = True
+
+        g = np.nonzero(valid & ~submit & (self.action_points[:, p] > 0))[0]
+        if len(g):
+            y = self.path_y[g, p] + self.action_dy[actions[g]]
+            x = self.path_x[g, p] + self.action_dx[actions[g]]
+            ok = self.valid_cells(g, y, x)
+            # Invalid moves are a no-op and do not check the phase
+            valid[g[~ok]] = False
+            g, y, x = g[ok], y[ok], x[ok]
+            step = self.plan_len[g, p]
+            self.plan[g, p, step] = actions[g]
+            self.plan_y[g, p, step] = y
+            self.plan_x[g, p, step] = x
+            self.plan_len[g, p] += 1
+            self.path_y[g, p] = y
+            self.path_x[g, p] = x
+            self.action_points[g, p] -= 1
+        return valid
+
+    def check_phase(self, games):
+        """
+        Checks whether conditions have been met to end the current phase and apply the actions of the current phase.
+        :param games: Boolean mask of games to check
+        :return: N/A
+        """
+        pins_done = games & (self.phase == self.pinning_phase) & (self.pin_finalized | self.dead).all(axis=1)
+        plans_done = games & (self.phase == self.planning_phase) & (self.plan_finalized | self.dead).all(axis=1)
+
+        if pins_done.any():
+            self.pin_y[pins_done] = -1
+            self.pin_x[pins_done] = -1
+            self.pin_finalized[pins_done] = False
+            self.update_phase(pins_done)
+
+        if plans_done.any():
+            # Update phase to player execution
+            self.update_phase(plans_done)
+            tower_reached = self.execute_plans(plans_done)
+            self.next_level(tower_reached)
+            remaining = plans_done & ~tower_reached
+            # Change to enemy execution phase
+            self.update_phase(remaining)
+            self.end_round(remaining)
+
+    def update_phase(self, games):
+        """
+        Moves the given games to their next phase.
+        :param games: Boolean mask of games
+        :return: N/A
+        """
+        self.phase[games] = (self.phase[games] + 1) % len(self.phases)
+        # Check if players need respawning
+        self.check_player_status(games)
+        # Trigger enemy movement
+        enemy_games = games & (self.phase == self.enemy_execution_phase)
+        if enemy_games.any():
+            self.execute_enemy_plans(enemy_games)
+            self.num_rounds[enemy_games] += 1
+            # If a cap has been placed on the number of rounds per level and that cap has been exceeded,
+            # move on to next level
+            if self.round_cap:
+                self.next_level(enemy_games & (self.num_rounds > self.round_cap))
+
+    def end_round(self, games):
+        """
+        Removes pins and resets player phase values, as done at the end of DiceAdventure.check_phase().
+        :param games: Boolean mask of games
+        :return: N/A
+        """
+        self.pin_y[games] = self.player_y[games]
+        self.pin_x[games] = self.player_x[games]
+        self.placed_pin[games] = False
+        self.pin_finalized[games] = False
+        self.plan_len[games] = 0
+        self.plan_finalized[games] = False
+        self.occupancy[games] -= self.pins[games]
+        self.pins[games] = 0
+
+    def check_player_status(self, games):
+        """
+        Restarts the level for games where every player is dead and respawns players that have waited long enough.
+        :param games: Boolean mask of games
+        :return: N/A
+        """
+        team_dead = games & self.dead.all(axis=1)
+        if team_dead.any():
+            self.restart_on_team_loss[team_dead] = True
+            self.next_level(team_dead)
+        respawn = (games & ~team_dead)[:, None] & self.dead \
+            & (self.num_rounds[:, None] - self.death_round >= self.respawn_wait)
+        for p in range(len(self.players)):
+            g = np.nonzero(respawn[:, p])[0]
+            if len(g):
+                self.dead[g, p] = False
+                self.death_round[g, p] = -1
+                self.health[g, p] = self.max_health[p]
+                self.move_players(g, p, self.start_y[g, p], self.start_x[g, p])
+
+    def execute_plans(self, games):
+        """
+        Executes plans for each player by iterating over team until no actions remain in their plans.
+        :param games: Boolean mask of games
+        :return: Boolean mask of games where a player reached the tower
+        """
+        tower_reached = np.zeros(self.num_games, dtype=bool)
+        max_moves = np.where(games, self.plan_len.max(axis=1), 0)
+        for i in range(int(max_moves.max(initial=0))):
+            active = (max_moves > i) & ~tower_reached
+            for p in range(len(self.players)):
+                movers = active & ~self.dead[:, p] & (i < self.plan_len[:, p])
+                g = np.nonzero(movers)[0]
+                if not len(g):
+                    continue
+                action = self.plan[g, p, i]
+                y = self.player_y[g, p] + self.action_dy[action]
+                x = self.player_x[g, p] + self.action_dx[action]
+                ok = (action != self.wait_action) & self.valid_cells(g, y, x)
+                self.move_players(g[ok], p, y[ok], x[ok])
+                # Check if player has reached goal
+                at_goal = movers & ~self.goal_reached[:, p] \
+                    & (self.player_y[:, p] == self.shrine_y[:, p]) & (self.player_x[:, p] == self.shrine_x[:, p])
+                self.goal_reached[at_goal, p] = True
+                self.subgoal_count[at_goal] += 1
+                # Check if player has reached tower
+                at_tower = movers & self.goal_reached[:, p] \
+                    & (self.player_y[:, p] == self.tower_y) & (self.player_x[:, p] == self.tower_x)
+                tower_reached |= at_tower
+                active &= ~at_tower
+            self.check_combat(active, i)
+        return tower_reached
+
+    def execute_enemy_plans(self, games):
+        """
+        Executes plans for enemy monsters. Each pass, every surviving monster with moves left takes a random-walk
+        step (in enemy order), then combat is checked.
+        :param games: Boolean mask of games
+        :return: N/A
+        """
+        monsters = self.enemy_alive & (self.enemy_kind == self.MONSTER)
+        active = games & monsters.any(axis=1)
+        move_count = 0
+        while active.any():
+            movers = active[:, None] & self.enemy_alive & (self.enemy_kind == self.MONSTER) \
+                & (move_count < self.enemy_action_points)
+            for e in np.nonzero(movers.any(axis=0))[0]:
+                self.move_monsters(np.nonzero(movers[:, e])[0], e)
+            self.check_combat(active, None)
+            active &= movers.any(axis=1)
+            move_count += 1
+        self.update_phase(games)
+
+    ##########################
+    # POSITIONING & MOVEMENT #
+    ##########################
+
+    def valid_cells(self, g, y, x, monster=False):
+        """
+        Checks whether positions are valid for movement/placement. Same rules as Board.check_valid_move(): in bounds,
+        not a wall and not an empty space. Monsters also avoid Stones and Traps.
+        :param g: Game indexes
+        :param y: Target y positions
+        :param x: Target x positions
+        :param monster: Whether to apply the monster avoid rules
+        :return: Boolean array
+        """
+        in_bounds = (y >= 0) & (y < self.height) & (x >= 0) & (x < self.width)
+        yc = np.clip(y, 0, self.height - 1)
+        xc = np.clip(x, 0, self.width - 1)
+        ok = in_bounds & (self.occupancy[g, yc, xc] > 0)
+        if monster:
+            ok &= self.blockers[g, yc, xc] == 0
+        return ok
+
+    def move_players(self, g, p, y, x):
+        """
+        Moves player p in games g to the given positions.
+        """
+        if not len(g):
+            return
+        self.occupancy[g, self.player_y[g, p], self.player_x[g, p]] -= 1
+        self.occupancy[g, y, x] += 1
+        self.player_y[g, p] = y
+        self.player_x[g, p] = x
+
+    def move_monsters(self, g, e):
+        """
+        Moves enemy slot e in games g one step in a uniformly random valid direction, or not at all if no direction
+        is valid. Equivalent to Board.move_monster(), which shuffles the directions and takes the first valid one.
+        """
+        y = self.enemy_y[g, e][:, None] + self.direction_dy[None, :]
+        x = self.enemy_x[g, e][:, None] + self.direction_dx[None, :]
+        valid = self.valid_cells(g[:, None], y, x, monster=True)
+        num_valid = valid.sum(axis=1)
+        choice = (self.rng.random(len(g)) * num_valid).astype(np.int64)
+        # Index of the chosen valid direction
+        direction = (np.cumsum(valid, axis=1) <= choice[:, None]).sum(axis=1)
+        moving = num_valid > 0
+        g, direction = g[moving], direction[moving]
+        new_y, new_x = y[moving, direction], x[moving, direction]
+        self.occupancy[g, self.enemy_y[g, e], self.enemy_x[g, e]] -= 1
+        self.occupancy[g, new_y, new_x] += 1
+        self.enemy_y[g, e] = new_y
+        self.enemy_x[g, e] = new_x
+
+    def remove_enemies(self, g, enemies):
+        """
+        Removes enemies from the board.
+        :param g: Game indexes
+        :param enemies: (len(g), E) boolean mask of enemies to remove
+        :return: N/A
+        """
+        rows, slots = np.nonzero(enemies)
+        games = g[rows]
+        y, x = self.enemy_y[games, slots], self.enemy_x[games, slots]
+        self.enemy_alive[games, slots] = False
+        np.subtract.at(self.occupancy, (games, y, x), 1)
+        blocker = self.enemy_kind[games, slots] != self.MONSTER
+        np.subtract.at(self.blockers, (games[blocker], y[blocker], x[blocker]), 1)
+
+    ##########
+    # COMBAT #
+    ##########
+
+    def check_combat(self, games, step_index=None):
+        """
+        Checks if players and enemies are co-located which would initiate combat.
+        :param games: Boolean mask of games
+        :param step_index: Determines the position in the action sequence
+        :return: N/A
+        """
+        g = np.nonzero(games)[0]
+        if not len(g):
+            return
+        # Locations are taken before any combat, like the player location set in DiceAdventure.check_combat()
+        loc_y, loc_x = self.player_y[g].copy(), self.player_x[g].copy()
+        for p in range(len(self.players)):
+            # Each location is only checked once
+            first = np.ones(len(g), dtype=bool)
+            for q in range(p):
+                first &= (loc_y[:, q] != loc_y[:, p]) | (loc_x[:, q] != loc_x[:, p])
+            sub, y, x = g[first], loc_y[first, p], loc_x[first, p]
+            enemies = self.enemy_alive[sub] & (self.enemy_y[sub] == y[:, None]) & (self.enemy_x[sub] == x[:, None])
+            fight = enemies.any(axis=1)
+            if not fight.any():
+                continue
+            sub, y, x, enemies = sub[fight], y[fight], x[fight], enemies[fight]
+            players = (self.player_y[sub] == y[:, None]) & (self.player_x[sub] == x[:, None])
+            self.combat(sub, players, enemies, step_index)
+
+    def combat(self, g, players, enemies, step_index):
+        """
+        Executes combat logic for one location in each of the given games. Same rules as DiceAdventure.combat().
+        :param g: Game indexes
+        :param players: (len(g), P) mask of players at the location
+        :param enemies: (len(g), E) mask of enemies at the location
+        :param step_index: Determines the position in the action sequence
+        :return: N/A
+        """
+        # Enemies are always all the same type
+        kind = self.enemy_kind[g, enemies.argmax(axis=1)]
+        player_val = self.player_dice_val[:, kind].T
+        player_const = self.player_dice_const[:, kind].T
+        player_rolls = ((self.rng.random(player_val.shape) * player_val).astype(np.int64) + player_const)
+        enemy_rolls = ((self.rng.random(enemies.shape) * self.enemy_dice_val[g]).astype(np.int64)
+                       + self.enemy_dice_const[g])
+        # Players win ties
+        win = (player_rolls * players).sum(axis=1) >= (enemy_rolls * enemies).sum(axis=1)
+        self.remove_enemies(g[win], enemies[win])
+
+        lose = ~win
+        g, players, enemies, kind = g[lose], players[lose], enemies[lose], kind[lose]
+        if not len(g):
+            return
+        for p in range(len(self.players)):
+            in_combat = players[:, p]
+            # Monsters and Traps take a heart
+            self.health[g[in_combat & (kind != self.STONE)], p] -= 1
+            if step_index:
+                # Go back a step if player has moved (Monsters only). Players whose plan ended before this step
+                # stay where they are
+                back = g[in_combat & (kind == self.MONSTER) & (self.plan_len[g, p] > 0)
+                         & (step_index - 1 < self.plan_len[g, p])]
+                self.move_players(back, p, self.plan_y[back, p, step_index - 1], self.plan_x[back, p, step_index - 1])
+                # Truncate action plan
+                truncate = in_combat & ((kind != self.MONSTER) | (self.plan_len[g, p] > 0))
+                self.plan_len[g[truncate], p] = 0
+            # If player dies, mark as dead
+            died = g[in_combat & (self.health[g, p] <= 0)]
+            self.health[died, p] = 0
+            self.dead[died, p] = True
+            self.death_round[died, p] = self.num_rounds[died]
+        # Traps are destroyed
+        trap = kind == self.TRAP
+        self.remove_enemies(g[trap], enemies[trap])
+
+    ###########
+    # HELPERS #
+    ###########
+
+    def as_indexes(self, games):
+        games = np.asarray(games)
+        return np.nonzero(games)[0] if games.dtype == bool else games
@@ -0,0 +1,130 @@
+from game.level_registry import CONFIG_FILE
+from game.level_registry import get_config
+from itertools import combinations
+from itertools import combinations_with_replacement
+from os import path
+import numpy as np
+
+# Process-wide cache, same as the config and level registries
+_combat_odds = {}
+
+
+def get_combat_odds(config_file=CONFIG_FILE):
+    """
+    Returns the combat odds table for the given config, building it the first time it is requested in this process.
+    :param config_file: Path to the config file
+    :return: (CombatOdds) The shared table
+    """
+    key = path.abspath(config_file)
+    if key not in _combat_odds:
+        _combat_odds[key] = CombatOdds(get_config(config_file))
+    return _combat_odds[key]
+
+
+class CombatOdds:
+    """
+    Exact combat outcome probabilities, built by convolving the dice distributions in the config. Players win a combat
+    if the sum of their rolls is at least the sum of the enemies' rolls (see DiceAdventure.combat()).
+
+    Entries for every group of players against every stack of up to `max_stack` enemies of one kind are built up
+    front. Larger stacks are computed on first use and then kept.
+    """
+    def __init__(self, config, max_stack=3):
+        """
+        :param config: The game config
+        :param max_stack: Largest enemy stack to build entries for up front
+        """
+        object_codes = config["OBJECT_INFO"]["OBJECT_CODES"]
+        player_codes = sorted(config["OBJECT_INFO"]["PLAYERS"]["PLAYER_CODE_MAPPING"].values())
+        # Roll distribution of each player against each enemy kind, and of each enemy
+        self.player_dists = {(code, kind): self.get_dice_distribution(dice["VAL"], dice["CONST"])
+                             for code in player_codes
+                             for kind, dice in object_codes[code]["DICE_ROLLS"].items()}
+        self.enemy_dists = {code: self.get_dice_distribution(info["DICE_ROLLS"]["VAL"], info["DICE_ROLLS"]["CONST"])
+                            for code, info in object_codes.items()
+                            if code not in player_codes and "DICE_ROLLS" in info}
+        self.enemy_kinds = {code: object_codes[code]["NAME"].upper() for code in self.enemy_dists}
+        # (enemy kind, player codes, enemy codes) -> (probability players win, expected player total, expected enemy
+        # total)
+        self.table = {}
+
+        player_groups = [group for size in range(1, len(player_codes) + 1)
+                         for group in combinations(player_codes, size)]
+        for kind in set(self.enemy_kinds.values()):
+            enemies = sorted(code for code in self.enemy_kinds if self.enemy_kinds[code] == kind)
+            for size in range(1, max_stack + 1):
+                for stack in combinations_with_replacement(enemies, size):
+                    for group in player_groups:
+                        self.table[(kind, group, stack)] = self.compute(kind, group, stack)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # Shared between games, so copies of a game share it too
+        return self
+
+    @staticmethod
+    def get_dice_distribution(val, const):
+        """
+        Gets the distribution of a single roll. Rolls are uniform in [0, val) plus a constant, or just the constant
+        if val is 0.
+        :param val: Number of faces
+        :param const: Constant added to the roll
+        :return: (np.ndarray) Probability of each total, indexed by total
+        """
+        dist = np.zeros(const + max(val, 1))
+        dist[const:] = 1 / max(val, 1)
+        return dist
+
+    def compute(self, kind, players, enemies):
+        """
+        Computes the odds of a combat from the dice distributions.
+        :param kind: The enemy kind the players roll against (MONSTER, TRAP or STONE)
+        :param players: Codes of the players in the combat
+        :param enemies: Codes of the enemies in the combat
+        :return: (tuple) Probability players win, expected player total, expected enemy total
+        """
+        player_dist = np.ones(1)
+        for code in players:
+            player_dist = np.convolve(player_dist, self.player_dists[(code, kind)])
+        enemy_dist = np.ones(1)
+        for code in enemies:
+            enemy_dist = np.convolve(enemy_dist, self.enemy_dists[code])
+        # P(enemy total <= t) for every player total t
+        enemy_cdf = np.cumsum(enemy_dist)
+        totals = np.arange(len(player_dist))
+        win = float(np.dot(player_dist, enemy_cdf[np.minimum(totals, len(enemy_cdf) - 1)]))
+        expected_enemy = float(np.dot(enemy_dist, np.arange(len(enemy_dist))))
+        return min(win, 1.0), float(np.dot(player_dist, totals)), expected_enemy
+
+    def get_entry(self, players, enemies):
+        """
+        Gets the odds of the given players fighting the given enemies.
+        :param players: Codes of the players in the combat (e.g. ["1S", "3S"])
+        :param enemies: Codes of the enemies in the combat (e.g. ["M2", "M2"]). Players roll against the kind of the
+        first one, as in DiceAdventure.combat().
+        :return: (tuple) Probability players win, expected player total, expected enemy total
+        """
+        key = (self.enemy_kinds[enemies[0]], tuple(sorted(players)), tuple(sorted(enemies)))
+        entry = self.table.get(key)
+        if entry is None:
+            entry = self.table[key] = self.compute(*key)
+        return entry
+
+    def win_probability(self, players, enemies):
+        """
+        :param players: Codes of the players in the combat
+        :param enemies: Codes of the enemies in the combat
+        :return: (float) The probability that the players win
+        """
+        return self.get_entry(players, enemies)[0]
+
+    def expected_rolls(self, players, enemies):
+        """
+        :param players: Codes of the players in the combat
+        :param enemies: Codes of the enemies in the combat
+        :return: (float, float) Expected total of the players' rolls, expected total of the enemies' rolls
+        """
+        entry = self.get_entry(players, enemies)
+        return entry[1], entry[2]
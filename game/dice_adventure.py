@@ -1,13 +1,31 @@
-from copy import deepcopy
-from json import loads
-from os import listdir
+from classes.array_board import ArrayBoard
 from classes.board import Board
+from classes.compiled_config import compile_config
+from classes.dice_rng import DiceRNG
 from classes.game_objects import *
+from classes.immutable import freeze
 from classes.metrics_tracker import GameMetricsTracker
-from random import choice
+from collections import OrderedDict
+from collections import deque
+from game.combat_odds import get_combat_odds
+from game.level_bundle import get_level_bundle
+from game.level_index import get_level_index
+from game.level_registry import get_config
+from game.level_registry import get_level_registry
+from game.replay import HASH_SIZE
+from game.replay import Replay
+from game.state_delta import diff_states
+from hashlib import blake2b
+from time import perf_counter
+import numpy as np
 
 
 class DiceAdventure:
+    COMBAT_MODES = ("roll", "expected", "threshold")
+    # Methods timed when the game is created with time_phases=True
+    TIMED_METHODS = ("pin_planning", "action_planning", "check_phase", "execute_plans", "execute_enemy_plans",
+                     "check_combat", "combat", "next_level", "get_state")
+
     def __init__(self,
                  level=1,
                  limit_levels=None,
@@ -18,13 +36,44 @@ class DiceAdventure:
                  render_verbose=True,
                  restart_on_finish=False,
                  round_cap=0,
-                 track_metrics=False):
+                 track_metrics=False,
+                 array_board=False,
+                 seed=None,
+                 combat_mode="roll",
+                 combat_threshold=0.5,
+                 level_bundle=None,
+                 level_index=None,
+                 level_query=None,
+                 level_weights=None,
+                 event_buffer_size=0,
+                 record_replay=False,
+                 replay_checkpoint_interval=1000,
+                 time_phases=False):
 
         #################
         # GAME METADATA #
         #################
-        self.config = loads(open("game/config/main_config.json", "r").read())
+        # Shared read-only between all games in the process
+        self.config = get_config()
+        # Flat lookup tables and action sets compiled from the config, shared the same way
+        self.compiled = compile_config(self.config)
         self.terminated = False
+        # All dice rolls, monster moves and level sampling draw from this stream, so a game given the same seed and
+        # actions always plays out the same way
+        # An unseeded game picks its seed up front, so it can still be replayed
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy)
+        self.rng = DiceRNG(self.seed)
+        # Incremented on every change to the phase, level or object stats. Together with the board's generation, this
+        # tells get_state() whether a cached state is still current
+        self.generation = 0
+        # Cached get_state() results, keyed by (player, version)
+        self.state_cache = {}
+        # States handed out by get_state_delta(), keyed by token. The oldest are dropped first
+        self.state_history = OrderedDict()
+        self.state_history_size = 64
+        # Latest token and state for each (player, version)
+        self.state_tokens = {}
+        self.last_token = 0
 
         ##############
         # LEVEL VARS #
@@ -32,12 +81,41 @@ class DiceAdventure:
         # Level Setup
         self.levels = {}
         self.levels_directory = "game/levels/"
+        # A compiled level bundle (see game/level_bundle.py) can be used instead of the level files. Its levels are
+        # read from a memory map as they are needed
+        self.level_bundle = level_bundle
+        self.level_registry = get_level_bundle(level_bundle) if level_bundle \
+            else get_level_registry(self.levels_directory)
         self.limit_levels = limit_levels if limit_levels \
-            else [i for i in range(len(listdir(self.levels_directory)))]
+            else [i for i in range(len(self.level_registry))]
+        # Level metadata (see game/level_index.py), used to filter the levels by a query such as
+        # {"max_monster": 3} or {"difficulty_band": 2}, and to weight level sampling by one of its columns. Loaded
+        # from the level_index file if given (and built and saved there if it doesn't exist yet)
+        self.level_query = level_query
+        self.level_weights = level_weights
+        self.level_index = get_level_index(self.level_registry, level_index) \
+            if level_index or level_query or level_weights else None
+        if level_query:
+            matches = set(self.level_index.query(**level_query))
+            self.limit_levels = [lvl for lvl in (limit_levels or self.level_index.levels.tolist()) if lvl in matches]
+            if not self.limit_levels:
+                raise ValueError(f"No levels match the level query {level_query}.")
+        if level_weights:
+            # Levels that can never be sampled are left out, so sampling can't run out of levels with a positive
+            # weight while other levels still have repeats left
+            candidates = [lvl for lvl in self.limit_levels if lvl in self.level_registry]
+            weights = self.level_index.get_weights(candidates, level_weights)
+            if any(w < 0 for w in weights):
+                raise ValueError(f"Level weights must not be negative, but column {level_weights!r} has negative "
+                                 f"values (e.g., -1 for unreachable).")
+            self.limit_levels = [lvl for lvl, w in zip(candidates, weights) if w > 0]
+            if not self.limit_levels:
+                raise ValueError(f"No levels have a positive weight in column {level_weights!r}.")
         self.get_levels()
         # Level Control
         self.curr_level_num = level if level in self.limit_levels else self.limit_levels[0]
-        self.curr_level = deepcopy(self.levels[self.curr_level_num])
+        # Level grids are read-only, so they can be used without copying
+        self.curr_level = self.levels[self.curr_level_num]
         self.num_repeats = num_repeats
         self.lvl_repeats = {lvl: self.num_repeats for lvl in self.levels}
         self.restart_on_finish = restart_on_finish
@@ -46,7 +124,7 @@ class DiceAdventure:
         self.empty = ".."
         self.tower = "**"
         self.wall = "##"
-        self.player_code_mapping = self.config["OBJECT_INFO"]["PLAYERS"]["PLAYER_CODE_MAPPING"]
+        self.player_code_mapping = self.compiled.player_codes
 
         # Places a cap on the number of rounds per level
         self.round_cap = round_cap
@@ -57,34 +135,53 @@ class DiceAdventure:
         ##########
         # BOARD #
         #########
-        self.board = Board(width=len(self.curr_level[0]),
+        # ArrayBoard mirrors the grid in NumPy occupancy planes. Faster validity and combat checks on large levels,
+        # slower moves and placements
+        self.board_class = ArrayBoard if array_board else Board
+        self.board = self.board_class(width=len(self.curr_level[0]),
                            height=len(self.curr_level),
                            object_positions=self.curr_level,
-                           config=self.config)
+                           config=self.config,
+                           rng=self.rng)
 
         ##############
         # PHASE VARS #
         ##############
         self.phase_num = 0
-        self.phases = self.config["GAMEPLAY"]["PHASES"]["PHASE_LIST"]
+        self.phases = self.compiled.phases.phases
         # Pin Planning
-        self.pinning_phase_name = self.config["GAMEPLAY"]["PHASES"]["PINNING_PHASE_NAME"]
-        self.valid_pin_actions = self.config["GAMEPLAY"]["ACTIONS"]["VALID_PIN_ACTIONS"]
-        self.valid_pin_types = self.config["GAMEPLAY"]["ACTIONS"]["VALID_PIN_TYPES"]
-        self.pin_code_mapping = self.config["OBJECT_INFO"]["OTHER"]["PIN"]["PIN_CODE_MAPPING"]
+        self.pinning_phase_name = self.compiled.phases.pinning
+        self.valid_pin_actions = self.compiled.actions.pin_actions
+        self.valid_pin_types = self.compiled.actions.pin_types
+        # Pin actions and pin types together
+        self.valid_pin_planning_actions = self.compiled.actions.pin_planning
+        self.pin_code_mapping = self.compiled.pin_codes
         # Action Planning
-        self.planning_phase_name = self.config["GAMEPLAY"]["PHASES"]["PLANNING_PHASE_NAME"]
-        self.valid_move_actions = self.config["GAMEPLAY"]["ACTIONS"]["VALID_MOVE_ACTIONS"]
+        self.planning_phase_name = self.compiled.phases.planning
+        self.valid_move_actions = self.compiled.actions.move_actions
         # Actions
-        self.directions = self.config["GAMEPLAY"]["ACTIONS"]["DIRECTIONS"]
+        self.directions = self.compiled.actions.directions
         # Enemy Execution
-        self.enemy_execution_phase_name = self.config["GAMEPLAY"]["PHASES"]["ENEMY_EXECUTION_PHASE_NAME"]
+        self.enemy_execution_phase_name = self.compiled.phases.enemy_execution
         #############
         # RENDERING #
         #############
         self.render_game = render
         self.render_verbose = render_verbose
 
+        ##########
+        # COMBAT #
+        ##########
+        # How combat is decided. 'roll' rolls the dice. 'expected' compares the expected totals of both sides and
+        # 'threshold' lets players win if their chance of winning is at least `combat_threshold`. The last two are
+        # deterministic and are meant for analysis and planning rollouts
+        if combat_mode not in self.COMBAT_MODES:
+            raise ValueError(f"Unknown combat mode {combat_mode!r}. Must be one of {self.COMBAT_MODES}.")
+        self.combat_mode = combat_mode
+        self.combat_threshold = combat_threshold
+        # Exact win probabilities and expected totals for every combat. Shared read-only between all games
+        self.combat_odds = get_combat_odds()
+
         ###################
         # METRIC TRACKING #
         ###################
@@ -93,32 +190,55 @@ class DiceAdventure:
         self.num_calls = 0
         # Number of rounds completed
         self.num_rounds = 0
+        # Combats of the round being played by simulate_round(). None when not recording
+        self.combat_results = None
+        # Events (moves, combats, deaths, goals, phase and level changes) since the last drain_events() call. Only
+        # recorded if event_buffer_size is set; the oldest are dropped once that many are waiting
+        self.events = deque(maxlen=event_buffer_size) if event_buffer_size else None
+        # Every execute_action() call from the start of the game, with a state hash every replay_checkpoint_interval
+        # calls (see game/replay.py). None when not recording
+        self.replay = Replay(seed=self.seed,
+                             params=dict(level=level, limit_levels=[int(lvl) for lvl in self.limit_levels],
+                                         level_sampling=level_sampling, num_repeats=num_repeats,
+                                         restart_on_finish=restart_on_finish, round_cap=round_cap,
+                                         combat_mode=combat_mode,
+                                         combat_threshold=combat_threshold, level_bundle=level_bundle,
+                                         level_index=level_index, level_query=level_query,
+                                         level_weights=level_weights),
+                             players=list(self.player_code_mapping),
+                             actions=sorted(self.valid_pin_planning_actions | self.valid_move_actions) + ["undo"],
+                             checkpoint_interval=replay_checkpoint_interval) if record_replay else None
+        # Call counts and wall time of each of TIMED_METHODS (see get_phase_timings()). None when not timing. Timing
+        # replaces the methods on this game only, so games that don't time run the plain methods
+        self.phase_timings = None
+        if time_phases:
+            self.phase_timings = {name: [0, 0.0] for name in self.TIMED_METHODS}
+            for name in self.TIMED_METHODS:
+                setattr(self, name, TimedMethod(self, getattr(type(self), name), self.phase_timings[name]))
         # Metrics tracker
         if self.track_metrics:
             self.tracker = GameMetricsTracker(level=self.curr_level_num,
                                               metrics_config=self.config["GAMEPLAY"]["METRICS"],
                                               instance_id=model_number,
-                                              model_number=model_number)
+                                              model_number=model_number,
+                                              players=tuple(self.player_code_mapping))
 
     #################
     # LEVEL CONTROL #
     #################
     def get_levels(self):
-        levels = {int(filename.rstrip(".txt")): open(self.levels_directory + filename, "r").read()
-                  for filename in listdir(self.levels_directory)}
-
-        # This makes sure positions are indexed with origin at "bottom left"
-        self.levels = {
-            k: [[row[i:i + 2] for i in range(0, len(row), 2)] for row in reversed(v.strip().split("\n"))]
-            for k, v in levels.items()
-            if int(k) in self.limit_levels
-        }
+        # Levels are parsed once per process by the registry (or decoded on use from a bundle); this only selects
+        # the allowed ones
+        self.levels = self.level_registry.get_levels(self.limit_levels)
 
     def next_level(self):
         """
         Moves the game to the next level or repeats the same level
         :return:
         """
+        self._touch()
+        prev_level = self.curr_level_num
+        restart = self.restart_on_team_loss
         # Don't change anything if restarting level due to whole team dying
         if not self.restart_on_team_loss:
             # print(self.lvl_repeats)
@@ -144,20 +264,28 @@ class DiceAdventure:
             self.restart_on_team_loss = False
 
         # Set current level
-        self.curr_level = deepcopy(self.levels[self.curr_level_num])
+        self.curr_level = self.levels[self.curr_level_num]
         # Re-initialize values
-        self.board = Board(width=len(self.curr_level[0]),
+        self.board = self.board_class(width=len(self.curr_level[0]),
                            height=len(self.curr_level),
                            object_positions=self.curr_level,
-                           config=self.config)
+                           config=self.config,
+                           rng=self.rng)
         self.phase_num = 0
         self.num_rounds = 0
+        if self.events is not None:
+            self.events.append(GameEvent(GameEvent.LEVEL_CHANGE, self.num_rounds, level=self.curr_level_num,
+                                         previous=prev_level, restart=restart))
 
     def get_next_level(self, eligible_levels):
         prev_level = int(str(self.curr_level_num))
         # If level sampling turned on, randomly sample for next level
         if self.level_sampling:
-            self.curr_level_num = choice(list(eligible_levels))
+            if self.level_weights:
+                self.curr_level_num = self.rng.weighted_choice(
+                    eligible_levels, self.level_index.get_weights(eligible_levels, self.level_weights))
+            else:
+                self.curr_level_num = self.rng.choice(list(eligible_levels))
         else:
             # Otherwise, move on to next level
             self.curr_level_num += 1
@@ -176,9 +304,15 @@ class DiceAdventure:
 
     def get_state(self, player, version=None):
         """
-        Constructs a state representation of the game.
+        Constructs a state representation of the game. States are cached until the game changes, so repeated calls
+        return the same object. The returned state is read-only (dicts are FrozenDicts and lists are tuples).
         :return: Dict
         """
+        generation = (self.generation, self.board.generation)
+        cached = self.state_cache.get((player, version))
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+
         state = {
             "command": "get_state",
             "status": "OK" if not self.terminated else "Done",
@@ -194,20 +328,20 @@ class DiceAdventure:
             }
         }
         player_obj = self.board.objects[self.player_code_mapping[player]]
-        # Defines the set of grid locations currently visible to the player
-        sight_range = player_obj.get_mask_radius()
+        # Grid locations currently visible to the player are those within sight range
+        sight_x, sight_y, sight_range = player_obj.x, player_obj.y, player_obj.sight_range
         if version == "player":
-            visible_locations = sight_range
+            cells = [(pos, self.board.board[pos])
+                     for pos in self.board.get_window_positions(sight_x, sight_y, sight_range)]
         elif version == "fow":
-            visible_locations = player_obj.seen_locations
+            cells = [(pos, self.board.board[pos]) for pos in self.board.get_mask_positions(player_obj.seen_mask)]
         else:
-            visible_locations = None
+            cells = self.board.board.items()
 
         # Walls are not tracked as objects, need to count them here to make sure IDs are unique
         wall_count = 1
-        for pos, obj_dict in self.board.board.items():
-            if version in ["player", "fow"] and pos not in visible_locations:
-                continue
+        for pos, obj_dict in cells:
+            in_sight = abs(pos[0] - sight_y) <= sight_range and abs(pos[1] - sight_x) <= sight_range
             # Walls
             if obj_dict is None:
                 state["content"]["scene"].append({"id": f"##-{wall_count}",
@@ -228,7 +362,7 @@ class DiceAdventure:
 
                     if isinstance(obj, Player):
                         # Can return player data ONLY if in current sight range or if giving full state
-                        if version == "full" or pos in sight_range:
+                        if version == "full" or in_sight:
                             ele.update({
                                 "characterId": int(obj.obj_code[0]),
                                 "health": obj.health,
@@ -260,14 +394,14 @@ class DiceAdventure:
                     elif isinstance(obj, Enemy):
                         # Monsters should ONLY be returned when in sight range of player, other enemy types can be
                         # returned even if not in sight range but have been seen before when 'version' is 'fow'
-                        if version == "full" or obj.name != "Monster" or (obj.name == "Monster" and pos in sight_range):
+                        if version == "full" or obj.name != "Monster" or (obj.name == "Monster" and in_sight):
                             ele.update({
                                 "id": f"{obj.obj_code}-{obj.index_num}",
                                 "combatDice": f"D{obj.dice_rolls['VAL']}+{obj.dice_rolls['CONST']}"
                             })
                             # Action points only apply to monsters
                             if obj.name == "Monster":
-                                ele["actionPoints"] = self.config["OBJECT_INFO"]["OBJECT_CODES"][obj.obj_code]["ACTION_POINTS"]
+                                ele["actionPoints"] = self.compiled.object_codes[obj.obj_code].action_points
                     # Pins
                     elif isinstance(obj, Pin):
                         ele.update({
@@ -276,10 +410,47 @@ class DiceAdventure:
                         })
                     state["content"]["scene"].append(ele)
 
+        state = freeze(state)
+        self.state_cache[(player, version)] = (generation, state)
         return state
 
         # return state.get_state(game_state, self.config, self.board, player_obj, version)
 
+    def get_state_delta(self, player, version=None, since_token=None):
+        """
+        Gets only what changed in the state since an earlier call: scene elements added, removed or changed (matched
+        by id) and changed gameData fields. Apply the delta to the earlier state with state_delta.apply_state_delta()
+        to get exactly what get_state() returns.
+        :param player: The player whose perspective is used (see get_state())
+        :param version: The state version (see get_state())
+        :param since_token: The token from an earlier call for the same player and version. If None, too old to still
+                            be kept, or from a different player/version, the full state is returned instead.
+        :return: (dict) Contains the "token" for the next call and either "delta" or the full "state" (when "full" is
+                 True)
+        """
+        state = self.get_state(player, version)
+        key = (player, version)
+        prev = self.state_history.get(since_token)
+        delta = diff_states(prev[1], state) if prev is not None and prev[0] == key else None
+
+        latest = self.state_tokens.get(key)
+        if latest is not None and latest[1] is state and latest[0] in self.state_history:
+            token = latest[0]
+        else:
+            self.last_token += 1
+            token = self.last_token
+            self.state_history[token] = (key, state)
+            self.state_tokens[key] = (token, state)
+            if len(self.state_history) > self.state_history_size:
+                self.state_history.popitem(last=False)
+
+        result = {"command": "get_state_delta", "status": state["status"], "token": token, "full": delta is None}
+        if delta is None:
+            result["state"] = state
+        else:
+            result["delta"] = delta
+        return result
+
     def execute_action(self, player, action):
         """
         Applies an action to the player given.
@@ -298,6 +469,8 @@ class DiceAdventure:
             self.pin_planning(player_code, action)
         elif self.phases[self.phase_num] == self.planning_phase_name:
             self.action_planning(player_code, action)
+        if self.replay is not None:
+            self.replay.record(self, player, action)
         # If all characters have exhausted their action points, move phase along
         # If this is turned off, all players must submit first before progressing
         # if all([obj.action_points <= 0 for obj in self.board.objects.values() if isinstance(obj, Player)]):
@@ -326,12 +499,18 @@ class DiceAdventure:
                 # Check if they've waited enough game cycles
                 if self.num_rounds - self.board.objects[p].death_round >= self.respawn_wait:
                     # Player has waited long enough
+                    self._touch()
                     self.board.objects[p].dead = False
                     self.board.objects[p].death_round = None
                     self.board.objects[p].health = self.board.objects[p].max_health
                     self.board.objects[p].prev_x = self.board.objects[p].start_x
                     self.board.objects[p].prev_y = self.board.objects[p].start_y
-                    self.board.place(p, x=self.board.objects[p].start_x, y=self.board.objects[p].start_y)
+                    self.move_player(self.board.objects[p], self.board.objects[p].start_x,
+                                     self.board.objects[p].start_y)
+                    if self.events is not None:
+                        self.events.append(GameEvent(GameEvent.RESPAWN, self.num_rounds,
+                                                     player=self.board.objects[p].name,
+                                                     x=self.board.objects[p].x, y=self.board.objects[p].y))
 
     ##############################
     # PHASE PLANNING & EXECUTION #
@@ -349,46 +528,51 @@ class DiceAdventure:
         # Player has already finalized pin planning
         # Player out of action points
         if self.board.objects[player].dead or \
-                action not in self.valid_pin_actions + self.valid_pin_types or \
+                action not in self.valid_pin_planning_actions or \
                 self.board.objects[player].pin_finalized:
             # No-op/invalid action
             return
+        self._touch()
 
+        self.plan_pin(self.board.objects[player], action)
+        self.check_phase()
+
+    def plan_pin(self, p, action):
+        """
+        Applies a valid pin planning action to a player that has not finalized its pins.
+        :param p: The player object
+        :param action: The action to apply
+        :return: N/A
+        """
         if action == "submit":
-            self.board.objects[player].pin_finalized = True
+            p.pin_finalized = True
 
         # Can only take action if player has enough action points
-        if self.board.objects[player].action_points > 0:
+        if p.action_points > 0:
             # elif self.players[player]["pin_type"] is None:
             if action in self.directions:
-                x, y = self.board.update_location_by_direction(action,
-                                                               self.board.objects[player].pin_x,
-                                                               self.board.objects[player].pin_y)
-                self.board.objects[player].pin_x = x
-                self.board.objects[player].pin_y = y
+                x, y = self.board.update_location_by_direction(action, p.pin_x, p.pin_y)
+                p.pin_x = x
+                p.pin_y = y
 
             elif action in self.valid_pin_types:
                 # Place new pin
-                self.board.place(self.pin_code_mapping[action],
-                                 self.board.objects[player].pin_x,
-                                 self.board.objects[player].pin_y,
-                                 create=True,
-                                 placed_by=self.board.objects[player].name)
-                self.board.objects[player].placed_pin = True
-                self.board.objects[player].action_points -= 1
+                self.board.place(self.pin_code_mapping[action], p.pin_x, p.pin_y, create=True, placed_by=p.name)
+                if self.events is not None:
+                    self.events.append(GameEvent(GameEvent.PIN_PLACED, self.num_rounds, player=p.name,
+                                                 x=p.pin_x, y=p.pin_y, pin_type=action))
+                p.placed_pin = True
+                p.action_points -= 1
                 # Reset pin_x and pin_y location to player position
-                self.board.objects[player].pin_x = self.board.objects[player].x
-                self.board.objects[player].pin_y = self.board.objects[player].y
+                p.pin_x = p.x
+                p.pin_y = p.y
                 if self.track_metrics:
                     # Track pin placement
-                    self.tracker.update(target="player", metric_name="pins",
-                                        player=self.board.objects[player].name, pin_type=action)
+                    self.tracker.update(target="player", metric_name="pins", player=p.name, pin_type=action)
 
         # If player is out of action points and has placed a pin, they are forced to submit
-        if self.board.objects[player].placed_pin and self.board.objects[player].action_points <= 0:
-            self.board.objects[player].pin_finalized = True
-
-        self.check_phase()
+        if p.placed_pin and p.action_points <= 0:
+            p.pin_finalized = True
 
     def action_planning(self, player, action):
         """
@@ -403,23 +587,34 @@ class DiceAdventure:
                 or self.board.objects[player].action_plan_finalized:
             # No-op/invalid action
             return
+        self._touch()
+
+        self.plan_action(self.board.objects[player], action)
+        self.check_phase()
 
+    def plan_action(self, p, action):
+        """
+        Applies a valid action planning action to a player that has not finalized its plan.
+        :param p: The player object
+        :param action: The action to apply
+        :return: N/A
+        """
         # Set init values of action plan
-        if not self.board.objects[player].action_plan:
-            self.board.objects[player].action_path_x = self.board.objects[player].x
-            self.board.objects[player].action_path_y = self.board.objects[player].y
+        if not p.action_plan:
+            p.action_path_x = p.x
+            p.action_path_y = p.y
 
         if action == "submit":
-            self.board.objects[player].action_plan_finalized = True
+            p.action_plan_finalized = True
 
         else:
             # Check for 'undo' action
             if action == "undo":
-                self.undo(player)
+                self.undo(p.index)
 
-            elif self.board.objects[player].action_points > 0:
-                curr_x = self.board.objects[player].action_path_x
-                curr_y = self.board.objects[player].action_path_y
+            elif p.action_points > 0:
+                curr_x = p.action_path_x
+                curr_y = p.action_path_y
                 # Test whether action supplied by agent was a valid move
                 if not self.board.valid_move(curr_x, curr_y, action):
                     # No-op/invalid action
@@ -428,13 +623,11 @@ class DiceAdventure:
                     # get new cursor location
                     new_x, new_y = self.board.update_location_by_direction(action, curr_x, curr_y)
                     # Update player fields
-                    self.board.objects[player].action_plan.append(action)
-                    self.board.objects[player].action_positions.append((new_y, new_x))
-                    self.board.objects[player].action_path_x = new_x
-                    self.board.objects[player].action_path_y = new_y
-                    self.board.objects[player].action_points -= 1
-
-        self.check_phase()
+                    p.action_plan.append(action)
+                    p.action_positions.append((new_y, new_x))
+                    p.action_path_x = new_x
+                    p.action_path_y = new_y
+                    p.action_points -= 1
 
     def check_phase(self):
         """
@@ -467,12 +660,10 @@ class DiceAdventure:
             # Change to enemy execution phase
             self.update_phase()
             # Remove pins and reset player values
-            objs = list(self.board.objects.keys())
-            for o in objs:
-                if isinstance(self.board.objects[o], Player):
-                    self.board.objects[o].reset_phase_values()
-                elif isinstance(self.board.objects[o], Pin):
-                    self.board.remove(o)
+            for p in self.board.get_objects(self.board.PLAYER_TYPE):
+                p.reset_phase_values()
+            for pin in self.board.get_objects("pin"):
+                self.board.remove(pin.index)
 
     def update_phase(self):
         """
@@ -484,6 +675,9 @@ class DiceAdventure:
             self.tracker.update(target="game", metric_name="new_phase", phase=self.phases[self.phase_num])
 
         self.phase_num = (self.phase_num + 1) % len(self.phases)
+        self._touch()
+        if self.events is not None:
+            self.events.append(GameEvent(GameEvent.PHASE_CHANGE, self.num_rounds, phase=self.phases[self.phase_num]))
 
         # Check if players need respawning
         self.check_player_status()
@@ -513,7 +707,11 @@ class DiceAdventure:
                     # Get action to make and move
                     # action = self.players[p]["action_plan"][self.players[p]["action_plan_step"]]
                     action = self.board.objects[p].action_plan[i]
+                    if self.events is not None:
+                        prev_x, prev_y = self.board.objects[p].x, self.board.objects[p].y
                     self.board.move(p, action, delete=False)
+                    if self.events is not None:
+                        self.emit_move(self.board.objects[p], prev_x, prev_y)
 
                     # Check if player has reached goal
                     goal_code = p[0] + "G"
@@ -524,9 +722,18 @@ class DiceAdventure:
                         # self.board.remove(goal_code)
                         # Increment subgoal counter
                         self.board.objects[self.tower].subgoal_count += 1
+                        self._touch()
+                        if self.events is not None:
+                            self.events.append(GameEvent(GameEvent.SHRINE_REACHED, self.num_rounds,
+                                                         player=self.board.objects[p].name,
+                                                         x=self.board.objects[p].x, y=self.board.objects[p].y))
                     # Check if player has reached tower
                     if self.board.at(p, self.tower) and \
                             all([self.board.objects[p].goal_reached for i in self.player_code_mapping.values()]):
+                        if self.events is not None:
+                            self.events.append(GameEvent(GameEvent.TOWER_REACHED, self.num_rounds,
+                                                         player=self.board.objects[p].name,
+                                                         x=self.board.objects[p].x, y=self.board.objects[p].y))
                         # self.update_phase()
                         return True
             # CHECK IF PLAYER AND MONSTER/TRAP/STONE IN SAME AREA AFTER
@@ -541,22 +748,21 @@ class DiceAdventure:
         :return: N/A
         """
         # print("EXECUTING ENEMY MOVEMENT")
-        monsters = [i for i in self.board.objects.values() if isinstance(i, Enemy) and i.name == "Monster"]
+        monsters = self.board.get_objects("monster")
         if monsters:
             # for i in range(1.txt, max_moves + 1.txt):
             move_count = 0
             done = False
             while not done:
-                done = True
-                for m in monsters:
-                    # Monster can move on this turn
-                    if move_count < m.action_points:
-                        done = False
-                        self.board.move_monster(m.index, self.directions.copy())
+                # Monsters that can move on this turn
+                movers = [m.index for m in monsters if move_count < m.action_points]
+                done = not movers
+                if movers:
+                    self.board.move_monsters(movers, self.directions)
                 # Check to see if com at needs to be initiated
                 self.check_combat()
                 # Some monsters may have been defeated
-                monsters = [i for i in self.board.objects.values() if isinstance(i, Enemy) and i.name == "Monster"]
+                monsters = self.board.get_objects("monster")
                 move_count += 1
         self.update_phase()
 
@@ -591,6 +797,102 @@ class DiceAdventure:
             # No-op/invalid action
             return
 
+    ####################
+    # ROUND SIMULATION #
+    ####################
+
+    def simulate_round(self, pin_plans=None, move_plans=None):
+        """
+        Plays out a whole round from the pinning phase given the plans of all players: pinning, action planning,
+        player movement and enemy movement. Same result as each player in turn calling execute_action() with every
+        action of its pin plan and then "submit", followed by the same for the move plans, but without the phase
+        checks after every action. Actions left in a plan once the player has finalized (e.g. after spending its last
+        action point on a pin) are ignored. Plans are validated up front.
+        :param pin_plans: (dict) Player name to list of pin planning actions (directions and pin types). Players left
+        out only submit.
+        :param move_plans: (dict) Player name to list of move actions (directions and "wait"). Players left out only
+        submit.
+        :return: (RoundOutcome) Player positions and health, combat results and level change
+        """
+        pin_plans = pin_plans or {}
+        move_plans = move_plans or {}
+        self.validate_plans(pin_plans, move_plans)
+        board = self.board
+        level_num = self.curr_level_num
+        self.combat_results = []
+
+        if self.track_metrics or self.replay is not None:
+            # Go through execute_action() so that every agent action is tracked and recorded
+            for player, code in self.player_code_mapping.items():
+                p = self.board.objects[code]
+                for action in list(pin_plans.get(player, ())) + ["submit"]:
+                    if self.phases[self.phase_num] != self.pinning_phase_name or p.dead or p.pin_finalized:
+                        break
+                    self.execute_action(player, action)
+            for player, code in self.player_code_mapping.items():
+                p = self.board.objects[code]
+                for action in list(move_plans.get(player, ())) + ["submit"]:
+                    if self.phases[self.phase_num] != self.planning_phase_name or p.dead or p.action_plan_finalized:
+                        break
+                    self.execute_action(player, action)
+        else:
+            self._touch()
+            for player, code in self.player_code_mapping.items():
+                p = self.board.objects[code]
+                if p.dead:
+                    continue
+                for action in pin_plans.get(player, ()):
+                    if p.pin_finalized:
+                        break
+                    self.plan_pin(p, action)
+                p.pin_finalized = True
+            self.check_phase()
+            # A team loss while respawning restarts the level instead
+            if self.phases[self.phase_num] == self.planning_phase_name:
+                self._touch()
+                for player, code in self.player_code_mapping.items():
+                    p = self.board.objects[code]
+                    if p.dead:
+                        continue
+                    for action in move_plans.get(player, ()):
+                        if p.action_plan_finalized:
+                            break
+                        self.plan_action(p, action)
+                    p.action_plan_finalized = True
+                self.check_phase()
+
+        players = {player: self.board.objects[code] for player, code in self.player_code_mapping.items()}
+        outcome = RoundOutcome(positions={player: (p.x, p.y) for player, p in players.items()},
+                               health={player: p.health for player, p in players.items()},
+                               dead={player: p.dead for player, p in players.items()},
+                               combat=tuple(self.combat_results),
+                               level_changed=self.board is not board or self.curr_level_num != level_num,
+                               level=self.curr_level_num,
+                               terminated=self.terminated)
+        self.combat_results = None
+        return outcome
+
+    def validate_plans(self, pin_plans, move_plans):
+        """
+        Checks the plans given to simulate_round() in one pass.
+        :param pin_plans: (dict) Player name to list of pin planning actions
+        :param move_plans: (dict) Player name to list of move actions
+        :return: N/A
+        """
+        if self.phases[self.phase_num] != self.pinning_phase_name:
+            raise ValueError(f"Rounds can only be simulated from the {self.pinning_phase_name} phase, "
+                             f"not {self.phases[self.phase_num]}.")
+        invalid = []
+        for plans, valid_actions in ((pin_plans, self.valid_pin_planning_actions),
+                                     (move_plans, self.valid_move_actions)):
+            for player, plan in plans.items():
+                if player not in self.player_code_mapping:
+                    invalid.append(f"unknown player {player!r}")
+                    continue
+                invalid.extend(f"{player}: {action!r}" for action in plan if action not in valid_actions)
+        if invalid:
+            raise ValueError(f"Invalid plans: {', '.join(invalid)}")
+
     ##########
     # COMBAT #
     ##########
@@ -607,8 +909,10 @@ class DiceAdventure:
                           for p in self.player_code_mapping.values()])
         # For each location where player is present, check if there are enemies. If so, initiate combat
         for loc in player_loc:
-            players = [obj for obj in self.board.board[loc].values() if isinstance(obj, Player)]
-            enemies = [obj for obj in self.board.board[loc].values() if isinstance(obj, Enemy)]
+            if not self.board.has_combat(loc[1], loc[0]):
+                continue
+            players = self.board.get_objects_at(loc[1], loc[0], self.board.PLAYER_TYPE)
+            enemies = self.board.get_objects_at(loc[1], loc[0], *self.board.ENEMY_TYPES)
             # There are enemies at this position
             if enemies and players:
                 self.combat(players, enemies, step_index)
@@ -624,20 +928,29 @@ class DiceAdventure:
         :param y: The y position of the grid where combat occurs
         :return: N/A
         """
+        self._touch()
         # Enemies are always all the same type
         enemy_type = enemies[0].name
-        player_rolls = sum([p.get_dice_roll(enemy_type) for p in players])
-        enemy_rolls = sum([e.get_dice_roll() for e in enemies])
+        player_rolls, enemy_rolls, players_won = self.resolve_combat(players, enemies, enemy_type)
 
-        # Players win (players win ties)
-        if player_rolls >= enemy_rolls:
+        if self.combat_results is not None:
+            self.combat_results.append(CombatResult(x=enemies[0].x, y=enemies[0].y, enemy_type=enemy_type,
+                                                    players=tuple(p.name for p in players),
+                                                    player_rolls=player_rolls, enemy_rolls=enemy_rolls,
+                                                    players_won=players_won))
+        if self.events is not None:
+            self.events.append(GameEvent(GameEvent.COMBAT, self.num_rounds, x=enemies[0].x, y=enemies[0].y,
+                                         enemy_type=enemy_type, players=tuple(p.name for p in players),
+                                         enemies=len(enemies), player_rolls=player_rolls, enemy_rolls=enemy_rolls,
+                                         players_won=players_won))
+        if players_won:
             # print("PLAYERS WIN!")
             self.board.multi_remove(enemies)
 
             # Track player wins
             if self.track_metrics:
                 for p in players:
-                    sizes = set([e.type.split("_")[0] for e in enemies])
+                    sizes = set([self._metrics_enemy_size(e) for e in enemies])
                     for size in sizes:
                         self.tracker.update(target="player", player=p.name, metric_name="combat",
                                             combat_outcome="win", enemy_type=enemy_type, enemy_size=size)
@@ -656,10 +969,15 @@ class DiceAdventure:
                     if step_index and p.action_plan:
                         # Truncate action plan
                         p.action_plan = []
-                        # Get last position of player
-                        prev_pos = p.action_positions[step_index - 1]
+                        # Get last position of player. Players whose plan ended before this step stay where they are
+                        if step_index - 1 < len(p.action_positions):
+                            prev_pos = p.action_positions[step_index - 1]
+                            if self.events is not None:
+                                prev_x, prev_y = p.x, p.y
+                            self.move_player(p, prev_pos[1], prev_pos[0])
+                            if self.events is not None:
+                                self.emit_move(p, prev_x, prev_y)
                         p.action_positions = []
-                        self.board.place(p.index, x=prev_pos[1], y=prev_pos[0])
                 elif enemy_type == "Trap":
                     # Lose a heart
                     p.health -= 1
@@ -673,6 +991,9 @@ class DiceAdventure:
                         p.action_plan = []
                         p.action_positions = []
 
+                if self.events is not None and enemy_type in ("Monster", "Trap"):
+                    self.events.append(GameEvent(GameEvent.DAMAGE, self.num_rounds, player=p.name, x=p.x, y=p.y,
+                                                 enemy_type=enemy_type, health=max(p.health, 0)))
                 # If player dies, remove from board
                 if p.health <= 0:
                     if self.track_metrics:
@@ -680,10 +1001,185 @@ class DiceAdventure:
                     p.health = 0
                     p.dead = True
                     p.death_round = self.num_rounds
+                    if self.events is not None:
+                        self.events.append(GameEvent(GameEvent.DEATH, self.num_rounds, player=p.name, x=p.x, y=p.y))
             # Traps are destroyed
             if enemy_type == "Trap":
                 self.board.multi_remove(enemies)
 
+    def resolve_combat(self, players, enemies, enemy_type):
+        """
+        Decides the outcome of a combat according to the combat mode. Players win ties.
+        :param players: A list of players at the x,y position
+        :param enemies: A list of enemies at the x,y position
+        :param enemy_type: The enemy type
+        :return: (tuple) Player total, enemy total, whether the players won. Totals are expected values unless the
+        combat mode is 'roll'.
+        """
+        if self.combat_mode == "roll":
+            player_rolls = sum([p.get_dice_roll(enemy_type, self.rng) for p in players])
+            enemy_rolls = sum([e.get_dice_roll(self.rng) for e in enemies])
+            return player_rolls, enemy_rolls, player_rolls >= enemy_rolls
+        win, player_rolls, enemy_rolls = self.combat_odds.get_entry([p.obj_code for p in players],
+                                                                    [e.obj_code for e in enemies])
+        if self.combat_mode == "expected":
+            return player_rolls, enemy_rolls, player_rolls >= enemy_rolls
+        return player_rolls, enemy_rolls, win >= self.combat_threshold
+
+    def get_combat_odds(self, x, y, players):
+        """
+        Gets the odds of the given players fighting the enemies at the x,y position.
+        :param x: The x position
+        :param y: The y position
+        :param players: (list) Names of the players that would fight
+        :return: (tuple) Probability players win, expected player total, expected enemy total. None if there are no
+        enemies at the position.
+        """
+        enemies = self.board.get_objects_at(x, y, *self.board.ENEMY_TYPES)
+        if not enemies:
+            return None
+        return self.combat_odds.get_entry([self.player_code_mapping[p] for p in players],
+                                          [e.obj_code for e in enemies])
+
+    ##########
+    # EVENTS #
+    ##########
+
+    def drain_events(self):
+        """
+        Hands over the events recorded since the last call. Events are only recorded when the game is created with
+        an event_buffer_size; if more than that many happen between calls, the oldest are lost.
+        :return: (list) GameEvents, oldest first. Empty if events aren't recorded.
+        """
+        if not self.events:
+            return []
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+    def emit_move(self, p, prev_x, prev_y):
+        """
+        Records a move event if the player changed position.
+        :param p: The player object
+        :param prev_x: The player's x position before the move
+        :param prev_y: The player's y position before the move
+        :return: N/A
+        """
+        if p.x != prev_x or p.y != prev_y:
+            self.events.append(GameEvent(GameEvent.MOVE, self.num_rounds, player=p.name, x=p.x, y=p.y,
+                                         prev_x=prev_x, prev_y=prev_y))
+
+    ##########
+    # TIMING #
+    ##########
+
+    def get_phase_timings(self, reset=False):
+        """
+        Call counts and wall time of the timed methods, since the game started or the last reset. Times are inclusive:
+        check_phase() includes the execute_plans(), execute_enemy_plans() and next_level() calls it makes, and
+        get_state() includes calls answered from the state cache.
+        :param reset: Whether to start counting again from zero after reading
+        :return: (dict) Method name to {"calls", "seconds", "mean_us"}. Empty if the game wasn't created with
+        time_phases=True.
+        """
+        if self.phase_timings is None:
+            return {}
+        timings = {name: {"calls": calls, "seconds": seconds, "mean_us": seconds / calls * 1e6 if calls else 0.0}
+                   for name, (calls, seconds) in self.phase_timings.items()}
+        if reset:
+            for stats in self.phase_timings.values():
+                stats[0] = 0
+                stats[1] = 0.0
+        return timings
+
+    ######################
+    # SNAPSHOT & RESTORE #
+    ######################
+
+    def snapshot(self):
+        """
+        Captures the full game state (board, objects, phase, round and level counters, RNG state) so it can later be
+        returned to with restore(). Much cheaper than deep-copying the game since the config, level grids and metrics
+        tracker are not copied. Snapshots are picklable.
+        :return: (GameSnapshot) The snapshot
+        """
+        return GameSnapshot(board=self.board.snapshot(),
+                            curr_level_num=self.curr_level_num,
+                            phase_num=self.phase_num,
+                            num_rounds=self.num_rounds,
+                            num_calls=self.num_calls,
+                            lvl_repeats=tuple(self.lvl_repeats.items()),
+                            terminated=self.terminated,
+                            restart_on_team_loss=self.restart_on_team_loss,
+                            rng_state=self.rng.getstate())
+
+    def restore(self, snap):
+        """
+        Returns the game to the state captured by snapshot(). The same snapshot can be restored any number of times.
+        Metrics are not rolled back.
+        :param snap: The snapshot to restore
+        :return: N/A
+        """
+        if snap.curr_level_num in self.levels:
+            self.curr_level = self.levels[snap.curr_level_num]
+        else:
+            self.curr_level = self.level_registry[snap.curr_level_num]
+        self.curr_level_num = snap.curr_level_num
+        self.board.restore(snap.board, self.curr_level)
+        self.phase_num = snap.phase_num
+        self.num_rounds = snap.num_rounds
+        self.num_calls = snap.num_calls
+        self.lvl_repeats = dict(snap.lvl_repeats)
+        self.terminated = snap.terminated
+        self.restart_on_team_loss = snap.restart_on_team_loss
+        self.rng.setstate(snap.rng_state)
+        self._touch()
+
+    def get_state_hash(self):
+        """
+        Hashes the parts of the game state that play depends on: level, phase, round, the position in the random
+        stream and every object's position, health, status and plans. Two games with the same hash are (almost surely) in
+        the same state.
+        :return: (bytes) 8-byte hash
+        """
+        objects = [(o.index, o.x, o.y, getattr(o, "health", None), getattr(o, "dead", None),
+                    getattr(o, "goal_reached", None), getattr(o, "action_points", None), getattr(o, "pin_x", None),
+                    getattr(o, "pin_y", None), getattr(o, "action_plan", None)) for o in self.board.objects.values()]
+        key = (self.curr_level_num, self.phase_num, self.num_rounds, self.terminated, self.rng.position, objects)
+        return blake2b(repr(key).encode(), digest_size=HASH_SIZE).digest()
+
+    def save_replay(self, path):
+        """
+        Writes the game's replay to a file. Only available for games created with record_replay=True. A replay covers
+        every execute_action() and simulate_round() call since the game was created; restore() is not recorded, so a
+        game that was restored will not replay the same way.
+        :param path: Path of the file to write
+        :return: N/A
+        """
+        if self.replay is None:
+            raise ValueError("This game is not recording a replay. Create it with record_replay=True.")
+        self.replay.save(path)
+
+    def _touch(self):
+        """
+        Marks the game as changed so that cached states are rebuilt on the next get_state() call. Changes to the grid
+        are tracked by the board itself; this covers everything else get_state() reports (phase, level, object stats).
+        :return: N/A
+        """
+        self.generation += 1
+
+    def move_player(self, p, x, y):
+        """
+        Moves a player directly to the given x,y position (i.e., not through a directional action), taking it out of
+        its current grid cell.
+        :param p: The player object to move
+        :param x: The x position to move to
+        :param y: The y position to move to
+        :return: N/A
+        """
+        if p.x != x or p.y != y:
+            self.board.place(p.index, x=x, y=y, old_x=p.x, old_y=p.y, delete=False)
+
     #############
     # RENDERING #
     #############
@@ -701,8 +1197,15 @@ class DiceAdventure:
     # METRICS #
     ###########
 
+    def _metrics_enemy_size(self, enemy):
+        """
+        :param enemy: The enemy object
+        :return: (string) The enemy's size class (S, M, L or XL), from the number in its object code
+        """
+        return self.compiled.size_classes[int(enemy.obj_code[1]) - 1]
+
     def _metrics_combat_loss(self, players, enemies, enemy_type):
-        sizes = set([e.type.split("_")[0] for e in enemies])
+        sizes = set([self._metrics_enemy_size(e) for e in enemies])
         for p in players:
             for size in sizes:
                 self.tracker.update(target="player", player=p.name, metric_name="combat",
@@ -711,3 +1214,126 @@ class DiceAdventure:
                 self.tracker.update(target="player", player=p.name, metric_name="health_loss")
             elif enemy_type == "Trap":
                 self.tracker.update(target="player", player=p.name, metric_name="health_loss")
+
+
+class GameSnapshot:
+    """
+    Picklable record of a game's state. Created by DiceAdventure.snapshot().
+    """
+    __slots__ = ("board", "curr_level_num", "phase_num", "num_rounds", "num_calls", "lvl_repeats", "terminated",
+                 "restart_on_team_loss", "rng_state")
+
+    def __init__(self, board, curr_level_num, phase_num, num_rounds, num_calls, lvl_repeats, terminated,
+                 restart_on_team_loss, rng_state):
+        self.board = board
+        self.curr_level_num = curr_level_num
+        self.phase_num = phase_num
+        self.num_rounds = num_rounds
+        self.num_calls = num_calls
+        self.lvl_repeats = lvl_repeats
+        self.terminated = terminated
+        self.restart_on_team_loss = restart_on_team_loss
+        self.rng_state = rng_state
+
+
+class RoundOutcome:
+    """
+    Compact result of DiceAdventure.simulate_round(). Positions are (x, y) and are keyed by player name, as are health
+    and dead flags.
+    """
+    __slots__ = ("positions", "health", "dead", "combat", "level_changed", "level", "terminated")
+
+    def __init__(self, positions, health, dead, combat, level_changed, level, terminated):
+        self.positions = positions
+        self.health = health
+        self.dead = dead
+        self.combat = combat
+        self.level_changed = level_changed
+        self.level = level
+        self.terminated = terminated
+
+    def __repr__(self):
+        return f"RoundOutcome(positions={self.positions}, health={self.health}, dead={self.dead}, " \
+               f"combat={self.combat}, level_changed={self.level_changed}, level={self.level}, " \
+               f"terminated={self.terminated})"
+
+
+class CombatResult:
+    """
+    A combat fought during DiceAdventure.simulate_round().
+    """
+    __slots__ = ("x", "y", "enemy_type", "players", "player_rolls", "enemy_rolls", "players_won")
+
+    def __init__(self, x, y, enemy_type, players, player_rolls, enemy_rolls, players_won):
+        self.x = x
+        self.y = y
+        self.enemy_type = enemy_type
+        self.players = players
+        self.player_rolls = player_rolls
+        self.enemy_rolls = enemy_rolls
+        self.players_won = players_won
+
+    def __repr__(self):
+        return f"CombatResult(x={self.x}, y={self.y}, enemy_type={self.enemy_type!r}, players={self.players}, " \
+               f"player_rolls={self.player_rolls}, enemy_rolls={self.enemy_rolls}, players_won={self.players_won})"
+
+
+class TimedMethod:
+    """
+    Stands in for one of a game's methods when the game times its phases. Adds the call's wall time to `stats`
+    ([calls, seconds]). Holds the plain function rather than a bound method, so games that time their phases can still
+    be copied and pickled.
+    """
+    __slots__ = ("game", "function", "stats")
+
+    def __init__(self, game, function, stats):
+        self.game = game
+        self.function = function
+        self.stats = stats
+
+    def __call__(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return self.function(self.game, *args, **kwargs)
+        finally:
+            self.stats[0] += 1
+            self.stats[1] += perf_counter() - start
+
+
+class GameEvent:
+    """
+    Something that happened in a game, recorded by DiceAdventure when events are turned on (see drain_events()).
+    Positions are where the event happened (for moves, where the player ended up). Anything else specific to the kind
+    of event is kept in `details`:
+      - move: prev_x, prev_y
+      - combat: enemy_type, players, enemies (number of enemies), player_rolls, enemy_rolls, players_won
+      - damage: enemy_type, health (after the hit)
+      - pin_placed: pin_type
+      - phase_change: phase (the new phase)
+      - level_change: level, previous, restart (whether the level restarted after a team loss)
+    Moves only cover players; monster moves are not recorded.
+    """
+    MOVE = "move"
+    COMBAT = "combat"
+    DAMAGE = "damage"
+    DEATH = "death"
+    RESPAWN = "respawn"
+    SHRINE_REACHED = "shrine_reached"
+    TOWER_REACHED = "tower_reached"
+    PIN_PLACED = "pin_placed"
+    PHASE_CHANGE = "phase_change"
+    LEVEL_CHANGE = "level_change"
+
+    __slots__ = ("kind", "round", "player", "x", "y", "details")
+
+    def __init__(self, kind, round_, player=None, x=None, y=None, **details):
+        self.kind = kind
+        self.round = round_
+        self.player = player
+        self.x = x
+        self.y = y
+        self.details = details
+
+    def __repr__(self):
+        return f"GameEvent(kind={self.kind!r}, round={self.round}, player={self.player!r}, x={self.x}, y={self.y}, " \
+               f"details={self.details})"
@@ -1,7 +1,10 @@
+from classes.compiled_config import compile_config
 from game.dice_adventure import DiceAdventure
+from game.level_registry import get_config
 import game.env.unity_socket as unity_socket
 from gymnasium import Env
-from json import loads
+from os import makedirs
+from os import path
 
 
 class DiceAdventurePythonEnv(Env):
@@ -14,6 +17,8 @@ class DiceAdventurePythonEnv(Env):
                  train_mode=False,
                  server="local",
                  state_version="character",
+                 replay_directory=None,
+                 phase_timings_in_info=False,
                  **kwargs):
         """
         Init function for Dice Adventure gym environment.
@@ -23,21 +28,37 @@ class DiceAdventurePythonEnv(Env):
                                    we will use a "play" mode, where the step function simply takes an action and returns
                                    the next state.
         :param server:      (string) Determines which game version to use. Can be one of {local, unity}.
+        :param replay_directory: (string) If given, every episode is recorded and its replay (see game/replay.py) is
+                                   written to this directory on the next reset() or on close(). Only applies when
+                                   'server' is 'local'.
+        :param phase_timings_in_info: (bool) If True, the game times its phases and each step's info holds the timings
+                                   since the previous step under "phase_timings" (see DiceAdventure.get_phase_timings()). Only
+                                   applies when 'server' is 'local'.
         :param kwargs:      (dict) Additional keyword arguments to pass into Dice Adventure game. Only applies when
                                    'server' is 'local'.
         """
-        self.config = loads(open("game/config/main_config.json", "r").read())
+        self.config = get_config()
+        self.compiled = compile_config(self.config)
         self.player = player
         self.id = id_
         self.kwargs = kwargs
+        self.replay_directory = replay_directory
+        self.num_episodes = 0
+        # Replay last written by save_replay(), so an episode isn't written twice
+        self.saved_replay = None
+        if replay_directory is not None:
+            makedirs(replay_directory, exist_ok=True)
+            self.kwargs = dict(self.kwargs, record_replay=True)
+        self.phase_timings_in_info = phase_timings_in_info
+        if phase_timings_in_info:
+            self.kwargs = dict(self.kwargs, time_phases=True)
 
         ##################
         # STATE SETTINGS #
         ##################
         self.state_version = state_version
-        self.mask_radii = {"Dwarf": self.config["OBJECT_INFO"]["OBJECT_CODES"]["1S"]["SIGHT_RANGE"],
-                           "Giant": self.config["OBJECT_INFO"]["OBJECT_CODES"]["2S"]["SIGHT_RANGE"],
-                           "Human": self.config["OBJECT_INFO"]["OBJECT_CODES"]["3S"]["SIGHT_RANGE"]}
+        self.mask_radii = {player: self.compiled.object_codes[code].sight_range
+                           for player, code in self.compiled.player_codes.items()}
 
         ##################
         # TRAIN SETTINGS #
@@ -68,21 +89,43 @@ class DiceAdventurePythonEnv(Env):
 
         # new_obs, reward, terminated, truncated, info
         terminated = next_state["status"] == "Done"
+        # Events from this step, if the game records them (see DiceAdventure.drain_events())
+        events = self.game.drain_events() if self.server == "local" else []
+        # Read before a reset replaces the game
+        timings = self.game.get_phase_timings(reset=True) if self.phase_timings_in_info and self.server == "local" \
+            else None
         if terminated:
             new_obs, info = self.reset()
         else:
             new_obs = self.get_state()
             info = {}
+        if events:
+            info["events"] = events
+        if timings is not None:
+            info["phase_timings"] = timings
         truncated = False
 
         return new_obs, reward, terminated, truncated, info
 
     def close(self):
         """
-        close() function from standard gym environment. Not implemented.
+        close() function from standard gym environment. Writes the replay of the episode being played, if recording.
+        :return: N/A
+        """
+        self.save_replay()
+
+    def save_replay(self):
+        """
+        Writes the replay of the current episode to the replay directory, unless it is empty or already written. Only
+        applies when recording replays.
         :return: N/A
         """
-        pass
+        if self.replay_directory is None or self.game is None or not len(self.game.replay) \
+                or self.game.replay is self.saved_replay:
+            return
+        self.game.save_replay(path.join(self.replay_directory, f"{self.id}-{self.num_episodes}.replay"))
+        self.saved_replay = self.game.replay
+        self.num_episodes += 1
 
     def render(self, mode='console'):
         """
@@ -93,14 +136,19 @@ class DiceAdventurePythonEnv(Env):
         if self.server == "local":
             self.game.render()
 
-    def reset(self, **kwargs):
+    def reset(self, seed=None, options=None, **kwargs):
         """
         Resets the game. Only applies when `self.server` is 'local'.
+        :param seed:    (int) Seeds the environment. Each new game is seeded from the environment's generator, so
+                              seeding the first reset makes the whole run repeatable.
+        :param options: (dict) Not used
         :param kwargs:  (dict) Additional arguments to pass into local game server
         :return:        (dict, dict) The initial state when the game is reset, An empty 'info' dict
         """
+        super().reset(seed=seed)
         if self.server == "local":
-            self.game = DiceAdventure(**self.kwargs)
+            self.save_replay()
+            self.game = DiceAdventure(**dict(self.kwargs, seed=int(self.np_random.integers(2 ** 63))))
         obs = self.get_state()
         return obs, {}
 
@@ -0,0 +1,195 @@
+"""
+Compiled level bundles. A bundle packs many levels into one file: a JSON header with the table of object codes and an
+index entry (number, height, width, offset) for each level, followed by each level's grid as an array of one-byte
+indexes into the code table. Bundles are memory-mapped and a level is only decoded when it is used (and only the most
+recently used are kept), so large generated corpora load instantly and forked workers share the mapped pages.
+
+Usage (from the repository root):
+    python -m game.level_bundle game/levels/ levels.bundle
+"""
+from argparse import ArgumentParser
+from collections import OrderedDict
+from collections.abc import Mapping
+from game.level_registry import get_level_registry
+from json import dumps
+from json import loads
+from os import path
+import numpy as np
+
+MAGIC = b"DALEVELS"
+VERSION = 1
+# Grid data starts on a multiple of this many bytes
+ALIGNMENT = 8
+
+# Process-wide cache, same as the level registries
+_bundles = {}
+
+
+def get_level_bundle(bundle_path, cache_size=8):
+    """
+    Returns the level bundle at the given path, opening it the first time it is requested in this process.
+    :param bundle_path: Path to the bundle file
+    :param cache_size: Number of decoded levels the bundle keeps. Only used when the bundle is first opened
+    :return: (LevelBundle) The shared bundle
+    """
+    key = path.abspath(bundle_path)
+    if key not in _bundles:
+        _bundles[key] = LevelBundle(bundle_path, cache_size)
+    return _bundles[key]
+
+
+def write_bundle(levels, bundle_path):
+    """
+    Writes levels to a bundle file.
+    :param levels: (dict) Level number to level grid (rows of object codes, row 0 at the bottom)
+    :param bundle_path: Path of the file to write
+    :return: N/A
+    """
+    codes = sorted(set(code for level in levels.values() for row in level for code in row))
+    if len(codes) > 256:
+        raise ValueError(f"Bundles hold at most 256 distinct object codes, got {len(codes)}.")
+    code_index = {code: i for i, code in enumerate(codes)}
+    entries = []
+    offset = 0
+    for num in sorted(levels):
+        level = levels[num]
+        entries.append([num, len(level), len(level[0]), offset])
+        offset += len(level) * len(level[0])
+    header = dumps({"version": VERSION, "codes": codes, "levels": entries}).encode()
+    # Pad the header so the grid data is aligned
+    start = len(MAGIC) + 8 + len(header)
+    header += b" " * (-start % ALIGNMENT)
+
+    with open(bundle_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for num in sorted(levels):
+            f.write(np.array([[code_index[code] for code in row] for row in levels[num]], dtype=np.uint8).tobytes())
+
+
+def build_bundle(levels_directory, bundle_path):
+    """
+    Compiles the text levels in a directory into a bundle.
+    :param levels_directory: The directory containing the level files
+    :param bundle_path: Path of the file to write
+    :return: N/A
+    """
+    write_bundle(get_level_registry(path.join(levels_directory, "")).get_levels(), bundle_path)
+
+
+class LevelBundle:
+    """
+    Read-only view of a bundle file. Offers the same lookups as LevelRegistry, but levels are decoded from the memory
+    map on first use instead of all being parsed up front.
+    """
+    def __init__(self, bundle_path, cache_size=8):
+        """
+        :param bundle_path: Path to the bundle file
+        :param cache_size: Number of decoded levels to keep. The least recently used are dropped first
+        """
+        self.bundle_path = bundle_path
+        with open(bundle_path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{bundle_path} is not a level bundle.")
+            header_size = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = loads(f.read(header_size))
+        if header["version"] != VERSION:
+            raise ValueError(f"Unsupported level bundle version {header['version']} in {bundle_path}.")
+        self.codes = np.array(header["codes"], dtype=object)
+        # Level number -> (height, width, offset into the grid data)
+        self.index = {num: (height, width, offset) for num, height, width, offset in header["levels"]}
+        self.data_start = len(MAGIC) + 8 + header_size
+        self.data = None
+        # Most recently used decoded levels, most recent last
+        self.cache_size = cache_size
+        self.decoded = OrderedDict()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, level_num):
+        return level_num in self.index
+
+    def __getitem__(self, level_num):
+        level = self.decoded.get(level_num)
+        if level is None:
+            level = self.decoded[level_num] = self.decode(level_num)
+            while len(self.decoded) > self.cache_size:
+                self.decoded.popitem(last=False)
+        else:
+            self.decoded.move_to_end(level_num)
+        return level
+
+    def decode(self, level_num):
+        """
+        Decodes a level from the bundle without keeping it.
+        :param level_num: The level number
+        :return: (tuple) The level grid
+        """
+        if self.data is None:
+            # Mapped on first use, so a bundle opened before forking is mapped by each worker
+            self.data = np.memmap(self.bundle_path, dtype=np.uint8, mode="r", offset=self.data_start)
+        height, width, offset = self.index[level_num]
+        grid = self.data[offset:offset + height * width].reshape((height, width))
+        return tuple(tuple(row) for row in self.codes[grid].tolist())
+
+    def __getstate__(self):
+        # The memory map is reopened on first use after unpickling
+        state = self.__dict__.copy()
+        state["data"] = None
+        return state
+
+    @property
+    def levels(self):
+        """
+        :return: (Mapping) All levels, decoded on access
+        """
+        return BundleLevels(self, sorted(self.index))
+
+    def get_levels(self, limit_levels=None):
+        """
+        Gets the levels whose number is in the given list. Levels are decoded when they are accessed.
+        :param limit_levels: The level numbers to return. If None, returns all levels.
+        :return: (Mapping) Level number to level grid
+        """
+        if limit_levels is None:
+            return self.levels
+        limit_levels = set(limit_levels)
+        return BundleLevels(self, [num for num in sorted(self.index) if num in limit_levels])
+
+
+class BundleLevels(Mapping):
+    """
+    Level number to level grid mapping over some of the levels in a bundle.
+    """
+    def __init__(self, bundle, level_nums):
+        self.bundle = bundle
+        self.level_nums = level_nums
+        self.level_set = frozenset(level_nums)
+
+    def __getitem__(self, level_num):
+        if level_num not in self.level_set:
+            raise KeyError(level_num)
+        return self.bundle[level_num]
+
+    def __iter__(self):
+        return iter(self.level_nums)
+
+    def __len__(self):
+        return len(self.level_nums)
+
+    def __contains__(self, level_num):
+        return level_num in self.level_set
+
+
+def main():
+    parser = ArgumentParser(description="Compiles a directory of level files into a level bundle")
+    parser.add_argument("levels_directory", help="Directory containing the level files")
+    parser.add_argument("bundle_path", help="Path of the bundle to write")
+    args = parser.parse_args()
+    build_bundle(args.levels_directory, args.bundle_path)
+
+
+if __name__ == "__main__":
+    main()
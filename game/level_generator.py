@@ -0,0 +1,147 @@
+"""
+Generates random levels in the same two-character code format as the files in game/levels/. Levels are seeded, so the
+same parameters and seed always give the same level, and every shrine and the tower can be reached by every player.
+
+Usage (from the repository root):
+    python -m game.level_generator --count 10000 --size 100 100 --out generated_levels/
+"""
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from os import makedirs
+from os import path
+import numpy as np
+
+PLAYERS = ("1S", "2S", "3S")
+SHRINES = ("1G", "2G", "3G")
+TOWER = "**"
+WALL = "##"
+EMPTY = ".."
+# Relative weight of each enemy code when placing enemies
+DEFAULT_ENEMY_MIX = {"M1": 3, "M2": 3, "M3": 2, "M4": 1, "T1": 1, "T2": 1, "T3": 1, "S1": 1, "S2": 1, "S3": 1}
+
+
+def generate_level(width, height, seed=0, wall_density=0.2, enemy_density=0.1, enemy_mix=None, max_attempts=100):
+    """
+    Generates a random level. Walls and enemies are scattered at random, then players, shrines and the tower are
+    placed on random free cells. Layouts where a shrine or the tower can't be reached from a player's start are
+    thrown away and drawn again. Reachability goes around walls only; players can always move through enemies.
+    :param width: Width of the level
+    :param height: Height of the level
+    :param seed: Seed for the layout. May be an int or a sequence of ints.
+    :param wall_density: Fraction of cells that are walls
+    :param enemy_density: Fraction of the remaining cells that hold an enemy
+    :param enemy_mix: (dict) Relative weight of each enemy code. Defaults to DEFAULT_ENEMY_MIX.
+    :param max_attempts: Number of layouts to try before giving up
+    :return: (tuple) The level grid, rows of object codes with row 0 at the bottom (same as LevelRegistry)
+    """
+    enemy_mix = enemy_mix or DEFAULT_ENEMY_MIX
+    special = PLAYERS + SHRINES + (TOWER,)
+    if width * height < len(special):
+        raise ValueError(f"A {width}x{height} level is too small to hold the players, shrines and tower.")
+    codes = np.array([WALL, EMPTY] + list(enemy_mix) + list(special))
+    weights = np.array(list(enemy_mix.values()), dtype=float)
+    weights /= weights.sum()
+    rng = np.random.default_rng(seed)
+
+    for _ in range(max_attempts):
+        # Index into codes of every cell
+        cells = np.ones(width * height, dtype=np.int64)
+        draws = rng.random(width * height)
+        cells[draws < wall_density] = 0
+        enemies = (draws >= wall_density) & (draws < wall_density + (1 - wall_density) * enemy_density)
+        cells[enemies] = 2 + rng.choice(len(enemy_mix), size=int(enemies.sum()), p=weights)
+        free = np.flatnonzero(cells != 0)
+        if len(free) < len(special):
+            continue
+        positions = rng.choice(free, size=len(special), replace=False)
+        cells[positions] = 2 + len(enemy_mix) + np.arange(len(special))
+
+        level = tuple(tuple(row) for row in codes[cells].reshape((height, width)).tolist())
+        if is_solvable(level):
+            return level
+    raise ValueError(f"No solvable layout found in {max_attempts} attempts. Try a lower wall density.")
+
+
+def is_solvable(level):
+    """
+    Checks that every shrine and the tower can be reached from every player's start, going around walls. Moves go
+    both ways, so this holds if all of them are in the same open area.
+    :param level: The level grid
+    :return: True/False
+    """
+    height, width = len(level), len(level[0])
+    cells = [code for row in level for code in row]
+    special = [i for i, code in enumerate(cells) if code in PLAYERS + SHRINES + (TOWER,)]
+    # Flood fill from the first of them
+    seen = bytearray(len(cells))
+    seen[special[0]] = 1
+    queue = deque([special[0]])
+    while queue:
+        i = queue.popleft()
+        x, y = i % width, i // width
+        for j, inside in ((i - 1, x > 0), (i + 1, x < width - 1), (i - width, y > 0), (i + width, y < height - 1)):
+            if inside and not seen[j] and cells[j] != WALL:
+                seen[j] = 1
+                queue.append(j)
+    return all(seen[i] for i in special)
+
+
+def level_to_text(level):
+    """
+    Formats a level grid as the contents of a level file (top row first).
+    :param level: The level grid
+    :return: (string) The level file contents
+    """
+    return "\n".join("".join(row) for row in reversed(level))
+
+
+def _generate_indexed(args):
+    # Top level so it can be sent to worker processes
+    index, seed, params = args
+    return generate_level(seed=(seed, index), **params)
+
+
+def generate_levels(count, seed=0, processes=None, directory=None, start_number=1, **params):
+    """
+    Generates many levels in a process pool. Level i is seeded from (seed, i), so the result does not depend on the
+    number of processes.
+    :param count: Number of levels to generate
+    :param seed: Seed for the whole batch
+    :param processes: Number of worker processes. Defaults to the number of CPUs.
+    :param directory: If given, each level is written there as <number>.txt
+    :param start_number: Number of the first level file
+    :param params: Arguments for generate_level() (width, height, wall_density, ...)
+    :return: (list) The level grids
+    """
+    jobs = [(i, seed, params) for i in range(count)]
+    with ProcessPoolExecutor(processes) as pool:
+        levels = list(pool.map(_generate_indexed, jobs, chunksize=max(1, count // 256)))
+    if directory is not None:
+        makedirs(directory, exist_ok=True)
+        for i, level in enumerate(levels):
+            with open(path.join(directory, f"{start_number + i}.txt"), "w") as f:
+                f.write(level_to_text(level))
+    return levels
+
+
+def main():
+    parser = ArgumentParser(description="Random level generator")
+    parser.add_argument("--count", type=int, default=1, help="Number of levels to generate")
+    parser.add_argument("--size", type=int, nargs=2, default=[100, 100], metavar=("WIDTH", "HEIGHT"),
+                        help="Level width and height")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the batch")
+    parser.add_argument("--wall-density", type=float, default=0.2, help="Fraction of cells that are walls")
+    parser.add_argument("--enemy-density", type=float, default=0.1, help="Fraction of open cells with an enemy")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: number of CPUs)")
+    parser.add_argument("--start-number", type=int, default=1, help="Number of the first level file")
+    parser.add_argument("--out", required=True, help="Directory to write the level files to")
+    args = parser.parse_args()
+
+    generate_levels(args.count, seed=args.seed, processes=args.processes, directory=args.out,
+                    start_number=args.start_number, width=args.size[0], height=args.size[1],
+                    wall_density=args.wall_density, enemy_density=args.enemy_density)
+
+
+if __name__ == "__main__":
+    main()
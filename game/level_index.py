@@ -0,0 +1,275 @@
+"""
+Level metadata index. Records, for each level, its size, enemy counts by kind and size class, the path length from each
+shrine to the tower and a difficulty estimate, so that levels can be filtered and sampled without reading level data.
+The index is built once and saved as JSON, along with a fingerprint of the levels' contents, so a saved index is rebuilt
+when its levels change.
+
+Usage (from the repository root):
+    python -m game.level_index game/levels/ level_index.json
+    python -m game.level_index levels.bundle levels.bundle.index.json
+"""
+from argparse import ArgumentParser
+from collections import deque
+from game.level_bundle import LevelBundle
+from game.level_bundle import get_level_bundle
+from game.level_registry import get_config
+from game.level_registry import get_level_registry
+from hashlib import sha1
+from json import dumps
+from json import loads
+from os import path
+import numpy as np
+
+VERSION = 1
+SHRINES = ("1G", "2G", "3G")
+TOWER = "**"
+WALL = "##"
+
+# Process-wide cache of loaded indexes
+_indexes = {}
+
+
+def get_level_index(source, index_path=None, num_bands=5):
+    """
+    Returns the index for a level source. It is loaded from `index_path` if that file exists and was built from the
+    same level contents; otherwise it is built (and saved to `index_path`, if given). Kept for the rest of the process.
+    :param source: A LevelRegistry or LevelBundle
+    :param index_path: Where the index is persisted. If None, the index is only kept in memory.
+    :param num_bands: Number of difficulty bands to build with
+    :return: (LevelIndex) The index
+    """
+    key = path.abspath(index_path) if index_path else id(source)
+    index = _indexes.get(key)
+    if index is None or index.source is not source:
+        index = None
+        fingerprint = get_fingerprint(source)
+        if index_path and path.exists(index_path):
+            index = LevelIndex.load(index_path)
+            # A corpus regenerated with the same level numbers still gets a new fingerprint
+            if index.fingerprint != fingerprint:
+                index = None
+        if index is None:
+            index = LevelIndex.build(source, num_bands=num_bands)
+            index.fingerprint = fingerprint
+            if index_path:
+                index.save(index_path)
+        index.source = source
+        _indexes[key] = index
+    return index
+
+
+def get_fingerprint(source):
+    """
+    Hashes the contents of a level source: the bundle file's bytes, or every level's number and grid for a registry.
+    :param source: A LevelRegistry or LevelBundle
+    :return: (string) The fingerprint
+    """
+    digest = sha1()
+    if isinstance(source, LevelBundle):
+        with open(source.bundle_path, "rb") as f:
+            for chunk in iter(lambda: f.read(2 ** 20), b""):
+                digest.update(chunk)
+    else:
+        for num in sorted(source.levels):
+            level = source[num]
+            digest.update(f"{num}:{len(level)}:{len(level[0])}:".encode())
+            digest.update("".join(code for row in level for code in row).encode())
+    return digest.hexdigest()
+
+
+def get_path_lengths(level, targets, sources):
+    """
+    Finds the shortest path, going around walls, from the nearest target cell to each source cell.
+    :param level: The level grid
+    :param targets: Object codes to measure from
+    :param sources: Object codes to measure to
+    :return: (dict) Path length to each source code (the nearest cell holding it). -1 if it can't be reached.
+    """
+    height, width = len(level), len(level[0])
+    cells = [code for row in level for code in row]
+    dist = [-1] * len(cells)
+    queue = deque()
+    for i, code in enumerate(cells):
+        if code in targets:
+            dist[i] = 0
+            queue.append(i)
+    while queue:
+        i = queue.popleft()
+        x, y = i % width, i // width
+        for j, inside in ((i - 1, x > 0), (i + 1, x < width - 1), (i - width, y > 0), (i + width, y < height - 1)):
+            if inside and dist[j] < 0 and cells[j] != WALL:
+                dist[j] = dist[i] + 1
+                queue.append(j)
+    lengths = {}
+    for i, code in enumerate(cells):
+        if code in sources and dist[i] >= 0 and (lengths.get(code, -1) < 0 or dist[i] < lengths[code]):
+            lengths[code] = dist[i]
+    return {code: lengths.get(code, -1) for code in sources}
+
+
+class LevelIndex:
+    """
+    Per-level metadata stored column by column as NumPy arrays, one entry per level. Columns:
+      - level, width, height
+      - monster, trap, stone: number of enemies of each kind
+      - <kind>_<size> (e.g. monster_S, trap_L): number of enemies of each kind and size class
+      - path_1G, path_2G, path_3G: path length from each shrine to the tower, going around walls (-1 if unreachable)
+      - difficulty: a rough estimate. The summed shrine-to-tower path lengths plus the expected rolls of all enemies.
+      - difficulty_band: difficulty rank split into equal-sized bands, 0 being the easiest
+    """
+    def __init__(self, columns, num_bands):
+        """
+        :param columns: (dict) Column name to list of values
+        :param num_bands: Number of difficulty bands
+        """
+        self.columns = {name: np.array(values) for name, values in columns.items()}
+        self.levels = self.columns["level"]
+        self.num_bands = num_bands
+        # Fingerprint of the levels the index was built from (see get_fingerprint()). None if unknown
+        self.fingerprint = None
+        # Row of each level number
+        self.rows = {num: i for i, num in enumerate(self.levels.tolist())}
+        # The level source the index was matched to by get_level_index()
+        self.source = None
+        # Results of earlier queries
+        self.query_cache = {}
+
+    def __len__(self):
+        return len(self.levels)
+
+    @staticmethod
+    def build(source, num_bands=5, config=None):
+        """
+        Builds the index by reading every level once.
+        :param source: A LevelRegistry or LevelBundle
+        :param num_bands: Number of difficulty bands
+        :param config: The game config. Defaults to the main config.
+        :return: (LevelIndex) The index
+        """
+        config = config or get_config()
+        object_codes = config["OBJECT_INFO"]["OBJECT_CODES"]
+        size_classes = list(config["OBJECT_INFO"]["ENEMIES"]["ENEMY_SIZE_MAPPING"])
+        # Kind, size class and expected roll of each enemy code. The size class comes from the code's number
+        enemies = {code: (info["TYPE"], size_classes[int(code[1]) - 1],
+                          info["DICE_ROLLS"]["CONST"] + max(info["DICE_ROLLS"]["VAL"] - 1, 0) / 2)
+                   for code, info in object_codes.items()
+                   if "DICE_ROLLS" in info and info["TYPE"] in ("monster", "trap", "stone")}
+        kinds = sorted(set(kind for kind, _, _ in enemies.values()))
+        kind_sizes = sorted(set(f"{kind}_{size}" for kind, size, _ in enemies.values()))
+
+        columns = {name: [] for name in ["level", "width", "height"] + kinds + kind_sizes +
+                   [f"path_{code}" for code in SHRINES] + ["difficulty"]}
+        for num in sorted(source.levels):
+            level = source.decode(num) if isinstance(source, LevelBundle) else source[num]
+            counts = dict.fromkeys(kinds + kind_sizes, 0)
+            strength = 0
+            for row in level:
+                for code in row:
+                    enemy = enemies.get(code)
+                    if enemy is not None:
+                        counts[enemy[0]] += 1
+                        counts[f"{enemy[0]}_{enemy[1]}"] += 1
+                        strength += enemy[2]
+            paths = get_path_lengths(level, (TOWER,), SHRINES)
+            columns["level"].append(num)
+            columns["width"].append(len(level[0]))
+            columns["height"].append(len(level))
+            for name, count in counts.items():
+                columns[name].append(count)
+            for code in SHRINES:
+                columns[f"path_{code}"].append(paths[code])
+            columns["difficulty"].append(sum(max(p, 0) for p in paths.values()) + strength)
+
+        # Equal-sized bands by difficulty rank
+        ranks = np.argsort(np.argsort(columns["difficulty"], kind="stable"), kind="stable")
+        columns["difficulty_band"] = (ranks * num_bands // max(len(ranks), 1)).tolist()
+        return LevelIndex(columns, num_bands)
+
+    def save(self, index_path):
+        """
+        Writes the index as JSON.
+        :param index_path: Path of the file to write
+        :return: N/A
+        """
+        with open(index_path, "w") as f:
+            f.write(dumps({"version": VERSION, "num_bands": self.num_bands, "fingerprint": self.fingerprint,
+                           "columns": {name: values.tolist() for name, values in self.columns.items()}}))
+
+    @staticmethod
+    def load(index_path):
+        """
+        Reads an index written by save().
+        :param index_path: Path of the index file
+        :return: (LevelIndex) The index
+        """
+        data = loads(open(index_path, "r").read())
+        if data["version"] != VERSION:
+            raise ValueError(f"Unsupported level index version {data['version']} in {index_path}.")
+        index = LevelIndex(data["columns"], data["num_bands"])
+        # Indexes saved before fingerprints were added have none, so they are rebuilt on first use
+        index.fingerprint = data.get("fingerprint")
+        return index
+
+    def get(self, level_num):
+        """
+        :param level_num: The level number
+        :return: (dict) Every column's value for the level
+        """
+        row = self.rows[level_num]
+        return {name: values[row].item() for name, values in self.columns.items()}
+
+    def query(self, **conditions):
+        """
+        Finds the levels that meet all the given conditions. Each condition names a column, optionally prefixed with
+        min_ or max_ for an inclusive bound, e.g. query(max_monster=3) or query(difficulty_band=2, min_width=50).
+        :param conditions: Column conditions
+        :return: (list) Matching level numbers, in increasing order
+        """
+        key = tuple(sorted(conditions.items()))
+        if key not in self.query_cache:
+            mask = np.ones(len(self.levels), dtype=bool)
+            for name, value in conditions.items():
+                if name.startswith("min_"):
+                    mask &= self.get_column(name[4:]) >= value
+                elif name.startswith("max_"):
+                    mask &= self.get_column(name[4:]) <= value
+                else:
+                    mask &= self.get_column(name) == value
+            self.query_cache[key] = sorted(self.levels[mask].tolist())
+        return self.query_cache[key]
+
+    def get_column(self, name):
+        """
+        :param name: The column name
+        :return: (np.ndarray) The column
+        """
+        if name not in self.columns:
+            raise ValueError(f"Unknown level index column {name!r}. Columns are {list(self.columns)}.")
+        return self.columns[name]
+
+    def get_weights(self, level_nums, column):
+        """
+        Gets sampling weights for the given levels from a column.
+        :param level_nums: The level numbers
+        :param column: The column to weight by (e.g. difficulty)
+        :return: (list) Weight of each level, in the same order
+        """
+        values = self.get_column(column)
+        return [float(values[self.rows[num]]) for num in level_nums]
+
+
+def main():
+    parser = ArgumentParser(description="Builds the metadata index of a level directory or bundle")
+    parser.add_argument("source", help="Directory containing the level files, or a level bundle")
+    parser.add_argument("index_path", help="Path of the index to write")
+    parser.add_argument("--bands", type=int, default=5, help="Number of difficulty bands")
+    args = parser.parse_args()
+    source = get_level_registry(path.join(args.source, "")) if path.isdir(args.source) \
+        else get_level_bundle(args.source)
+    index = LevelIndex.build(source, num_bands=args.bands)
+    index.fingerprint = get_fingerprint(source)
+    index.save(args.index_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from classes.immutable import FrozenDict
+from classes.immutable import freeze
+from json import loads
+from os import listdir
+from os import path
+
+CONFIG_FILE = "game/config/main_config.json"
+LEVELS_DIRECTORY = "game/levels/"
+
+# Process-wide caches. Populated on first use; a worker that forks after that inherits them for free.
+_configs = {}
+_registries = {}
+
+
+def get_config(config_file=CONFIG_FILE):
+    """
+    Returns the parsed game config. The file is only read the first time it is requested in this process.
+    :param config_file: Path to the config file
+    :return: (FrozenDict) A read-only copy of the config
+    """
+    key = path.abspath(config_file)
+    if key not in _configs:
+        _configs[key] = freeze(loads(open(config_file, "r").read()))
+    return _configs[key]
+
+
+def get_level_registry(levels_directory=LEVELS_DIRECTORY):
+    """
+    Returns the level registry for the given directory, creating it the first time it is requested in this process.
+    :param levels_directory: The directory containing the level files
+    :return: (LevelRegistry) The shared registry
+    """
+    key = path.abspath(levels_directory)
+    if key not in _registries:
+        _registries[key] = LevelRegistry(levels_directory)
+    return _registries[key]
+
+
+class LevelRegistry:
+    """
+    Parses every level in a directory once. Levels are stored as tuples of rows of two-character object codes, with
+    row 0 at the "bottom left" of the level, and are shared read-only between all games in the process.
+    """
+    def __init__(self, levels_directory):
+        self.levels_directory = levels_directory
+        # Ordered by level number, so level sampling doesn't depend on the order files are listed in
+        self.levels = FrozenDict(sorted(
+            (int(filename.rstrip(".txt")), self.parse_level(open(self.levels_directory + filename, "r").read()))
+            for filename in listdir(self.levels_directory)
+        ))
+
+    def __len__(self):
+        return len(self.levels)
+
+    def __contains__(self, level_num):
+        return level_num in self.levels
+
+    def __getitem__(self, level_num):
+        return self.levels[level_num]
+
+    def get_levels(self, limit_levels=None):
+        """
+        Gets the levels whose number is in the given list.
+        :param limit_levels: The level numbers to return. If None, returns all levels.
+        :return: (dict) Level number to level grid
+        """
+        if limit_levels is None:
+            return dict(self.levels)
+        return {k: v for k, v in self.levels.items() if k in limit_levels}
+
+    @staticmethod
+    def parse_level(text):
+        """
+        Splits a level file into rows of two-character codes.
+        :param text: The contents of a level file
+        :return: (tuple) The level grid
+        """
+        # This makes sure positions are indexed with origin at "bottom left"
+        return tuple(tuple(row[i:i + 2] for i in range(0, len(row), 2)) for row in reversed(text.strip().split("\n")))
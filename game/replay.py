@@ -0,0 +1,157 @@
+"""
+Compact replays of games. A replay holds what is needed to play a game again exactly: the seed, the settings the game
+was created with and every execute_action() call, one byte each (player and action). Optionally, a hash of the game
+state is stored every so many actions, so a replay can check that it still plays out the same way.
+
+Layout: MAGIC, header size (uint64), JSON header, zlib-compressed action bytes, checkpoint action counts (uint64) and
+checkpoint hashes (8 bytes each).
+
+Usage (from the repository root):
+    python -m game.replay episode.replay
+"""
+from argparse import ArgumentParser
+from json import dumps
+from json import loads
+from time import perf_counter
+import numpy as np
+import zlib
+
+MAGIC = b"DAREPLAY"
+VERSION = 1
+# Action code for actions outside the replay's action table. They are replayed as an action no phase accepts
+INVALID = 15
+INVALID_ACTION = "invalid"
+HASH_SIZE = 8
+
+
+class ReplayMismatch(ValueError):
+    """
+    Raised when a replayed game's state hash differs from the one recorded.
+    """
+
+
+class Replay:
+    """
+    A recorded game. Games created with record_replay=True record into one of these as they are played.
+    """
+    def __init__(self, seed, params, players, actions, moves=None, checkpoints=None, checkpoint_interval=0):
+        """
+        :param seed: The game's seed
+        :param params: (dict) Arguments the game was created with (other than the seed)
+        :param players: (list) Player names, indexed by the player part of each move
+        :param actions: (list) Action names, indexed by the action part of each move
+        :param moves: (bytearray) One byte per execute_action() call: player index * 16 + action index
+        :param checkpoints: (list) (number of moves, state hash) pairs
+        :param checkpoint_interval: Number of moves between checkpoints while recording. 0 records none.
+        """
+        if len(players) > 16 or len(actions) > INVALID:
+            raise ValueError("Replays hold at most 16 players and 15 actions.")
+        self.seed = seed
+        self.params = params
+        self.players = list(players)
+        self.actions = list(actions)
+        self.moves = moves if moves is not None else bytearray()
+        self.checkpoints = checkpoints if checkpoints is not None else []
+        self.checkpoint_interval = checkpoint_interval
+        self.player_index = {player: i for i, player in enumerate(self.players)}
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+
+    def __len__(self):
+        return len(self.moves)
+
+    def record(self, game, player, action):
+        """
+        Records an execute_action() call. Called by the game after the action is applied.
+        :param game: The game
+        :param player: The player the action was applied to
+        :param action: The action
+        :return: N/A
+        """
+        self.moves.append(self.player_index[player] * 16 + self.action_index.get(action, INVALID))
+        if self.checkpoint_interval and len(self.moves) % self.checkpoint_interval == 0:
+            self.checkpoints.append((len(self.moves), game.get_state_hash()))
+
+    def get_moves(self):
+        """
+        :return: (list) The recorded (player, action) pairs
+        """
+        actions = self.actions + [INVALID_ACTION] * (INVALID + 1 - len(self.actions))
+        return [(self.players[move >> 4], actions[move & 15]) for move in self.moves]
+
+    def save(self, path):
+        """
+        Writes the replay to a file.
+        :param path: Path of the file to write
+        :return: N/A
+        """
+        moves = zlib.compress(bytes(self.moves))
+        header = dumps({"version": VERSION, "seed": self.seed, "params": self.params, "players": self.players,
+                        "actions": self.actions, "num_moves": len(self.moves), "moves_size": len(moves),
+                        "num_checkpoints": len(self.checkpoints)}).encode()
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            f.write(moves)
+            f.write(np.array([count for count, _ in self.checkpoints], dtype=np.uint64).tobytes())
+            f.write(b"".join(digest for _, digest in self.checkpoints))
+
+    @staticmethod
+    def load(path):
+        """
+        Reads a replay written by save().
+        :param path: Path of the replay file
+        :return: (Replay) The replay
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a replay.")
+            header = loads(f.read(int(np.frombuffer(f.read(8), dtype=np.uint64)[0])))
+            if header["version"] != VERSION:
+                raise ValueError(f"Unsupported replay version {header['version']} in {path}.")
+            moves = bytearray(zlib.decompress(f.read(header["moves_size"])))
+            counts = np.frombuffer(f.read(8 * header["num_checkpoints"]), dtype=np.uint64).tolist()
+            digests = f.read(HASH_SIZE * header["num_checkpoints"])
+        checkpoints = [(count, digests[i * HASH_SIZE:(i + 1) * HASH_SIZE]) for i, count in enumerate(counts)]
+        return Replay(header["seed"], header["params"], header["players"], header["actions"], moves, checkpoints)
+
+
+def play_replay(replay, check=True):
+    """
+    Plays a replay again in a new game, as fast as the engine goes (no rendering or metrics).
+    :param replay: A Replay, or the path of a replay file
+    :param check: Whether to compare the game's state hash with each recorded checkpoint
+    :return: (DiceAdventure) The game, in the state the recorded game was in at the end of the replay
+    """
+    # Imported here since the game imports this module
+    from game.dice_adventure import DiceAdventure
+
+    if isinstance(replay, str):
+        replay = Replay.load(replay)
+    game = DiceAdventure(**replay.params, seed=replay.seed)
+    checkpoints = iter(replay.checkpoints if check else ())
+    checkpoint = next(checkpoints, None)
+    for i, (player, action) in enumerate(replay.get_moves(), 1):
+        game.execute_action(player, action)
+        if checkpoint is not None and checkpoint[0] == i:
+            if game.get_state_hash() != checkpoint[1]:
+                raise ReplayMismatch(f"Replay diverged from the recorded game by move {i}.")
+            checkpoint = next(checkpoints, None)
+    return game
+
+
+def main():
+    parser = ArgumentParser(description="Plays a replay and checks it against its recorded state hashes")
+    parser.add_argument("replay_path", help="Path of the replay file")
+    parser.add_argument("--no-check", action="store_true", help="Don't compare state hashes")
+    args = parser.parse_args()
+    replay = Replay.load(args.replay_path)
+    start = perf_counter()
+    game = play_replay(replay, check=not args.no_check)
+    elapsed = perf_counter() - start
+    print(f"{len(replay)} moves, {len(replay.checkpoints)} checkpoints, level {game.curr_level_num}, "
+          f"round {game.num_rounds}, {len(replay) / max(elapsed, 1e-9):.0f} moves/s")
+
+
+if __name__ == "__main__":
+    main()
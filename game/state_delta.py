@@ -0,0 +1,70 @@
+from classes.immutable import freeze
+
+
+def diff_states(old, new):
+    """
+    Computes the changes between two states returned by DiceAdventure.get_state(). Scene elements are matched by
+    their id.
+    :param old: The earlier state
+    :param new: The later state
+    :return: (dict) The delta, or None if the states can not be diffed (scene ids are not unique)
+    """
+    old_scene = {ele["id"]: ele for ele in old["content"]["scene"]}
+    new_scene = {ele["id"]: ele for ele in new["content"]["scene"]}
+    if len(old_scene) != len(old["content"]["scene"]) or len(new_scene) != len(new["content"]["scene"]):
+        return None
+    removed = [i for i in old_scene if i not in new_scene]
+    added = [ele for i, ele in new_scene.items() if i not in old_scene]
+    delta = {
+        "status": new["status"],
+        "message": new["message"],
+        "gameData": {k: v for k, v in new["content"]["gameData"].items()
+                     if k not in old["content"]["gameData"] or old["content"]["gameData"][k] != v},
+        "added": added,
+        "removed": removed,
+        "changed": [ele for i, ele in new_scene.items() if i in old_scene and old_scene[i] != ele]
+    }
+    # Only send the scene order if it can't be worked out from the old order
+    order = list(new_scene)
+    if get_scene_order(old_scene, removed, added) != order:
+        delta["order"] = order
+    return delta
+
+
+def apply_state_delta(state, delta):
+    """
+    Applies a delta from diff_states() (or DiceAdventure.get_state_delta()) to a copy of the earlier state.
+    :param state: The state the delta was computed against
+    :param delta: The delta
+    :return: (dict) The later state, equal to what get_state() returned for it
+    """
+    scene = {ele["id"]: ele for ele in state["content"]["scene"]}
+    for ele in delta["changed"]:
+        scene[ele["id"]] = ele
+    for ele in delta["added"]:
+        scene[ele["id"]] = ele
+    order = delta.get("order")
+    if order is None:
+        order = get_scene_order(scene, delta["removed"], delta["added"])
+    return freeze({
+        "command": state["command"],
+        "status": delta["status"],
+        "message": delta["message"],
+        "content": {
+            "gameData": {**state["content"]["gameData"], **delta["gameData"]},
+            "scene": [scene[i] for i in order]
+        }
+    })
+
+
+def get_scene_order(old_ids, removed, added):
+    """
+    Gets the scene order that results from dropping removed elements and appending added ones.
+    :param old_ids: Ids of the earlier scene, in order
+    :param removed: Ids of removed elements
+    :param added: Added elements
+    :return: (list) Ids in order
+    """
+    removed = set(removed)
+    added_ids = set(ele["id"] for ele in added)
+    return [i for i in old_ids if i not in removed and i not in added_ids] + [ele["id"] for ele in added]
@@ -0,0 +1,8 @@
+from os import chdir
+from os import path
+import sys
+
+# The game reads its config and levels from paths relative to the repository root
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+chdir(ROOT)
@@ -0,0 +1,44 @@
+from game.dice_adventure import DiceAdventure
+from game.replay import Replay
+from game.replay import ReplayMismatch
+from game.replay import play_replay
+from random import Random
+import pytest
+
+PLAYERS = ["Dwarf", "Giant", "Human"]
+ACTIONS = ["left", "right", "up", "down", "wait", "submit", "pinga", "pingb", "pingc", "pingd", "undo"]
+GAME_ARGS = {"level": 2, "limit_levels": [1, 2, 3, 4, 5], "level_sampling": True, "num_repeats": 50, "round_cap": 10}
+
+
+def play(game, num_actions, seed):
+    rng = Random(seed)
+    for i in range(num_actions):
+        game.execute_action(PLAYERS[i % 3], rng.choice(ACTIONS) if rng.random() < 0.7 else "submit")
+        if game.terminated:
+            break
+    return game
+
+
+@pytest.mark.parametrize("array_board", [False, True])
+def test_saved_replay_plays_back_to_same_state(tmp_path, array_board):
+    game = play(DiceAdventure(**GAME_ARGS, array_board=array_board, seed=7, record_replay=True,
+                              replay_checkpoint_interval=100), 3000, seed=1)
+    replay_path = str(tmp_path / "game.replay")
+    game.save_replay(replay_path)
+
+    replay = Replay.load(replay_path)
+    assert len(replay) == len(game.replay)
+    assert replay.checkpoints == game.replay.checkpoints
+    replayed = play_replay(replay, check=True)
+    assert replayed.get_state_hash() == game.get_state_hash()
+    assert replayed.curr_level_num == game.curr_level_num
+
+
+def test_replay_detects_divergence(tmp_path):
+    game = play(DiceAdventure(**GAME_ARGS, seed=7, record_replay=True, replay_checkpoint_interval=50), 1000, seed=2)
+    replay = game.replay
+    # Swap the first "submit" for a "wait", so the game diverges from what was recorded
+    replay.moves[replay.get_moves().index(("Dwarf", "submit"))] = \
+        replay.player_index["Dwarf"] * 16 + replay.action_index["wait"]
+    with pytest.raises(ReplayMismatch):
+        play_replay(replay, check=True)
@@ -0,0 +1,84 @@
+from json import dumps
+from json import loads
+from random import Random
+import pytest
+
+# The AdiAgent env imports the Unity socket client
+pytest.importorskip("websockets")
+
+from examples.AdiAgent.dice_adventure_python_env import DiceAdventurePythonEnv
+from examples.AdiAgent.reward_engine import RewardEngine
+from examples.AdiAgent.reward_engine import get_aggressive_terms
+from examples.AdiAgent.reward_engine import get_default_terms
+
+PLAYERS = ["Dwarf", "Giant", "Human"]
+ACTIONS = ["left", "right", "up", "down", "wait", "submit", "pinga"]
+MODEL_TYPES = {"default": get_default_terms(), "aggressive": get_aggressive_terms()}
+
+
+@pytest.fixture(scope="module")
+def env():
+    return DiceAdventurePythonEnv(player="Dwarf", level=1, limit_levels=[1, 2, 3, 4, 5], level_sampling=True,
+                                  num_repeats=1000, round_cap=30, seed=1)
+
+
+@pytest.fixture(scope="module")
+def trajectory(env):
+    """
+    :return: (list) Full states after each action of a seeded random game, starting with the initial state
+    """
+    rng = Random(0)
+    states = [env.game.get_state("Dwarf", "full")]
+    for i in range(3000):
+        env.game.execute_action(PLAYERS[i % 3], rng.choice(ACTIONS) if rng.random() < 0.8 else "submit")
+        states.append(env.game.get_state("Dwarf", "full"))
+    return states
+
+
+def with_shrine_reached(state):
+    """
+    :return: (dict) A copy of the state in which the first shrine has been reached. Random play rarely gets there, and
+             it is the only way goal_reached applies without a level change.
+    """
+    state = loads(dumps(state))
+    next(ele for ele in state["content"]["scene"] if ele["entityType"] == "shrine")["reached"] = True
+    return state
+
+
+def get_expected(env, model_type, player, states, next_states):
+    env.model_type = model_type
+    return [env.get_reward(env.get_obj_from_scene_by_type(state, player),
+                           env.get_obj_from_scene_by_type(next_state, player), state, next_state)
+            for state, next_state in zip(states, next_states)]
+
+
+@pytest.mark.parametrize("model_type", MODEL_TYPES)
+@pytest.mark.parametrize("player", PLAYERS)
+def test_engine_matches_on_consecutive_steps(env, trajectory, model_type, player):
+    states, next_states = trajectory[:-1], trajectory[1:]
+    rewards, _ = RewardEngine(MODEL_TYPES[model_type], PLAYERS).compute(states, next_states, player)
+    # Bit-identical, not just close
+    assert rewards.tolist() == get_expected(env, model_type, player, states, next_states)
+
+
+@pytest.mark.parametrize("model_type", MODEL_TYPES)
+@pytest.mark.parametrize("player", PLAYERS)
+def test_engine_matches_on_random_pairs(env, trajectory, model_type, player):
+    # Pairs of unrelated states, so every term both applies and doesn't in the batch
+    rng = Random(PLAYERS.index(player))
+    pool = trajectory + [with_shrine_reached(state) for state in rng.sample(trajectory, 200)]
+    states = [rng.choice(pool) for _ in range(2000)]
+    next_states = [rng.choice(pool) for _ in range(2000)]
+    rewards, applied = RewardEngine(MODEL_TYPES[model_type], PLAYERS).compute(states, next_states, player)
+    assert rewards.tolist() == get_expected(env, model_type, player, states, next_states)
+    for name, mask in applied.items():
+        assert 0 < mask.sum() < len(mask), name
+    assert (applied["goal_reached"] != applied["new_level"]).any()
+
+
+@pytest.mark.parametrize("model_type", MODEL_TYPES)
+def test_env_get_rewards_matches_get_reward(env, trajectory, model_type):
+    states, next_states = trajectory[:-1], trajectory[1:]
+    expected = get_expected(env, model_type, env.player, states, next_states)
+    env.model_type = model_type
+    assert env.get_rewards(states, next_states).tolist() == expected
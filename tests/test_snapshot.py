@@ -0,0 +1,47 @@
+from game.dice_adventure import DiceAdventure
+from random import Random
+import pickle
+import pytest
+
+PLAYERS = ["Dwarf", "Giant", "Human"]
+ACTIONS = ["left", "right", "up", "down", "wait", "submit", "pinga", "pingb", "pingc", "pingd", "undo"]
+GAME_ARGS = {"level": 2, "limit_levels": [1, 2, 3, 4, 5], "level_sampling": True, "num_repeats": 50, "round_cap": 5}
+
+
+def play(game, num_actions, seed):
+    rng = Random(seed)
+    hashes = []
+    for i in range(num_actions):
+        game.execute_action(PLAYERS[i % 3], rng.choice(ACTIONS) if rng.random() < 0.7 else "submit")
+        hashes.append(game.get_state_hash())
+    return hashes
+
+
+@pytest.mark.parametrize("array_board", [False, True])
+def test_pickled_snapshot_restores_same_game(array_board):
+    game = DiceAdventure(**GAME_ARGS, array_board=array_board, seed=3)
+    play(game, 900, seed=1)
+    snap = game.snapshot()
+    snap_hash = game.get_state_hash()
+    expected = play(game, 1500, seed=2)
+
+    game.restore(pickle.loads(pickle.dumps(snap)))
+    assert game.get_state_hash() == snap_hash
+    assert play(game, 1500, seed=2) == expected
+
+    # A different game, on a different level, picks the snapshot up the same way
+    other = DiceAdventure(**dict(GAME_ARGS, level=1), array_board=array_board, seed=4)
+    other.restore(pickle.loads(pickle.dumps(snap)))
+    assert other.get_state_hash() == snap_hash
+    assert play(other, 1500, seed=2) == expected
+
+
+def test_snapshot_is_same_with_either_board():
+    hashes = []
+    for array_board in (False, True):
+        game = DiceAdventure(**GAME_ARGS, array_board=array_board, seed=3)
+        play(game, 900, seed=1)
+        restored = DiceAdventure(**GAME_ARGS, array_board=array_board, seed=5)
+        restored.restore(pickle.loads(pickle.dumps(game.snapshot())))
+        hashes.append((restored.get_state_hash(), play(restored, 300, seed=2)))
+    assert hashes[0] == hashes[1]
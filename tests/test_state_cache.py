@@ -0,0 +1,43 @@
+from game.dice_adventure import DiceAdventure
+from json import dumps
+from random import Random
+import pytest
+
+PLAYERS = ["Dwarf", "Giant", "Human"]
+ACTIONS = ["left", "right", "up", "down", "wait", "submit", "pinga", "pingb", "pingc", "pingd", "undo"]
+VERSIONS = ["full", "player", "fow", None]
+
+
+@pytest.mark.parametrize("game_args", [
+    {"level": 1, "num_repeats": 2, "restart_on_finish": True},
+    {"level": 2, "limit_levels": [1, 2, 3, 4, 5], "level_sampling": True, "num_repeats": 50, "round_cap": 20},
+    {"level": 1, "array_board": True, "num_repeats": 3, "restart_on_finish": True},
+])
+def test_cached_state_matches_fresh_state(game_args):
+    game = DiceAdventure(**game_args, seed=0)
+    rng = Random(0)
+    hits = 0
+    for i in range(1500):
+        game.execute_action(rng.choice(PLAYERS), rng.choice(ACTIONS) if rng.random() < 0.7 else "submit")
+        for _ in range(2):
+            player, version = rng.choice(PLAYERS), rng.choice(VERSIONS)
+            cached = game.state_cache.get((player, version))
+            state = game.get_state(player, version)
+            hits += cached is not None and cached[1] is state
+            # Build the same state again with an empty cache
+            saved, game.state_cache = game.state_cache, {}
+            fresh = game.get_state(player, version)
+            game.state_cache = saved
+            assert dumps(state) == dumps(fresh), (i, player, version)
+        if game.terminated:
+            break
+    # Otherwise the cache was never used and the test proves nothing
+    assert hits > 0
+
+
+def test_cached_state_is_read_only():
+    state = DiceAdventure(level=1, seed=0).get_state("Dwarf", "full")
+    with pytest.raises(TypeError):
+        state["status"] = "changed"
+    with pytest.raises(TypeError):
+        state["content"]["gameData"]["level"] = 0
@@ -0,0 +1,60 @@
+from game.dice_adventure import DiceAdventure
+from game.state_delta import apply_state_delta
+from game.state_delta import diff_states
+from json import dumps
+from json import loads
+from random import Random
+import pytest
+
+PLAYERS = ["Dwarf", "Giant", "Human"]
+ACTIONS = ["left", "right", "up", "down", "wait", "submit", "pinga", "pingb", "pingc", "pingd", "undo"]
+VERSIONS = ["full", "player", "fow"]
+GAME_ARGS = [
+    {"level": 1, "num_repeats": 2, "restart_on_finish": True},
+    {"level": 2, "limit_levels": [1, 2, 3, 4, 5], "level_sampling": True, "num_repeats": 50, "round_cap": 20},
+]
+
+
+@pytest.mark.parametrize("game_args", GAME_ARGS)
+def test_diff_and_apply_round_trip(game_args):
+    game = DiceAdventure(**game_args, seed=0)
+    rng = Random(0)
+    previous = {(p, v): game.get_state(p, v) for p in PLAYERS for v in VERSIONS}
+    for i in range(800):
+        game.execute_action(rng.choice(PLAYERS), rng.choice(ACTIONS) if rng.random() < 0.7 else "submit")
+        for key, old in previous.items():
+            new = game.get_state(*key)
+            delta = diff_states(old, new)
+            assert delta is not None
+            assert dumps(apply_state_delta(old, delta)) == dumps(new), (i, key)
+            previous[key] = new
+        if game.terminated:
+            break
+
+
+@pytest.mark.parametrize("game_args", GAME_ARGS)
+def test_state_delta_client_stays_in_sync(game_args):
+    game = DiceAdventure(**game_args, seed=0)
+    rng = Random(1)
+    # What a client holds for each player and version: the last token and the state it rebuilt
+    clients = {}
+    num_deltas = 0
+    for i in range(1500):
+        game.execute_action(rng.choice(PLAYERS), rng.choice(ACTIONS) if rng.random() < 0.7 else "submit")
+        player, version = rng.choice(PLAYERS), rng.choice(VERSIONS)
+        token, state = clients.get((player, version), (None, None))
+        if rng.random() < 0.05:
+            # A token the game doesn't know falls back to the full state
+            token = 10 ** 9
+        # Sent over the wire as JSON
+        result = loads(dumps(game.get_state_delta(player, version, token)))
+        if result["full"]:
+            state = result["state"]
+        else:
+            state = apply_state_delta(state, result["delta"])
+            num_deltas += 1
+        assert dumps(state) == dumps(game.get_state(player, version)), (i, player, version)
+        clients[(player, version)] = (result["token"], state)
+        if game.terminated:
+            break
+    assert num_deltas > 0